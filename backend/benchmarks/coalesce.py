@@ -0,0 +1,104 @@
+"""
+CPU saved by request coalescing: bursts of identical concurrent /api/dashboard
+and /api/chart requests, served with single-flight on and then off.
+
+    python -m benchmarks.coalesce [--rows 100000] [--concurrency 8] [--bursts 3] [--data path/to/file.csv]
+
+Requests go through the FastAPI app in process over an ASGI transport, with
+the result cache disabled so that only coalescing can spare work. For each
+mode the process CPU time (all threads) and the wall time per burst are
+reported, with the coalescing counters. Run from the backend directory.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+
+os.environ["RESULT_CACHE_MB"] = "0"
+os.environ.setdefault("SESSION_SPILL_DIR", tempfile.mkdtemp(prefix="dashboard-bench-"))
+
+import httpx
+
+from benchmarks.generate import Shape, write_csv
+from main import app
+from services.cache import in_flight
+from services.chart_builder import warm_templates
+
+# One chart request per burst besides the dashboard
+CHART_BODY = {"chart_id": "dimension_explorer", "options": {"dimension": "market", "chart_type": "bar"}}
+
+
+async def burst(client: httpx.AsyncClient, path: str, body: Dict[str, Any], concurrency: int) -> None:
+    responses = await asyncio.gather(*(client.post(path, json=body) for _ in range(concurrency)))
+    for response in responses:
+        response.raise_for_status()
+
+
+async def run(raw: bytes, concurrency: int, bursts: int) -> List[Dict[str, Any]]:
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+    try:
+        upload = await client.post("/api/upload", files={"file": ("bench.csv", io.BytesIO(raw), "text/csv")})
+        upload.raise_for_status()
+        session_id = upload.json()["session_id"]
+
+        results = []
+        for enabled in (True, False):
+            in_flight.enabled = enabled
+            before = in_flight.stats()
+            for path, body in (("/api/dashboard", {}), ("/api/chart", CHART_BODY)):
+                body = {"session_id": session_id, **body}
+                cpu, wall = time.process_time(), time.perf_counter()
+                for _ in range(bursts):
+                    await burst(client, path, body, concurrency)
+                after = in_flight.stats()
+                results.append({
+                    "route": path,
+                    "single_flight": enabled,
+                    "cpu_ms_per_burst": (time.process_time() - cpu) * 1000 / bursts,
+                    "wall_ms_per_burst": (time.perf_counter() - wall) * 1000 / bursts,
+                    "computations": after["computations"] - before["computations"],
+                    "coalesced": after["coalesced"] - before["coalesced"],
+                })
+                before = after
+        return results
+    finally:
+        await client.aclose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--bursts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", help="use this CSV instead of generated data")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore", FutureWarning)
+    warm_templates()
+
+    if args.data:
+        with open(args.data, "rb") as f:
+            raw = f.read()
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+            write_csv(f.name, Shape(args.rows), args.seed)
+            raw = f.read()
+
+    results = asyncio.run(run(raw, args.concurrency, args.bursts))
+    print(f"\n{args.concurrency} identical concurrent requests per burst, {args.bursts} bursts")
+    print(f"{'route':<16}{'single-flight':>14}{'cpu ms':>10}{'wall ms':>10}{'computed':>10}{'coalesced':>11}")
+    for r in results:
+        print(
+            f"{r['route']:<16}{'on' if r['single_flight'] else 'off':>14}{r['cpu_ms_per_burst']:>10.0f}"
+            f"{r['wall_ms_per_burst']:>10.0f}{r['computations']:>10}{r['coalesced']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+"""
+Compare figure_json rendering through plotly.express against the precompiled
+figure templates, chart by chart, on an uploaded CSV/Excel file.
+
+    python -m benchmarks.figure_render path/to/superstore.csv [repeats]
+
+Both paths share the same aggregation, so the difference is rendering alone.
+Each chart's output is also checked to be identical between the two paths.
+"""
+import statistics
+import sys
+import time
+import warnings
+
+from services import chart_builder
+from services.data_processor import load_and_validate
+from services.session import Session
+
+CHARTS = [
+    ("sales_profit_trend (month)",   lambda df, sums: chart_builder._sales_profit_trend(sums, "month")),
+    ("dimension_explorer (donut)",   lambda df, sums: chart_builder._dimension_explorer(sums, "category", "donut", "Sales")),
+    ("dimension_explorer (treemap)", lambda df, sums: chart_builder._dimension_explorer(sums, "market", "treemap", "Sales")),
+    ("dimension_explorer (bar)",     lambda df, sums: chart_builder._dimension_explorer(sums, "segment", "bar", "Profit")),
+    ("top_products",                 lambda df, sums: chart_builder._top_products(df)),
+    ("discount_vs_profit",           lambda df, sums: chart_builder._discount_vs_profit(df)),
+    ("ship_mode_priority",           lambda df, sums: chart_builder._ship_mode_priority(sums)),
+]
+
+
+def _time(build, repeats: int) -> tuple:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = build()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), output
+
+
+def main(path: str, repeats: int = 20) -> None:
+    warnings.simplefilter("ignore", FutureWarning)
+    with open(path, "rb") as f:
+        df = load_and_validate(f.read(), path)
+    view = Session(df).view({})
+    sums = view.rollup if view.rollup is not None else view.df
+    chart_builder.warm_templates()
+
+    print(f"{len(df):,} rows, median of {repeats} runs (ms)")
+    print(f"{'chart':<30}{'plotly':>10}{'template':>10}{'speedup':>10}  identical")
+    for name, build in CHARTS:
+        results = {}
+        for renderer in ("plotly", "template"):
+            chart_builder.FIGURE_RENDERER = renderer
+            results[renderer] = _time(lambda: build(view.df, sums), repeats)
+        (slow, expected), (fast, actual) = results["plotly"], results["template"]
+        print(f"{name:<30}{slow:>10.2f}{fast:>10.2f}{slow / fast:>9.1f}x  {expected == actual}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 20)
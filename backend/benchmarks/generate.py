@@ -0,0 +1,198 @@
+"""
+Deterministic Superstore-shaped data for benchmarks.
+
+    python -m benchmarks.generate out.csv --rows 1000000 [--seed 0] [--orders N] [--customers N]
+        [--products N] [--cities N] [--days N]
+
+Every REQUIRED_COLUMNS column is produced with the hierarchies the dashboard
+relies on: an order has one date, customer, ship mode and priority across its
+lines; a product always has the same category and sub-category; a city
+belongs to one state, country, market and region. Cardinalities default to
+ratios typical of the real dataset and can be overridden one by one.
+
+Rows are generated in fixed blocks whose random streams depend only on the
+seed and the block number, so a file written block by block (how 10M-row
+files are produced without holding them in memory) equals generate() of the
+same size.
+"""
+import argparse
+import time
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+
+# Rows per generated block; part of the output definition, not a tuning knob
+BLOCK_ROWS = 100_000
+
+MARKETS = {
+    "US":     ["East", "West", "Central", "South"],
+    "EU":     ["North", "Central", "South"],
+    "APAC":   ["Oceania", "Southeast Asia", "North Asia", "Central Asia"],
+    "LATAM":  ["Caribbean", "Central", "South"],
+    "Africa": ["Africa"],
+    "EMEA":   ["EMEA"],
+    "Canada": ["Canada"],
+}
+CATEGORIES = {
+    "Furniture":       ["Bookcases", "Chairs", "Furnishings", "Tables"],
+    "Office Supplies": ["Appliances", "Art", "Binders", "Envelopes", "Fasteners", "Labels", "Paper", "Storage", "Supplies"],
+    "Technology":      ["Accessories", "Copiers", "Machines", "Phones"],
+}
+SEGMENTS = ["Consumer", "Corporate", "Home Office"]
+SHIP_MODES = ["Standard Class", "Second Class", "First Class", "Same Day"]
+PRIORITIES = ["Medium", "High", "Critical", "Low"]
+DISCOUNTS = np.array([0.0, 0.0, 0.0, 0.1, 0.15, 0.2, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8])
+START_DATE = np.datetime64("2011-01-01")
+
+
+class Shape:
+    """Cardinalities of a generated dataset of `rows` rows."""
+
+    def __init__(
+        self,
+        rows: int,
+        orders: Optional[int] = None,
+        customers: Optional[int] = None,
+        products: Optional[int] = None,
+        cities: Optional[int] = None,
+        days: int = 1461,
+    ):
+        self.rows = rows
+        # About two lines per order, as in the real data
+        self.orders = max(1, min(orders or rows // 2, rows))
+        self.customers = max(1, customers or min(max(rows // 60, 50), 200_000))
+        self.products = max(1, products or min(max(rows // 5, 100), 50_000))
+        self.cities = max(1, cities or min(max(rows // 30, 20), 20_000))
+        self.days = max(1, days)
+
+    def as_dict(self) -> dict:
+        return dict(rows=self.rows, orders=self.orders, customers=self.customers,
+                    products=self.products, cities=self.cities, days=self.days)
+
+
+class _Entities:
+    """Per-order, per-customer, per-product and per-city attributes, fixed by the seed."""
+
+    def __init__(self, shape: Shape, seed: int):
+        rng = np.random.default_rng([seed, 0])
+        self.order_day = rng.integers(0, shape.days, shape.orders).astype(np.int32)
+        self.order_customer = rng.integers(0, shape.customers, shape.orders).astype(np.int32)
+        self.order_ship_mode = rng.choice(len(SHIP_MODES), shape.orders, p=[0.6, 0.2, 0.15, 0.05]).astype(np.int8)
+        self.order_priority = rng.choice(len(PRIORITIES), shape.orders, p=[0.57, 0.3, 0.08, 0.05]).astype(np.int8)
+        self.ship_days = rng.integers(0, 7, shape.orders).astype(np.int8)
+        # Dates are formatted once per day
+        self.day_labels = pd.DatetimeIndex(START_DATE + np.arange(shape.days + 7)).strftime("%m/%d/%Y").to_numpy()
+
+        self.customer_segment = rng.choice(len(SEGMENTS), shape.customers, p=[0.52, 0.3, 0.18]).astype(np.int8)
+        self.customer_city = rng.integers(0, shape.cities, shape.customers).astype(np.int32)
+
+        # Cities → states → countries → (market, region)
+        regions = [(market, region) for market, names in MARKETS.items() for region in names]
+        n_states = max(1, shape.cities // 8)
+        n_countries = max(len(regions), min(n_states // 4, 150))
+        self.country_region = np.arange(n_countries) % len(regions)
+        self.state_country = rng.integers(0, n_countries, n_states)
+        self.city_state = rng.integers(0, n_states, shape.cities)
+        self.region_labels = regions
+
+        subs = [(category, sub) for category, names in CATEGORIES.items() for sub in names]
+        self.product_sub = rng.integers(0, len(subs), shape.products).astype(np.int16)
+        self.product_price = np.round(rng.lognormal(3.5, 1.2, shape.products), 2)
+        self.sub_labels = subs
+
+
+def generate(rows: int, seed: int = 0, **cardinalities) -> pd.DataFrame:
+    """A raw (string-dated) Superstore-shaped frame, as a CSV read would return it."""
+    return pd.concat(list(blocks(Shape(rows, **cardinalities), seed)), ignore_index=True)
+
+
+def blocks(shape: Shape, seed: int = 0) -> Iterator[pd.DataFrame]:
+    entities = _Entities(shape, seed)
+    for start in range(0, shape.rows, BLOCK_ROWS):
+        yield _block(shape, entities, seed, start, min(start + BLOCK_ROWS, shape.rows))
+
+
+def write_csv(path: str, shape: Shape, seed: int = 0) -> None:
+    for i, block in enumerate(blocks(shape, seed)):
+        block.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+
+def _block(shape: Shape, e: _Entities, seed: int, start: int, end: int) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, 1, start // BLOCK_ROWS])
+    n = end - start
+    row = np.arange(start, end)
+    # Lines of one order are contiguous, as in the source data
+    order = (row * shape.orders) // shape.rows
+    customer = e.order_customer[order]
+    city = e.customer_city[customer]
+    state = e.city_state[city]
+    country = e.state_country[state]
+    region = e.country_region[country]
+    # A few products sell far more often than the rest
+    product = (shape.products * rng.random(n) ** 2).astype(np.int64)
+    sub = e.product_sub[product]
+
+    order_day = e.order_day[order]
+    quantity = rng.integers(1, 15, n)
+    discount = DISCOUNTS[rng.integers(0, len(DISCOUNTS), n)]
+    sales = np.round(e.product_price[product] * quantity * (1 - discount), 2)
+    margin = rng.normal(0.35, 0.15, n) - discount
+    profit = np.round(sales * margin, 2)
+    shipping = np.round(sales * rng.uniform(0.02, 0.2, n), 2)
+
+    market_names = np.array([m for m, _ in e.region_labels])
+    region_names = np.array([r for _, r in e.region_labels])
+    category_names = np.array([c for c, _ in e.sub_labels])
+    sub_names = np.array([s for _, s in e.sub_labels])
+    return pd.DataFrame({
+        "Row ID": row + 1,
+        "Order ID": _labels("OR-", order, 8),
+        "Order Date": e.day_labels[order_day],
+        "Ship Date": e.day_labels[order_day + e.ship_days[order]],
+        "Ship Mode": np.array(SHIP_MODES)[e.order_ship_mode[order]],
+        "Customer ID": _labels("CU-", customer, 6),
+        "Customer Name": _labels("Customer ", customer, 0),
+        "Segment": np.array(SEGMENTS)[e.customer_segment[customer]],
+        "City": _labels("City ", city, 0),
+        "State": _labels("State ", state, 0),
+        "Country": _labels("Country ", country, 0),
+        "Postal Code": 10000 + city % 90000,
+        "Market": market_names[region],
+        "Region": region_names[region],
+        "Product ID": _labels("PR-", product, 6),
+        "Category": category_names[sub],
+        "Sub-Category": sub_names[sub],
+        "Product Name": _labels("Product ", product, 0) + " " + sub_names[sub],
+        "Sales": sales,
+        "Quantity": quantity,
+        "Discount": discount,
+        "Profit": profit,
+        "Shipping Cost": shipping,
+        "Order Priority": np.array(PRIORITIES)[e.order_priority[order]],
+    })
+
+
+def _labels(prefix: str, ids: np.ndarray, width: int) -> np.ndarray:
+    # Formatted once per distinct id
+    uniques, inverse = np.unique(ids, return_inverse=True)
+    return np.array([f"{prefix}{i:0{width}d}" for i in uniques], dtype=object)[inverse]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    for name in ("orders", "customers", "products", "cities"):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--days", type=int, default=1461)
+    args = parser.parse_args()
+
+    shape = Shape(args.rows, args.orders, args.customers, args.products, args.cities, args.days)
+    start = time.perf_counter()
+    write_csv(args.path, shape, args.seed)
+    print(f"{args.path}: {shape.as_dict()} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
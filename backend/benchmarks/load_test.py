@@ -0,0 +1,136 @@
+"""
+Dashboard throughput against uvicorn with a growing number of worker processes
+sharing one session directory (SESSION_BACKEND=shared).
+
+    python -m benchmarks.load_test path/to/superstore.csv [--workers 1 2 4] [--seconds 15] [--concurrency 16]
+
+For each worker count a fresh server is started, the file is uploaded once,
+and client threads post /api/dashboard with rotating filters for the given
+time. The result cache and request coalescing are disabled so every request
+is computed. Run from the backend directory.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+
+def _post_json(base: str, path: str, payload: dict) -> dict:
+    request = urllib.request.Request(
+        base + path, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+
+def _upload(base: str, path: str) -> dict:
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        content = f.read()
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{os.path.basename(path)}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(
+        base + "/api/upload", data=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.loads(response.read())
+
+
+def _filter_sets(options: dict) -> list:
+    filters = [{}]
+    filters += [{"market": [m]} for m in options["markets"]]
+    filters += [{"category": [c]} for c in options["categories"]]
+    filters += [{"segment": [s], "market": [m]} for s in options["segments"] for m in options["markets"][:3]]
+    return filters
+
+
+def _wait_until_up(base: str, timeout: float = 120) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base + "/", timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("server did not start")
+
+
+def run(path: str, workers: int, seconds: float, concurrency: int, port: int) -> dict:
+    spill_dir = tempfile.mkdtemp(prefix="dashboard-load-")
+    env = dict(os.environ, SESSION_BACKEND="shared", SESSION_SPILL_DIR=spill_dir, RESULT_CACHE_MB="0", SINGLE_FLIGHT="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(base)
+        upload = _upload(base, path)
+        filters = _filter_sets(upload["filter_options"])
+        session_id = upload["session_id"]
+
+        latencies, errors = [], []
+        stop = time.time() + seconds
+
+        def client(offset: int) -> None:
+            i = offset
+            while time.time() < stop:
+                start = time.perf_counter()
+                try:
+                    _post_json(base, "/api/dashboard", {"session_id": session_id, **filters[i % len(filters)]})
+                    latencies.append(time.perf_counter() - start)
+                except Exception as exc:
+                    errors.append(exc)
+                i += 1
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "workers": workers,
+            "requests": len(latencies),
+            "errors": len(errors),
+            "req_per_s": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"cpu cores: {os.cpu_count()}")
+    results = [run(args.path, n, args.seconds, args.concurrency, args.port) for n in args.workers]
+    baseline = results[0]["req_per_s"] or 1
+    for r in results:
+        print(json.dumps({**r, "speedup": round(r["req_per_s"] / baseline, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Timings for the service functions, each dashboard chart and the API routes,
+on generated Superstore-shaped data, written as JSON for comparison across
+commits.
+
+    python -m benchmarks.suite [--rows 10000 100000 1000000] [--repeats 5] [--seed 0]
+        [--data path/to/file.csv] [--out results.json] [--baseline previous.json]
+
+For each size a CSV is generated (benchmarks/generate.py) unless --data is
+given, and every measurement is run `repeats` times for the median and
+minimum, then once more under tracemalloc for the peak allocation. Routes
+go through the FastAPI app in process over an ASGI transport, with the
+result cache disabled so every request is computed. With --baseline, each
+median is printed next to the one recorded in an earlier results file.
+Run from the backend directory.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+# Set before the services read their configuration: cache hits and repeated-upload
+# dedup would hide the work being measured, and benchmark sessions stay out of the
+# real spill directory
+os.environ["RESULT_CACHE_MB"] = "0"
+os.environ["UPLOAD_DEDUP"] = "0"
+os.environ.setdefault("SESSION_SPILL_DIR", tempfile.mkdtemp(prefix="dashboard-bench-"))
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate import Shape, write_csv
+from main import app
+from services.chart_builder import chart_specs, warm_templates
+from services.data_processor import (
+    apply_filters, compute_kpis, compute_sparklines, get_filter_options, load_and_validate,
+)
+from services.encoding import COMPACT_MEDIA_TYPE
+from services.session import Session
+
+
+def measure(fn: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """Median and minimum wall time over `repeats` runs, and the peak allocation of one more."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    # Separate run: tracing slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def filter_sets(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """No filter, and a typical drill-down: the largest market and category over the last year."""
+    last = df["Order Date"].max()
+    return {
+        "all": {},
+        "filtered": {
+            "market": [str(df["Market"].value_counts().index[0])],
+            "category": [str(df["Category"].value_counts().index[0])],
+            "date_start": str((last - pd.DateOffset(years=1)).date()),
+            "date_end": str(last.date()),
+        },
+    }
+
+
+def bench_services(raw: bytes, repeats: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    df = load_and_validate(raw, "bench.csv")
+    session = Session(df)
+    services = {
+        "load_and_validate": measure(lambda: load_and_validate(raw, "bench.csv"), repeats),
+        "Session": measure(lambda: Session(df), repeats),
+        "get_filter_options": measure(lambda: get_filter_options(df), repeats),
+    }
+    charts = {}
+    for scenario, filters in filter_sets(df).items():
+        view = session.view(filters)
+        distinct = view.distinct_counts()
+        services.update({
+            f"apply_filters[{scenario}]": measure(lambda: apply_filters(df, filters, session.index), repeats),
+            f"apply_filters_scan[{scenario}]": measure(lambda: apply_filters(df, filters), repeats),
+            f"session.view[{scenario}]": measure(lambda: session.view(filters), repeats),
+            f"facet_counts[{scenario}]": measure(lambda: session.index.facet_counts(filters), repeats),
+            f"distinct_counts[{scenario}]": measure(view.distinct_counts, repeats),
+            f"compute_kpis[{scenario}]": measure(lambda: compute_kpis(view.df, view.rollup, distinct), repeats),
+            f"compute_sparklines[{scenario}]": measure(lambda: compute_sparklines(view.df, view.rollup, distinct, view.periods), repeats),
+        })
+        for chart_id, _, builder, args in chart_specs(view.df, view.rollup, view.periods, view.products):
+            charts[f"{chart_id}[{scenario}]"] = measure(lambda: builder(*args), repeats)
+    return {"service": services, "chart": charts}
+
+
+def bench_routes(raw: bytes, repeats: int) -> Dict[str, Dict[str, float]]:
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+    def call(method: str, path: str, **kwargs: Any) -> httpx.Response:
+        response = loop.run_until_complete(client.request(method, path, **kwargs))
+        response.raise_for_status()
+        return response
+
+    def upload() -> httpx.Response:
+        return call("POST", "/api/upload", files={"file": ("bench.csv", io.BytesIO(raw), "text/csv")})
+
+    try:
+        routes = {"upload": measure(upload, repeats)}
+        session_id = upload().json()["session_id"]
+        df = load_and_validate(raw, "bench.csv")
+        for scenario, filters in filter_sets(df).items():
+            body = {"session_id": session_id, **filters}
+            routes[f"dashboard[{scenario}]"] = measure(lambda: call("POST", "/api/dashboard", json=body), repeats)
+            routes[f"dashboard_compact_gzip[{scenario}]"] = measure(lambda: call(
+                "POST", "/api/dashboard", json=body, headers={"Accept": COMPACT_MEDIA_TYPE, "Accept-Encoding": "gzip"},
+            ), repeats)
+            routes[f"chart[{scenario}]"] = measure(lambda: call("POST", "/api/chart", json={
+                **body, "chart_id": "dimension_explorer", "options": {"dimension": "market", "chart_type": "bar"},
+            }), repeats)
+            for fmt in ("csv", "parquet"):
+                routes[f"export_{fmt}[{scenario}]"] = measure(
+                    lambda: call("GET", f"/api/export/{session_id}", params={"format": fmt, **filters}), repeats
+                )
+        return routes
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+
+
+def run(raw: bytes, shape: Dict[str, Any], repeats: int) -> Dict[str, Any]:
+    results = bench_services(raw, repeats)
+    results["route"] = bench_routes(raw, repeats)
+    return {"shape": shape, "csv_mb": round(len(raw) / 2**20, 2), "results": results}
+
+
+def metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "seed": args.seed,
+    }
+
+
+def compare(runs: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    """Each median next to the baseline run of the same size."""
+    previous = {run["shape"]["rows"]: run["results"] for run in baseline["runs"]}
+    print(f"\nbaseline {baseline['meta'].get('commit')} → current")
+    for run in runs:
+        before = previous.get(run["shape"]["rows"])
+        if before is None:
+            continue
+        print(f"\n{run['shape']['rows']:,} rows{'':<34}{'before':>10}{'after':>10}{'ratio':>8}")
+        for group, timings in run["results"].items():
+            for name, timing in timings.items():
+                old = before.get(group, {}).get(name)
+                if old is None:
+                    continue
+                ratio = timing["median_ms"] / old["median_ms"] if old["median_ms"] else float("nan")
+                print(f"  {group + ':' + name:<42}{old['median_ms']:>10.1f}{timing['median_ms']:>10.1f}{ratio:>7.2f}x")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", help="benchmark this CSV instead of generated data")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore", FutureWarning)
+    warm_templates()
+
+    if args.data:
+        with open(args.data, "rb") as f:
+            raw = f.read()
+        # Data rows, assuming no quoted line breaks
+        datasets = [(raw, {"rows": raw.rstrip(b"\n").count(b"\n"), "path": args.data})]
+    else:
+        datasets = []
+        for rows in args.rows:
+            shape = Shape(rows)
+            with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+                write_csv(f.name, shape, args.seed)
+                datasets.append((f.read(), shape.as_dict()))
+
+    runs = []
+    for raw, shape in datasets:
+        start = time.perf_counter()
+        run_result = run(raw, shape, args.repeats)
+        runs.append(run_result)
+        print(f"{shape}: {time.perf_counter() - start:.1f}s")
+        for group, timings in run_result["results"].items():
+            for name, timing in timings.items():
+                print(f"  {group + ':' + name:<42}{timing['median_ms']:>10.1f} ms{timing['peak_mb']:>10.1f} MB")
+
+    report = {"meta": metadata(args), "runs": runs}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwritten to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(runs, json.load(f))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,9 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import upload, dashboard, chart
+from routers import upload, dashboard, chart, cache, sessions, metrics, filters
+from services.chart_builder import warm_templates
+from services import workers
+from services.metrics import TimingMiddleware
+from services.prefetch import ActivityMiddleware, prefetcher
 import os
 
-app = FastAPI(title="Executive BI Dashboard API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_templates()
+    prefetcher.start()
+    yield
+    await prefetcher.stop()
+    workers.shutdown()
+
+
+app = FastAPI(title="Executive BI Dashboard API", version="1.0.0", lifespan=lifespan)
 
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 
@@ -13,11 +28,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile"],
 )
+app.add_middleware(ActivityMiddleware)
+# Outermost, so its total covers the whole request
+app.add_middleware(TimingMiddleware)
 
 app.include_router(upload.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
 app.include_router(chart.router, prefix="/api")
+app.include_router(cache.router, prefix="/api")
+app.include_router(sessions.router, prefix="/api")
+app.include_router(filters.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 
 @app.get("/")
@@ -1,9 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
 
+# Session ids are the UUIDs issued at upload
+SESSION_ID_PATTERN = r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
+
+
 class FilterParams(BaseModel):
-    session_id: str
+    session_id: str = Field(pattern=SESSION_ID_PATTERN)
     date_start: Optional[str] = None
     date_end: Optional[str] = None
     category: Optional[List[str]] = None
@@ -20,6 +24,23 @@ class ChartRequest(FilterParams):
     options: Optional[Dict[str, Any]] = {}
 
 
+class ChartSpec(BaseModel):
+    chart_id: str
+    options: Optional[Dict[str, Any]] = {}
+
+
+class ChartBatchRequest(FilterParams):
+    charts: List[ChartSpec]
+    stream: bool = False         # NDJSON, one line per chart as it completes
+
+
+class DistinctCountInfo(BaseModel):
+    mode: str                # "exact" or "approximate"
+    relative_error: float    # HyperLogLog standard error; 0 for exact counts
+    total_orders_low: int
+    total_orders_high: int
+
+
 class KPIData(BaseModel):
     total_sales: float
     total_profit: float
@@ -29,6 +50,7 @@ class KPIData(BaseModel):
     avg_order_value: float
     total_shipping_cost: float
     avg_discount: float
+    distinct_counts: Optional[DistinctCountInfo] = None
 
 
 class ChartData(BaseModel):
@@ -37,6 +59,16 @@ class ChartData(BaseModel):
     figure_json: str
 
 
+class ChartError(BaseModel):
+    chart_id: str
+    detail: str
+
+
+class ChartBatchResponse(BaseModel):
+    charts: List[ChartData]      # in request order, without the failed ones
+    errors: List[ChartError] = []
+
+
 class FilterOptions(BaseModel):
     categories: List[str]
     sub_categories: Dict[str, List[str]]
@@ -48,6 +80,18 @@ class FilterOptions(BaseModel):
     date_range: Dict[str, str]
 
 
+class FacetCounts(BaseModel):
+    row_count: int                     # rows matching every filter
+    counts: Dict[str, Dict[str, int]]  # FilterParams field → value → rows it would match if chosen
+
+
+class IngestReport(BaseModel):
+    engine: str                  # "csv", "xlsx-stream", "calamine", "openpyxl", "xlrd", or "dedup" for a repeated upload
+    rows: int
+    stages_ms: Dict[str, float]  # e.g. hash / open / parse / assemble / convert
+    total_ms: float
+
+
 class UploadResponse(BaseModel):
     session_id: str
     kpis: KPIData
@@ -55,6 +99,7 @@ class UploadResponse(BaseModel):
     filter_options: FilterOptions
     row_count: int
     sparklines: Dict[str, List[float]] = {}
+    ingest: Optional[IngestReport] = None
 
 
 class DashboardResponse(BaseModel):
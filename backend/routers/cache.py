@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from services.cache import result_cache, in_flight
+from services.metrics import TimedRoute
+from services.prefetch import prefetcher
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    return {**result_cache.stats(), "single_flight": in_flight.stats()}
+
+
+@router.get("/prefetch/stats")
+def prefetch_stats():
+    return prefetcher.stats()
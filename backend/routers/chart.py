@@ -1,25 +1,98 @@
-from fastapi import APIRouter, HTTPException
-from models.schemas import ChartRequest, ChartData
-from services.data_processor import apply_filters
+from typing import Any, AsyncIterator, Dict, Tuple, Union
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from models.schemas import ChartRequest, ChartData, ChartBatchRequest, ChartBatchResponse, ChartError
 from services.chart_builder import build_single_chart
-from routers.upload import session_store
+from services.cache import result_cache, canonical_key, in_flight
+from services.workers import build_chart_batch, run_in_thread
+from services.session_store import session_store
+from services.encoding import encode
+from services.metrics import TimedRoute, chart_span
+from services.prefetch import prefetcher
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/chart", response_model=ChartData)
-async def get_single_chart(request: ChartRequest):
-    df = session_store.get(request.session_id)
-    if df is None:
+async def get_single_chart(request: ChartRequest, http_request: Request):
+    session = await run_in_thread(session_store.get, request.session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
 
     filters = request.model_dump(exclude={"session_id", "chart_id", "options"})
-    filtered_df = apply_filters(df.copy(), filters)
+    options = request.options or {}
+    key = canonical_key(request.session_id, "chart", filters, chart_id=request.chart_id, options=options)
+    cached = result_cache.get(key)
+    prefetcher.observe(key, cached is not None)
+    if cached is not None:
+        return encode(http_request, cached)
 
-    if len(filtered_df) == 0:
+    async def compute() -> ChartData:
+        view = await run_in_thread(session.view, filters)
+
+        if len(view.df) == 0:
+            raise HTTPException(status_code=422, detail="No data matches the selected filters.")
+
+        try:
+            with chart_span(request.chart_id):
+                # Off the event loop, so identical requests can join it meanwhile
+                chart = await run_in_thread(
+                    build_single_chart, view.df, request.chart_id, options, view.rollup, view.periods, view.products
+                )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        session_store.cache_result(request.session_id, session, key, chart)
+        return chart
+
+    return encode(http_request, await in_flight.run((key, id(session)), "chart", compute))
+
+
+@router.post("/charts/batch", response_model=ChartBatchResponse)
+async def get_chart_batch(request: ChartBatchRequest, http_request: Request):
+    """
+    Several charts under one filter state: the session is looked up and
+    filtered once, and the charts are built concurrently over that view.
+    Entries share /api/chart's cache. With stream=true the charts (or
+    ChartErrors) are sent as NDJSON lines in completion order.
+    """
+    session = await run_in_thread(session_store.get, request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
+
+    filters = request.model_dump(exclude={"session_id", "charts", "stream"})
+    # Repeated entries are built once
+    specs: Dict[str, Any] = {}
+    for spec in request.charts:
+        key = canonical_key(request.session_id, "chart", filters, chart_id=spec.chart_id, options=spec.options or {})
+        specs.setdefault(key, spec)
+    keys = list(specs)
+    cached = {key: result_cache.get(key) for key in keys}
+    pending = [key for key in keys if cached[key] is None]
+
+    view = await run_in_thread(session.view, filters) if pending else None
+    if view is not None and len(view.df) == 0:
         raise HTTPException(status_code=422, detail="No data matches the selected filters.")
 
-    try:
-        return build_single_chart(filtered_df, request.chart_id, request.options or {})
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
+    async def results() -> AsyncIterator[Tuple[str, Union[ChartData, ChartError]]]:
+        for key in keys:
+            if cached[key] is not None:
+                yield key, cached[key]
+        if pending:
+            async for position, result in build_chart_batch(view, [specs[key] for key in pending]):
+                if isinstance(result, ChartData):
+                    session_store.cache_result(request.session_id, session, pending[position], result)
+                yield pending[position], result
+
+    if request.stream:
+        async def lines() -> AsyncIterator[str]:
+            async for _, result in results():
+                yield result.model_dump_json() + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    done = {key: result async for key, result in results()}
+    ordered = [done[key] for key in keys]
+    return encode(http_request, ChartBatchResponse(
+        charts=[r for r in ordered if isinstance(r, ChartData)],
+        errors=[r for r in ordered if isinstance(r, ChartError)],
+    ))
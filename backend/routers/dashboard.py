@@ -1,26 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from models.schemas import FilterParams, DashboardResponse
-from services.data_processor import apply_filters, compute_kpis, compute_sparklines
-from services.chart_builder import build_all_charts
-from routers.upload import session_store
+from services.workers import build_dashboard, run_in_thread
+from services.cache import result_cache, canonical_key, in_flight
+from services.session_store import session_store
+from services.encoding import encode
+from services.metrics import TimedRoute
+from services.prefetch import prefetcher
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/dashboard", response_model=DashboardResponse)
-async def get_dashboard(params: FilterParams):
-    df = session_store.get(params.session_id)
-    if df is None:
+async def get_dashboard(params: FilterParams, request: Request):
+    session = await run_in_thread(session_store.get, params.session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
 
     filters = params.model_dump(exclude={"session_id"})
-    filtered_df = apply_filters(df.copy(), filters)
+    key = canonical_key(params.session_id, "dashboard", filters)
+    cached = result_cache.get(key)
+    prefetcher.observe(key, cached is not None)
+    if cached is not None:
+        return encode(request, cached)
 
-    if len(filtered_df) == 0:
-        raise HTTPException(status_code=422, detail="No data matches the selected filters.")
+    async def compute() -> DashboardResponse:
+        view = await run_in_thread(session.view, filters)
 
-    return DashboardResponse(
-        kpis=compute_kpis(filtered_df),
-        charts=build_all_charts(filtered_df),
-        sparklines=compute_sparklines(filtered_df),
-    )
+        if len(view.df) == 0:
+            raise HTTPException(status_code=422, detail="No data matches the selected filters.")
+
+        response, complete = await build_dashboard(view)
+        if complete:
+            session_store.cache_result(params.session_id, session, key, response)
+        return response
+
+    # Keyed by the session object as well, so a request after an append never joins a build over the old rows
+    return encode(request, await in_flight.run((key, id(session)), "dashboard", compute))
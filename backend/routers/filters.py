@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+from models.schemas import FilterParams, FacetCounts
+from services.workers import run_in_thread
+from services.cache import result_cache, canonical_key
+from services.session_store import session_store
+from services.metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.post("/filters/facets", response_model=FacetCounts)
+async def get_facets(params: FilterParams):
+    """Per-value row counts of each filter dimension under the other active filters."""
+    session = await run_in_thread(session_store.get, params.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
+
+    filters = params.model_dump(exclude={"session_id"})
+    key = canonical_key(params.session_id, "facets", filters)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    row_count, counts = await run_in_thread(session.index.facet_counts, filters)
+    response = FacetCounts(row_count=row_count, counts=counts)
+    session_store.cache_result(params.session_id, session, key, response)
+    return response
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.cache import result_cache
+from services.metrics import TimedRoute, registry
+from services.prefetch import prefetcher
+from services.session_store import session_store
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """This worker's timing histograms, plus the numeric session-store and cache stats as gauges."""
+    gauges = {}
+    for prefix, source, stats in (
+        ("dashboard_session_store", "/api/sessions/stats", session_store.stats()),
+        ("dashboard_result_cache", "/api/cache/stats", result_cache.stats()),
+        ("dashboard_prefetch", "/api/prefetch/stats", prefetcher.stats()),
+    ):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"{prefix}_{key}"] = (f"{key} in {source}.", value)
+    return PlainTextResponse(registry.render(gauges), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Path
+from models.schemas import SESSION_ID_PATTERN
+from services.session_store import session_store
+from services.metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/sessions/stats")
+def session_stats():
+    return session_store.stats()
+
+
+@router.delete("/sessions/{session_id}")
+def delete_session(session_id: str = Path(pattern=SESSION_ID_PATTERN)):
+    """Forget a session; a dataset it shares with identical uploads stays until their sessions go too."""
+    session_store.discard(session_id)
+    return {"deleted": session_id}
@@ -1,54 +1,196 @@
+import asyncio
+import logging
+import time
 import uuid
-import io
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import pandas as pd
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends, Request, Path
 from fastapi.responses import StreamingResponse
-from models.schemas import UploadResponse
-from services.data_processor import load_and_validate, compute_kpis, get_filter_options, apply_filters, compute_sparklines
-from services.chart_builder import build_all_charts
+from models.schemas import UploadResponse, IngestReport, DashboardResponse, SESSION_ID_PATTERN
+from services.data_processor import load_and_validate
+from services.session import Session
+from services.session_store import session_store
+from services.workers import build_dashboard, run_in_thread
+from services.cache import result_cache, canonical_key
+from services.export import stream_export, EXPORT_FORMATS
+from services.encoding import encode
+from services.fingerprint import fingerprint, UPLOAD_DEDUP
+from services.metrics import TimedRoute, registry
+from services.prefetch import prefetcher
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-# In-memory session store  { session_id: pd.DataFrame }
-session_store: dict = {}
+logger = logging.getLogger(__name__)
+
+
+# Appends to one session are applied one at a time, so none is lost. A session's
+# lock lives only while appends to it are running or waiting.
+_append_locks: Dict[str, asyncio.Lock] = {}
+_append_waiters: Counter = Counter()
 
 
 @router.post("/upload", response_model=UploadResponse)
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(request: Request, file: UploadFile = File(...)):
+    """
+    Parse a file into a new session. With UPLOAD_DEDUP, a file identical to
+    an earlier upload still held by the session store links the new session
+    to that upload's dataset and is answered from its cached response,
+    without parsing or building charts.
+    """
+    session_id = str(uuid.uuid4())
+    if not UPLOAD_DEDUP:
+        df, report = await _parse(file)
+        session = await run_in_thread(Session, df)
+        await run_in_thread(session_store.put, session_id, session)
+        return encode(request, await _upload_response(session_id, session, report))
+
+    _check_type(file)
+    start = time.perf_counter()
+    key = await run_in_thread(fingerprint, file.file, file.filename)
+    hash_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    session = await run_in_thread(session_store.link, session_id, key)
+    if session is not None:
+        registry.inc("dashboard_upload_dedup_total", "Uploads that reused an identical earlier upload's dataset.")
+        report = {"engine": "dedup", "rows": len(session.df), "stages_ms": {"hash": hash_ms}, "total_ms": hash_ms}
+        cached = result_cache.get(canonical_key(key, "upload", {}))
+        if cached is not None:
+            _seed_dashboard(session_id, session, cached)
+            prefetcher.schedule(session_id, session)
+            return encode(request, cached.model_copy(update={"session_id": session_id, "ingest": IngestReport(**report)}))
+        return encode(request, await _upload_response(session_id, session, report, key))
+
+    df, report = await _parse(file)
+    report["stages_ms"]["hash"] = hash_ms
+    session = await run_in_thread(Session, df)
+    await run_in_thread(session_store.put_dataset, key, session)
+    # Stored under its content key, so later identical uploads link to it too
+    session = await run_in_thread(session_store.link, session_id, key) or session
+    return encode(request, await _upload_response(session_id, session, report, key))
+
+
+@router.post("/upload/{session_id}/append", response_model=UploadResponse)
+async def append_file(request: Request, session_id: str = Path(pattern=SESSION_ID_PATTERN), file: UploadFile = File(...)):
+    """
+    Add rows to an existing session, e.g. a daily extract. The session's index,
+    cube, distinct-count state and filter options are extended from the new
+    rows only, and cached results for the session are dropped.
+    """
+    if await run_in_thread(session_store.get, session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
+    delta, report = await _parse(file)
+    async with _append_lock(session_id):
+        # Read again under the lock: an earlier append may have replaced it, or a delete removed it
+        session = await run_in_thread(session_store.get, session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
+        session = await run_in_thread(session.append, delta)
+        await run_in_thread(session_store.put, session_id, session)
+    return encode(request, await _upload_response(session_id, session, report))
+
+
+@asynccontextmanager
+async def _append_lock(session_id: str) -> AsyncIterator[None]:
+    lock = _append_locks.setdefault(session_id, asyncio.Lock())
+    _append_waiters[session_id] += 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _append_waiters[session_id] -= 1
+        if not _append_waiters[session_id]:
+            del _append_waiters[session_id], _append_locks[session_id]
+
+
+def _check_type(file: UploadFile) -> None:
     if not file.filename.lower().endswith((".csv", ".xlsx", ".xls")):
         raise HTTPException(status_code=400, detail="Only CSV or Excel files are accepted.")
 
-    contents = await file.read()
 
+async def _parse(file: UploadFile) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    _check_type(file)
+
+    # Parse straight from the spooled upload (on disk past 1 MB) rather than
+    # reading the whole body into memory first
+    report: Dict[str, Any] = {}
     try:
-        df = load_and_validate(contents, file.filename)
+        df = await run_in_thread(load_and_validate, file.file, file.filename, report)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc))
+    logger.info(
+        "ingested %s: %d rows via %s in %g ms %s",
+        file.filename, report["rows"], report["engine"], report["total_ms"], report["stages_ms"],
+    )
+    return df, report
 
-    session_id = str(uuid.uuid4())
-    session_store[session_id] = df
 
-    return UploadResponse(
+async def _upload_response(
+    session_id: str, session: Session, report: Dict[str, Any], dataset_key: Optional[str] = None,
+) -> UploadResponse:
+    """The initial dashboard of a new session; also cached for later uploads of dataset_key, if given."""
+    dashboard, complete = await build_dashboard(await run_in_thread(session.view, {}))
+    # The upload payload doubles as the unfiltered dashboard, e.g. after "Reset filters"
+    if complete:
+        session_store.cache_result(session_id, session, canonical_key(session_id, "dashboard", {}), dashboard)
+
+    response = UploadResponse(
         session_id=session_id,
-        kpis=compute_kpis(df),
-        charts=build_all_charts(df),
-        filter_options=get_filter_options(df),
-        row_count=len(df),
-        sparklines=compute_sparklines(df),
+        kpis=dashboard.kpis,
+        charts=dashboard.charts,
+        filter_options=session.filter_options,
+        row_count=len(session.df),
+        sparklines=dashboard.sparklines,
+        ingest=IngestReport(**report),
+    )
+    if complete and dataset_key is not None:
+        result_cache.put(canonical_key(dataset_key, "upload", {}), response)
+    # Runs once the server is idle, e.g. while the user reads this first dashboard
+    prefetcher.schedule(session_id, session)
+    return response
+
+
+def _seed_dashboard(session_id: str, session: Session, response: UploadResponse) -> None:
+    dashboard = DashboardResponse(kpis=response.kpis, charts=response.charts, sparklines=response.sparklines)
+    session_store.cache_result(session_id, session, canonical_key(session_id, "dashboard", {}), dashboard)
+
+
+def filter_query(
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    sub_category: Optional[List[str]] = Query(None),
+    market: Optional[List[str]] = Query(None),
+    region: Optional[List[str]] = Query(None),
+    segment: Optional[List[str]] = Query(None),
+    ship_mode: Optional[List[str]] = Query(None),
+    order_priority: Optional[List[str]] = Query(None),
+) -> Dict[str, Any]:
+    """FilterParams (minus session_id) from query parameters, e.g. ?market=EU&market=US."""
+    return dict(
+        date_start=date_start, date_end=date_end, category=category, sub_category=sub_category,
+        market=market, region=region, segment=segment, ship_mode=ship_mode, order_priority=order_priority,
     )
 
 
 @router.get("/export/{session_id}")
-async def export_csv(session_id: str):
-    df = session_store.get(session_id)
-    if df is None:
+async def export_data(
+    session_id: str = Path(pattern=SESSION_ID_PATTERN), format: str = "csv", filters: Dict[str, Any] = Depends(filter_query),
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format. Choose one of {list(EXPORT_FORMATS)}.")
+
+    session = await run_in_thread(session_store.get, session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found. Please re-upload the file.")
 
-    output = io.StringIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
+    # Only the selected row positions are resolved up front; rows are gathered batch by batch
+    rows = await run_in_thread(session.index.select, filters)
+    media_type, extension = EXPORT_FORMATS[format]
 
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=dashboard_data.csv"},
+        stream_export(session.df, rows, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=dashboard_data.{extension}"},
     )
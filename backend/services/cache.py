@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Hashable, Optional, Tuple, TypeVar
+from pydantic import BaseModel
+from services.metrics import span, registry
+
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "256"))
+# "1" lets concurrent identical requests share one computation
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") == "1"
+
+T = TypeVar("T")
+
+
+def canonical_key(session_id: str, kind: str, filters: Dict[str, Any], **extra: Any) -> Tuple[str, str]:
+    """
+    Cache key for one computed result. Filter lists are treated as sets and empty
+    filters are dropped, so equivalent FilterParams hash the same.
+    """
+    normalized = {}
+    for key, value in filters.items():
+        if value in (None, "", []):
+            continue
+        normalized[key] = sorted(value) if isinstance(value, list) else value
+    payload = json.dumps({"kind": kind, "filters": normalized, **extra}, sort_keys=True, default=str)
+    return session_id, hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded LRU of response models (DashboardResponse, ChartData, ...).
+
+    Entries are sized by their serialized JSON length and evicted least recently
+    used first once the byte budget is exceeded. Keys start with the session id
+    so a replaced or evicted session can drop all of its entries at once.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[BaseModel, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[BaseModel]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        # Unlike get, neither counted as a lookup nor refreshing the entry
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Tuple[str, str], value: BaseModel) -> None:
+        size = len(value.model_dump_json())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session_id]:
+                _, size = self._entries.pop(key)
+                self.bytes -= size
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+result_cache = ResultCache(int(RESULT_CACHE_MB * 1024 * 1024))
+
+
+class SingleFlight:
+    """
+    Concurrent computations of one key, run once: the first request computes,
+    and identical requests arriving before it finishes await the same result
+    (or exception) instead of filtering and building the same figures again.
+    Covers the window ResultCache cannot, while the first result is still
+    being built.
+
+    The computation runs as its own task, so it goes on for the waiting
+    requests if the one that started it is cancelled (e.g. a disconnect).
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.computations = 0
+        self.coalesced = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, kind: str, compute: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            self.computations += 1
+            return await compute()
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            registry.inc("dashboard_coalesced_requests_total", "Requests that awaited an identical one in flight.", kind=kind)
+            with span("coalesced"):
+                return await asyncio.shield(flight)
+
+        self.computations += 1
+        flight = asyncio.ensure_future(compute())
+        self._flights[key] = flight
+        flight.add_done_callback(lambda done: self._land(key, done))
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Retrieved here so an error nobody is left waiting for is not reported as unhandled
+            flight.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "computations": self.computations,
+            "coalesced": self.coalesced,
+        }
+
+
+in_flight = SingleFlight(SINGLE_FLIGHT)
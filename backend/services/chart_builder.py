@@ -1,15 +1,21 @@
+import logging
+import os
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional, Callable
 from models.schemas import ChartData
+from services.downsample import DensityGrid, downsample, order_points
+from services.figure_templates import SERIES, get_template
+from services.metrics import chart_failed, span
+from services.periods import PeriodBuckets
+from services.products import MAX_TOP_PRODUCTS_K, TOP_PRODUCTS_K, ProductTotals, top_products
 
 COLORS = px.colors.qualitative.Set2
 BLUE = "#4F81BD"
 ORANGE = "#F79646"
 
-FREQ_MAP = {"week": "W", "month": "M", "quarter": "Q"}
-
 DIMENSION_COL = {
     "category": "Category",
     "segment":  "Segment",
@@ -22,57 +28,135 @@ DIMENSION_LABELS = {
     "market":   "Market",
 }
 
+# "template" (default) renders figure_json from precompiled figure templates;
+# "plotly" builds every figure through plotly.express and fig.to_json().
+FIGURE_RENDERER = os.getenv("FIGURE_RENDERER", "template")
+
+# plotly.express defaults the scatter charts rely on
+SIZE_MAX = 20
+WEBGL_THRESHOLD = 1000
+
+logger = logging.getLogger(__name__)
 
-def _period_label(ts: pd.Timestamp, granularity: str) -> str:
-    if granularity == "week":
-        return ts.strftime("%d %b '%y")
-    elif granularity == "month":
-        return ts.strftime("%b %Y")
-    else:  # quarter
-        q = (ts.month - 1) // 3 + 1
-        return f"Q{q} {ts.year}"
 
+def _plain(frame: pd.DataFrame) -> pd.DataFrame:
+    # plotly.express expands categorical columns to every category, observed or not,
+    # so aggregated frames are handed over with plain object labels.
+    cat_cols = frame.select_dtypes("category").columns
+    return frame.astype({col: object for col in cat_cols})
 
-def build_all_charts(df: pd.DataFrame) -> List[ChartData]:
-    builders = [
-        ("sales_profit_trend", "Sales & Profit by Month",   lambda d: _sales_profit_trend(d, "month")),
-        ("dimension_explorer", "Sales by Category",         lambda d: _dimension_explorer(d, "category", "donut", "Sales")),
-        ("top_products",       "Top 10 Products by Profit", _top_products),
-        ("discount_vs_profit", "Discount vs Profit",        _discount_vs_profit),
-        ("ship_mode_priority", "Ship Mode & Order Priority", _ship_mode_priority),
+
+def chart_specs(
+    df: pd.DataFrame,
+    rollup: Optional[pd.DataFrame] = None,
+    periods: Optional[PeriodBuckets] = None,
+    products: Optional[ProductTotals] = None,
+) -> List[tuple]:
+    """
+    (chart_id, title, builder, args) for each dashboard chart; builder(*args)
+    returns figure_json. `products` may be given when it totals exactly df.
+    """
+    # Charts that only sum Sales/Profit read the filtered rollup cells when available
+    sums = rollup if rollup is not None else df
+    return [
+        ("sales_profit_trend", "Sales & Profit by Month",    _sales_profit_trend,  (sums, "month", periods)),
+        ("dimension_explorer", "Sales by Category",          _dimension_explorer,  (sums, "category", "donut", "Sales")),
+        ("top_products",       f"Top {TOP_PRODUCTS_K} Products by Profit", _top_products, (df, TOP_PRODUCTS_K, products)),
+        ("discount_vs_profit", "Discount vs Profit",         _discount_vs_profit,  (df,)),
+        ("ship_mode_priority", "Ship Mode & Order Priority", _ship_mode_priority,  (sums,)),
     ]
 
+
+def build_all_charts(
+    df: pd.DataFrame,
+    rollup: Optional[pd.DataFrame] = None,
+    periods: Optional[PeriodBuckets] = None,
+    products: Optional[ProductTotals] = None,
+) -> List[ChartData]:
     charts = []
-    for chart_id, title, builder in builders:
+    for chart_id, title, builder, args in chart_specs(df, rollup, periods, products):
         try:
-            fig = builder(df)
-            _apply_base_layout(fig)
-            charts.append(ChartData(chart_id=chart_id, title=title, figure_json=fig.to_json()))
-        except Exception as e:
-            print(f"[chart_builder] {chart_id} failed: {e}")
+            charts.append(ChartData(chart_id=chart_id, title=title, figure_json=builder(*args)))
+        except Exception:
+            logger.exception("%s failed", chart_id)
+            chart_failed(chart_id, "error")
     return charts
 
 
-def build_single_chart(df: pd.DataFrame, chart_id: str, options: Dict[str, Any]) -> ChartData:
+def build_single_chart(
+    df: pd.DataFrame,
+    chart_id: str,
+    options: Dict[str, Any],
+    rollup: Optional[pd.DataFrame] = None,
+    periods: Optional[PeriodBuckets] = None,
+    products: Optional[ProductTotals] = None,
+) -> ChartData:
     """Rebuild one specific chart with visual-level options."""
+    sums = rollup if rollup is not None else df
     if chart_id == "sales_profit_trend":
         granularity = options.get("granularity", "month")
         gran_label = {"week": "by Week", "month": "by Month", "quarter": "by Quarter"}[granularity]
         title = f"Sales & Profit {gran_label}"
-        fig = _sales_profit_trend(df, granularity)
+        # Rollup cells are dated by month, so weeks are summed from the raw rows
+        figure_json = _sales_profit_trend(df if granularity == "week" else sums, granularity, periods)
 
     elif chart_id == "dimension_explorer":
         dimension  = options.get("dimension", "category")
         chart_type = options.get("chart_type", "donut")
         metric     = options.get("metric", "Sales")
         title = f"{metric} by {DIMENSION_LABELS.get(dimension, dimension.title())}"
-        fig = _dimension_explorer(df, dimension, chart_type, metric)
+        figure_json = _dimension_explorer(sums, dimension, chart_type, metric)
+
+    elif chart_id == "top_products":
+        k = options.get("top_k", TOP_PRODUCTS_K)
+        if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_TOP_PRODUCTS_K:
+            raise ValueError(f"top_k must be an integer from 1 to {MAX_TOP_PRODUCTS_K}.")
+        title = f"Top {k} Products by Profit"
+        figure_json = _top_products(df, k, products)
+
+    elif chart_id == "discount_vs_profit":
+        point_budget = options.get("point_budget")
+        if point_budget is not None and (not isinstance(point_budget, int) or point_budget < 1):
+            raise ValueError("point_budget must be a positive integer.")
+        title = "Discount vs Profit"
+        figure_json = _discount_vs_profit(df, point_budget)
 
     else:
         raise ValueError(f"Chart '{chart_id}' does not support per-chart options.")
 
+    return ChartData(chart_id=chart_id, title=title, figure_json=figure_json)
+
+
+def warm_templates() -> None:
+    """Capture every figure template up front so no request pays for plotly.express."""
+    _trend_template()
+    for col in DIMENSION_COL.values():
+        for metric in ("Sales", "Profit"):
+            for chart_type in ("donut", "treemap", "bar"):
+                _dimension_template(col, chart_type, metric)
+    _top_products_template()
+    _discount_template(webgl=False)
+    _discount_template(webgl=True)
+    _ship_mode_template()
+
+
+def _render(figure: Callable[..., go.Figure], fast: Callable[..., str], *args: Any) -> str:
+    """figure_json for one chart, from its template or from the plotly figure itself."""
+    if FIGURE_RENDERER == "template":
+        with span("render"):
+            return fast(*args)
+    fig = figure(*args)
+    with span("render"):
+        return _figure_json(fig)
+
+
+def _figure_json(fig: go.Figure) -> str:
+    return _styled(fig).to_json()
+
+
+def _styled(fig: go.Figure) -> go.Figure:
     _apply_base_layout(fig)
-    return ChartData(chart_id=chart_id, title=title, figure_json=fig.to_json())
+    return fig
 
 
 def _apply_base_layout(fig: go.Figure) -> None:
@@ -92,20 +176,23 @@ def _apply_base_layout(fig: go.Figure) -> None:
     )
 
 
+def _groups(labels: pd.Series) -> List[tuple]:
+    """(label, row positions) per distinct label in order of first appearance, as px splits traces."""
+    codes, uniques = pd.factorize(labels)
+    return [(label, (codes == i).nonzero()[0]) for i, label in enumerate(uniques)]
+
+
 # ── Chart 1: Sales & Profit Trend (with granularity) ──────────────────────────
-def _sales_profit_trend(df: pd.DataFrame, granularity: str = "month") -> go.Figure:
-    df = df.copy()
-    freq = FREQ_MAP.get(granularity, "M")
-    df["Period"] = df["Order Date"].dt.to_period(freq).dt.to_timestamp()
-
-    grouped = (
-        df.groupby("Period")
-        .agg(Sales=("Sales", "sum"), Profit=("Profit", "sum"))
-        .reset_index()
-        .sort_values("Period")
-    )
-    grouped["Label"] = grouped["Period"].apply(lambda ts: _period_label(ts, granularity))
+def _sales_profit_trend(df: pd.DataFrame, granularity: str = "month", periods: Optional[PeriodBuckets] = None) -> str:
+    # Sums per bucket id from the session's period lookup; built on the spot when there is no session
+    periods = periods or PeriodBuckets(df["Order Date"])
+    ids = periods.of(df["Order Date"], granularity)
+    present, (sales, profit) = periods.totals(ids, granularity, df["Sales"], df["Profit"])
+    grouped = pd.DataFrame({"Label": periods.labels[granularity][present], "Sales": sales, "Profit": profit})
+    return _render(_sales_profit_trend_figure, _sales_profit_trend_fast, grouped)
+
 
+def _sales_profit_trend_figure(grouped: pd.DataFrame) -> go.Figure:
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=grouped["Label"], y=grouped["Sales"],
@@ -126,27 +213,51 @@ def _sales_profit_trend(df: pd.DataFrame, granularity: str = "month") -> go.Figu
     return fig
 
 
+def _trend_template():
+    sample = pd.DataFrame({"Label": [SERIES], "Sales": [0.0], "Profit": [0.0]})
+    return get_template("sales_profit_trend", lambda: _styled(_sales_profit_trend_figure(sample)))
+
+
+def _sales_profit_trend_fast(grouped: pd.DataFrame) -> str:
+    template = _trend_template()
+    labels = grouped["Label"].tolist()
+    return template.render([
+        template.trace(0, x=labels, y=grouped["Sales"].to_numpy()),
+        template.trace(1, x=labels, y=grouped["Profit"].to_numpy()),
+    ])
+
+
 # ── Chart 2: Dimension Explorer (Category / Segment / Market × Donut / Treemap / Bar × Sales / Profit) ──
 def _dimension_explorer(
     df: pd.DataFrame,
     dimension: str = "category",
     chart_type: str = "donut",
     metric: str = "Sales",
-) -> go.Figure:
+) -> str:
     col = DIMENSION_COL.get(dimension, "Category")
     metric_col = metric  # "Sales" or "Profit"
-    prefix = "$"
 
     data = (
-        df.groupby(col)[metric_col]
+        df.groupby(col, observed=True)[metric_col]
         .sum()
         .reset_index()
         .rename(columns={metric_col: metric_col})
+        .pipe(_plain)
     )
 
-    if chart_type == "donut":
-        # Filter out non-positive values for pie charts
+    if chart_type in ("donut", "treemap"):
+        # Filter out non-positive values for pie and treemap charts
         plot_data = data[data[metric_col] > 0]
+    else:  # bar
+        plot_data = data.sort_values(metric_col, ascending=True)
+    return _render(_dimension_explorer_figure, _dimension_explorer_fast, plot_data, col, chart_type, metric)
+
+
+def _dimension_explorer_figure(plot_data: pd.DataFrame, col: str, chart_type: str, metric: str) -> go.Figure:
+    metric_col = metric
+    prefix = "$"
+
+    if chart_type == "donut":
         fig = px.pie(
             plot_data, values=metric_col, names=col,
             hole=0.48, color_discrete_sequence=COLORS,
@@ -158,7 +269,6 @@ def _dimension_explorer(
         )
 
     elif chart_type == "treemap":
-        plot_data = data[data[metric_col] > 0]
         fig = px.treemap(
             plot_data, path=[col], values=metric_col,
             color=col, color_discrete_sequence=COLORS,
@@ -171,7 +281,6 @@ def _dimension_explorer(
         fig.update_layout(margin=dict(l=8, r=8, t=8, b=8))
 
     else:  # bar
-        plot_data = data.sort_values(metric_col, ascending=True)
         fig = px.bar(
             plot_data, x=metric_col, y=col, orientation="h",
             color=col, color_discrete_sequence=COLORS,
@@ -186,16 +295,59 @@ def _dimension_explorer(
     return fig
 
 
-# ── Chart 3: Top 10 Products by Profit ────────────────────────────────────────
-def _top_products(df: pd.DataFrame) -> go.Figure:
-    prod = (
-        df.groupby("Product Name")
-        .agg(Profit=("Profit", "sum"), Sales=("Sales", "sum"))
-        .reset_index()
-        .nlargest(10, "Profit")
-        .sort_values("Profit", ascending=True)
+def _dimension_template(col: str, chart_type: str, metric: str):
+    sample = pd.DataFrame({col: [SERIES], metric: [1.0]})
+    return get_template(
+        ("dimension_explorer", col, chart_type, metric),
+        lambda: _styled(_dimension_explorer_figure(sample, col, chart_type, metric)),
     )
+
+
+def _dimension_explorer_fast(plot_data: pd.DataFrame, col: str, chart_type: str, metric: str) -> str:
+    template = _dimension_template(col, chart_type, metric)
+
+    if chart_type == "donut":
+        return template.render([
+            template.trace(labels=plot_data[col].tolist(), values=plot_data[metric].to_numpy()),
+        ])
+
+    if chart_type == "treemap":
+        # Node order as px.treemap builds it: labels grouped (sorted), then sorted
+        # by the input's color column taken row by row.
+        nodes = plot_data.groupby(col)[metric].sum().reset_index()
+        nodes["order"] = plot_data[col].astype(str).to_numpy()
+        nodes = nodes.sort_values("order")
+        labels = nodes[col].astype(str).tolist()
+        color_of = {label: COLORS[i % len(COLORS)] for i, label in enumerate(pd.unique(nodes[col]))}
+        return template.render([
+            template.trace(
+                customdata=[[label] for label in nodes[col].tolist()],
+                ids=labels,
+                labels=labels,
+                marker=dict(colors=[color_of[label] for label in nodes[col].tolist()]),
+                parents=[""] * len(labels),
+                values=nodes[metric].to_numpy(),
+            ),
+        ])
+
+    # bar: one single-bar trace per label, colored in order of appearance
+    labels = plot_data[col].tolist()
+    values = plot_data[metric].to_numpy()
+    traces = [
+        template.trace(series=label, marker=dict(color=COLORS[i % len(COLORS)]), x=values[rows], y=[label])
+        for i, (label, rows) in enumerate(_groups(plot_data[col]))
+    ]
+    return template.render(traces, template.patch_layout([SERIES], labels[::-1]))
+
+
+# ── Chart 3: Top 10 Products by Profit ────────────────────────────────────────
+def _top_products(df: pd.DataFrame, k: int = TOP_PRODUCTS_K, products: Optional[ProductTotals] = None) -> str:
+    prod = top_products(df, k, products)
     prod["Label"] = prod["Product Name"].str[:38].str.strip() + "…"
+    return _render(_top_products_figure, _top_products_fast, prod)
+
+
+def _top_products_figure(prod: pd.DataFrame) -> go.Figure:
     fig = px.bar(
         prod, x="Profit", y="Label", orientation="h",
         color="Profit", color_continuous_scale="RdYlGn",
@@ -210,16 +362,33 @@ def _top_products(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
+def _top_products_template():
+    sample = pd.DataFrame({"Product Name": [SERIES], "Profit": [1.0], "Sales": [1.0], "Label": [SERIES]})
+    return get_template("top_products", lambda: _styled(_top_products_figure(sample)))
+
+
+def _top_products_fast(prod: pd.DataFrame) -> str:
+    template = _top_products_template()
+    profit = prod["Profit"].to_numpy()
+    return template.render([
+        template.trace(
+            customdata=[[name] for name in prod["Product Name"].tolist()],
+            marker=dict(color=profit),
+            x=profit,
+            y=prod["Label"].tolist(),
+        ),
+    ])
+
+
 # ── Chart 4: Discount vs Profit ────────────────────────────────────────────────
-def _discount_vs_profit(df: pd.DataFrame) -> go.Figure:
-    order_data = (
-        df.groupby(["Order ID", "Category"])
-        .agg(Discount=("Discount", "mean"), Profit=("Profit", "sum"), Sales=("Sales", "sum"))
-        .reset_index()
-    )
-    # Cap at 3 000 points — keeps Plotly JSON small and rendering fast
-    if len(order_data) > 3000:
-        order_data = order_data.sample(3000, random_state=42)
+def _discount_vs_profit(df: pd.DataFrame, point_budget: Optional[int] = None) -> str:
+    # A fixed point budget keeps Plotly JSON small and rendering fast; extremes are
+    # always drawn and the density layer accounts for every order
+    sample = downsample(order_points(df), point_budget)
+    return _render(_discount_vs_profit_figure, _discount_vs_profit_fast, sample.points.pipe(_plain), sample.density)
+
+
+def _discount_vs_profit_figure(order_data: pd.DataFrame, density: DensityGrid) -> go.Figure:
     fig = px.scatter(
         order_data, x="Discount", y="Profit",
         color="Category", size="Sales",
@@ -228,6 +397,14 @@ def _discount_vs_profit(df: pd.DataFrame) -> go.Figure:
         hover_data={"Order ID": True, "Sales": ":,.0f", "Profit": ":,.0f"},
     )
     fig.update_traces(marker=dict(line=dict(width=0.5, color="rgba(255,255,255,0.4)")))
+    # Density of all orders, drawn underneath the sampled points
+    fig.add_trace(go.Heatmap(
+        x=density.x, y=density.y, z=_density_z(density),
+        colorscale=[[0, "rgba(79,129,189,0.06)"], [1, "rgba(79,129,189,0.45)"]],
+        showscale=False, name="Order density",
+        hovertemplate="%{z:,} orders<extra></extra>",
+    ))
+    fig.data = fig.data[-1:] + fig.data[:-1]
     fig.update_xaxes(tickformat=".0%", title_text="Discount Rate", showgrid=False)
     fig.update_yaxes(showgrid=False, tickprefix="$")
     fig.add_hline(
@@ -237,13 +414,55 @@ def _discount_vs_profit(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
+def _density_z(density: DensityGrid) -> np.ndarray:
+    # Empty cells stay transparent
+    return np.where(density.counts > 0, density.counts, np.nan)
+
+
+def _discount_template(webgl: bool):
+    # px switches to scattergl above WEBGL_THRESHOLD points, so both trace types are captured
+    rows = WEBGL_THRESHOLD + 1 if webgl else 1
+    sample = pd.DataFrame({
+        "Order ID": [SERIES] * rows, "Category": [SERIES] * rows,
+        "Discount": [0.0] * rows, "Profit": [0.0] * rows, "Sales": [1.0] * rows,
+    })
+    density = DensityGrid(np.zeros(1), np.zeros(1), np.ones((1, 1)))
+    return get_template(("discount_vs_profit", webgl), lambda: _styled(_discount_vs_profit_figure(sample, density)))
+
+
+def _discount_vs_profit_fast(order_data: pd.DataFrame, density: DensityGrid) -> str:
+    template = _discount_template(webgl=len(order_data) > WEBGL_THRESHOLD)
+    sizeref = order_data["Sales"].max() / SIZE_MAX ** 2
+    order_ids = order_data["Order ID"].to_numpy()
+    discount = order_data["Discount"].to_numpy()
+    profit = order_data["Profit"].to_numpy()
+    sales = order_data["Sales"].to_numpy()
+
+    traces = [template.trace(0, x=density.x, y=density.y, z=_density_z(density))]
+    for i, (category, rows) in enumerate(_groups(order_data["Category"])):
+        traces.append(template.trace(
+            1,
+            series=category,
+            customdata=[[oid, s] for oid, s in zip(order_ids[rows].tolist(), sales[rows].tolist())],
+            marker=dict(color=COLORS[i % len(COLORS)], size=sales[rows], sizeref=sizeref),
+            x=discount[rows],
+            y=profit[rows],
+        ))
+    return template.render(traces)
+
+
 # ── Chart 5: Ship Mode & Order Priority ───────────────────────────────────────
-def _ship_mode_priority(df: pd.DataFrame) -> go.Figure:
+def _ship_mode_priority(df: pd.DataFrame) -> str:
     data = (
-        df.groupby(["Ship Mode", "Order Priority"])["Sales"]
+        df.groupby(["Ship Mode", "Order Priority"], observed=True)["Sales"]
         .sum()
         .reset_index()
+        .pipe(_plain)
     )
+    return _render(_ship_mode_priority_figure, _ship_mode_priority_fast, data)
+
+
+def _ship_mode_priority_figure(data: pd.DataFrame) -> go.Figure:
     fig = px.bar(
         data, x="Ship Mode", y="Sales", color="Order Priority",
         barmode="stack", color_discrete_sequence=COLORS,
@@ -254,3 +473,24 @@ def _ship_mode_priority(df: pd.DataFrame) -> go.Figure:
     fig.update_xaxes(showgrid=False)
     fig.update_yaxes(showgrid=False, tickprefix="$")
     return fig
+
+
+def _ship_mode_template():
+    sample = pd.DataFrame({"Ship Mode": [SERIES], "Order Priority": [SERIES], "Sales": [1.0]})
+    return get_template("ship_mode_priority", lambda: _styled(_ship_mode_priority_figure(sample)))
+
+
+def _ship_mode_priority_fast(data: pd.DataFrame) -> str:
+    template = _ship_mode_template()
+    ship_modes = data["Ship Mode"].to_numpy()
+    sales = data["Sales"].to_numpy()
+    traces = [
+        template.trace(
+            series=priority,
+            marker=dict(color=COLORS[i % len(COLORS)]),
+            x=ship_modes[rows].tolist(),
+            y=sales[rows],
+        )
+        for i, (priority, rows) in enumerate(_groups(data["Order Priority"]))
+    ]
+    return template.render(traces)
@@ -1,7 +1,18 @@
+import importlib.util
 import io
+import logging
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, Tuple, Union, BinaryIO, List
 from models.schemas import KPIData, FilterOptions
+from services.filter_index import FilterIndex
+from services.distinct import DistinctCounts
+from services.metrics import timed
+from services.periods import PeriodBuckets
+from services.xlsx_reader import XlsxSheet, XlsxUnsupported
 
 REQUIRED_COLUMNS = [
     "Row ID", "Order ID", "Order Date", "Ship Date", "Ship Mode",
@@ -12,30 +23,266 @@ REQUIRED_COLUMNS = [
 ]
 
 
-def load_and_validate(file_bytes: bytes, filename: str) -> pd.DataFrame:
+# Text columns are dictionary-encoded at ingest so that filters, groupbys and
+# chart aggregations run on integer codes instead of Python strings.
+DIMENSION_COLUMNS = [
+    "Order ID", "Ship Mode", "Customer ID", "Customer Name", "Segment", "City",
+    "State", "Country", "Market", "Region", "Product ID", "Category",
+    "Sub-Category", "Product Name", "Order Priority",
+]
+DATE_COLUMNS = ["Order Date", "Ship Date"]
+MEASURE_COLUMNS = ["Sales", "Quantity", "Discount", "Profit", "Shipping Cost"]
+# Whole-number columns are downcast to the smallest int type. Monetary measures and
+# Discount stay float64 so totals and chart values are unchanged.
+INTEGER_COLUMNS = ["Row ID", "Quantity"]
+
+# CSV uploads are parsed this many rows at a time, so only one chunk of raw
+# text columns is alive at once next to the typed columns built so far.
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "200000"))
+
+# "auto" (default): .xlsx files are read by the streaming reader in
+# services/xlsx_reader.py, which keeps REQUIRED_COLUMNS only and types them as
+# it goes; .xls files, and workbooks it cannot read, go through pandas.read_excel
+# (with python-calamine when installed). "pandas": always pandas.read_excel.
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")
+HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+
+logger = logging.getLogger(__name__)
+
+
+def load_and_validate(
+    source: Union[bytes, BinaryIO], filename: str, report: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """
+    Parse and type an upload, given as bytes or as a binary file object.
+    A `report` dict, when given, receives the reader engine and per-stage timings.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    started = time.perf_counter()
+    stages: Dict[str, float] = {}
+
     if filename.lower().endswith(".csv"):
-        df = pd.read_csv(io.BytesIO(file_bytes))
+        df, engine = _read_csv(source, stages), "csv"
     else:
-        df = pd.read_excel(io.BytesIO(file_bytes))
+        df, engine = _read_excel(source, filename, stages)
 
-    df.columns = df.columns.str.strip()
+    with _stage(stages, "convert"):
+        for col in DATE_COLUMNS:
+            df[col] = _parse_dates(df[col])
+
+        for col in MEASURE_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+        for col in INTEGER_COLUMNS:
+            df[col] = _downcast_integer(df[col])
 
-    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        for col in DIMENSION_COLUMNS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+
+        df.dropna(subset=["Order Date"], inplace=True)
+
+    if report is not None:
+        report.update(
+            engine=engine,
+            rows=len(df),
+            stages_ms=stages,
+            total_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+    return df
+
+
+@contextmanager
+def _stage(stages: Dict[str, float], name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    yield
+    stages[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _check_columns(columns: pd.Index) -> None:
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
 
-    df["Order Date"] = pd.to_datetime(df["Order Date"], dayfirst=False, errors="coerce")
-    df["Ship Date"] = pd.to_datetime(df["Ship Date"], dayfirst=False, errors="coerce")
 
-    for col in ["Sales", "Quantity", "Discount", "Profit", "Shipping Cost"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+def _read_csv(source: BinaryIO, stages: Dict[str, float]) -> pd.DataFrame:
+    # Validate the header before any of the body is parsed. The raw (unstripped)
+    # names also key the dtypes.
+    header = pd.read_csv(source, nrows=0).columns
+    _check_columns(header.str.strip())
+    source.seek(0)
 
-    df.dropna(subset=["Order Date"], inplace=True)
+    typed = set(DIMENSION_COLUMNS) | set(DATE_COLUMNS)
+    dtype = {raw: "category" for raw in header if raw.strip() in typed}
 
-    return df
+    # Each chunk is reduced to typed columns straight away: text columns arrive as
+    # categoricals and measures are made numeric, so raw strings never pile up.
+    pieces: Dict[str, List[pd.Series]] = {col: [] for col in header.str.strip()}
+    with _stage(stages, "parse"):
+        for chunk in pd.read_csv(source, dtype=dtype, chunksize=CSV_CHUNK_ROWS, low_memory=False):
+            chunk.columns = chunk.columns.str.strip()
+            for col in MEASURE_COLUMNS:
+                chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+            for col in chunk.columns:
+                pieces[col].append(chunk[col])
+
+    with _stage(stages, "assemble"):
+        return _assemble(pieces, typed)
+
+
+def _read_excel(source: BinaryIO, filename: str, stages: Dict[str, float]) -> Tuple[pd.DataFrame, str]:
+    if EXCEL_ENGINE == "auto" and filename.lower().endswith(".xlsx"):
+        try:
+            return _read_xlsx(source, stages), "xlsx-stream"
+        except XlsxUnsupported as exc:
+            logger.info("streaming .xlsx reader not applicable (%s), using pandas", exc)
+            source.seek(0)
+            stages.clear()
+
+    engine = "calamine" if HAS_CALAMINE else None
+    with _stage(stages, "read"):
+        df = pd.read_excel(source, engine=engine, usecols=lambda name: str(name).strip() in REQUIRED_COLUMNS)
+    df.columns = df.columns.str.strip()
+    _check_columns(df.columns)
+    return df, engine or ("xlrd" if filename.lower().endswith(".xls") else "openpyxl")
+
+
+def _read_xlsx(source: BinaryIO, stages: Dict[str, float]) -> pd.DataFrame:
+    with _stage(stages, "open"):
+        sheet = XlsxSheet(source)
+    _check_columns(pd.Index(sheet.header))
+
+    kinds = {}
+    for col in REQUIRED_COLUMNS:
+        if col in DIMENSION_COLUMNS:
+            kinds[col] = "category"
+        elif col in MEASURE_COLUMNS:
+            kinds[col] = "float"
+        elif col in DATE_COLUMNS:
+            kinds[col] = "datetime"
+        else:
+            kinds[col] = "auto"
+
+    pieces: Dict[str, List[pd.Series]] = {col: [] for col in REQUIRED_COLUMNS}
+    with _stage(stages, "parse"):
+        for chunk in sheet.chunks(kinds):
+            for col in chunk.columns:
+                pieces[col].append(chunk[col])
+
+    with _stage(stages, "assemble"):
+        return _assemble(pieces, set(DIMENSION_COLUMNS) | set(DATE_COLUMNS))
+
+
+def _assemble(pieces: Dict[str, List[pd.Series]], typed: set) -> pd.DataFrame:
+    # Column by column, releasing each column's chunks as it is merged
+    columns = {}
+    for col in list(pieces):
+        parts = pieces.pop(col)
+        if not parts:
+            columns[col] = pd.Series(dtype="category" if col in typed else object)
+        elif isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[col] = _concat_categoricals(parts)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _concat_categoricals(parts: List[pd.Series]) -> pd.Series:
+    """
+    Join per-chunk categoricals under one sorted category set, as a single-pass
+    read_csv would produce. Each chunk's categories are already sorted, so a
+    stable sort of their concatenation only merges runs; each category's rank
+    in the merged order then remaps that chunk's codes.
+    """
+    merged = np.concatenate([part.cat.categories.to_numpy() for part in parts])
+    order = np.argsort(merged, kind="stable")
+    ordered = merged[order]
+    first = np.r_[True, ordered[1:] != ordered[:-1]] if len(ordered) else np.zeros(0, dtype=bool)
+    rank = np.empty(len(merged), dtype=np.int64)
+    rank[order] = np.cumsum(first) - 1
+
+    codes, start = [], 0
+    for part in parts:
+        n = len(part.cat.categories)
+        # The trailing -1 keeps missing values (code -1) missing
+        mapping = np.append(rank[start:start + n], -1)
+        codes.append(mapping[part.cat.codes.to_numpy()])
+        start += n
+    categories = pd.Index(ordered[first])
+    return pd.Series(pd.Categorical.from_codes(np.concatenate(codes), dtype=pd.CategoricalDtype(categories)))
+
+
+def append_rows(df: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of `df` followed by those of `delta`, typed as one upload of both would
+    be: categorical columns share one sorted category set. Columns the delta
+    lacks are left missing for its rows; columns only the delta has are dropped.
+    """
+    columns = {}
+    for col in df.columns:
+        part = delta[col] if col in delta else pd.Series(np.nan, index=delta.index)
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if not isinstance(part.dtype, pd.CategoricalDtype):
+                part = part.astype("category")
+            columns[col] = _append_categorical(df[col], part)
+        else:
+            columns[col] = pd.concat([df[col], part], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _append_categorical(col: pd.Series, tail: pd.Series) -> pd.Series:
+    """
+    _concat_categoricals for a long column and a short tail. Only the tail's
+    categories are binary-searched in the existing sorted ones; existing codes
+    then shift up by the number of new values inserted before them.
+    """
+    known, added = col.cat.categories, tail.cat.categories
+    at = known.searchsorted(added)
+    found = np.zeros(len(added), dtype=bool)
+    inside = at < len(known)
+    found[inside] = known[at[inside]] == added[inside]
 
+    inserted_at = at[~found]
+    if len(inserted_at):
+        dtype = pd.CategoricalDtype(pd.Index(np.insert(known.to_numpy(), inserted_at, added[~found].to_numpy())))
+    else:
+        dtype = col.dtype
+    categories = dtype.categories
+    positions = np.arange(len(known))
+    # The trailing -1 keeps missing values (code -1) missing
+    shifted = np.append(positions + np.searchsorted(inserted_at, positions, side="right"), -1)
+    tail_codes = np.append(categories.searchsorted(added), -1)
+    codes = np.concatenate([shifted[col.cat.codes.to_numpy()], tail_codes[tail.cat.codes.to_numpy()]])
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype, validate=False))
+
+
+def _parse_dates(col: pd.Series) -> pd.Series:
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # Parse each distinct date string once, then broadcast through the codes
+        parsed = pd.to_datetime(col.cat.categories, dayfirst=False, errors="coerce")
+        codes = col.cat.codes.to_numpy()
+        values = parsed.take(codes).to_numpy()
+        values[codes == -1] = None
+        return pd.Series(values, index=col.index, name=col.name)
+    return pd.to_datetime(col, dayfirst=False, errors="coerce")
+
+
+def _downcast_integer(col: pd.Series) -> pd.Series:
+    numeric = pd.to_numeric(col, errors="coerce")
+    if numeric.isna().any() or not (numeric % 1 == 0).all():
+        return col
+    return pd.to_numeric(numeric, downcast="integer")
+
+
+@timed("apply_filters")
+def apply_filters(df: pd.DataFrame, filters: Dict[str, Any], index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    # With a session index the selected rows are gathered once; an unfiltered
+    # request gets the session frame itself, which callers must not mutate.
+    if index is not None:
+        rows = index.select(filters)
+        return df if rows is None else df.take(rows)
 
-def apply_filters(df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
     if filters.get("date_start"):
         df = df[df["Order Date"] >= pd.to_datetime(filters["date_start"])]
     if filters.get("date_end"):
@@ -57,19 +304,34 @@ def apply_filters(df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
     return df
 
 
-def compute_kpis(df: pd.DataFrame) -> KPIData:
-    total_sales = round(float(df["Sales"].sum()), 2)
-    total_profit = round(float(df["Profit"].sum()), 2)
+@timed("compute_kpis")
+def compute_kpis(
+    df: pd.DataFrame,
+    rollup: Optional[pd.DataFrame] = None,
+    distinct: Optional[DistinctCounts] = None,
+) -> KPIData:
+    # Additive measures come from the filtered rollup cells when the session has a
+    # cube; distinct orders and repeat customers come from the session's distinct
+    # counts when given, otherwise from the raw rows.
+    sums = rollup if rollup is not None else df
+    total_sales = round(float(sums["Sales"].sum()), 2)
+    total_profit = round(float(sums["Profit"].sum()), 2)
     profit_margin = round((total_profit / total_sales * 100) if total_sales > 0 else 0.0, 2)
-    total_orders = int(df["Order ID"].nunique())
+    total_orders = distinct.total_orders if distinct is not None else int(df["Order ID"].nunique())
     avg_order_value = round(total_sales / total_orders if total_orders > 0 else 0.0, 2)
-    total_shipping_cost = round(float(df["Shipping Cost"].sum()), 2)
-    avg_discount = round(float(df["Discount"].mean()) * 100, 2)
+    total_shipping_cost = round(float(sums["Shipping Cost"].sum()), 2)
+    if rollup is not None:
+        avg_discount = round(float(rollup["Discount Sum"].sum() / rollup["Rows"].sum()) * 100, 2)
+    else:
+        avg_discount = round(float(df["Discount"].mean()) * 100, 2)
 
     # Repeat Customer Rate: % of customers who placed more than one unique order
-    customer_order_counts = df.groupby("Customer ID")["Order ID"].nunique()
-    total_customers = len(customer_order_counts)
-    repeat_customers = int((customer_order_counts > 1).sum())
+    if distinct is not None:
+        total_customers, repeat_customers = distinct.total_customers, distinct.repeat_customers
+    else:
+        customer_order_counts = df.groupby("Customer ID", observed=True)["Order ID"].nunique()
+        total_customers = len(customer_order_counts)
+        repeat_customers = int((customer_order_counts > 1).sum())
     repeat_customer_rate = round(
         (repeat_customers / total_customers * 100) if total_customers > 0 else 0.0, 2
     )
@@ -83,81 +345,157 @@ def compute_kpis(df: pd.DataFrame) -> KPIData:
         avg_order_value=avg_order_value,
         total_shipping_cost=total_shipping_cost,
         avg_discount=avg_discount,
+        distinct_counts=distinct.info() if distinct is not None else None,
     )
 
 
-def compute_sparklines(df: pd.DataFrame) -> dict:
-    df = df.copy()
-    df["Period"] = df["Order Date"].dt.to_period("M").dt.to_timestamp()
-    periods = sorted(df["Period"].unique())
+@timed("compute_sparklines")
+def compute_sparklines(
+    df: pd.DataFrame,
+    rollup: Optional[pd.DataFrame] = None,
+    distinct: Optional[DistinctCounts] = None,
+    periods: Optional[PeriodBuckets] = None,
+) -> dict:
+    # Sums come from the rollup cells and order/customer counts from the distinct
+    # counts when available; anything else is derived from the raw rows. Rows and
+    # cells are bucketed by month through the session's period lookup.
+    periods = periods or PeriodBuckets(df["Order Date"])
+    n_months = len(periods.labels["month"])
+    sums = rollup if rollup is not None else df
+    month = periods.of(sums["Order Date"], "month")
 
-    grouped = (
-        df.groupby("Period")
-        .agg(
-            Sales=("Sales", "sum"),
-            Profit=("Profit", "sum"),
-            Orders=("Order ID", "nunique"),
-            ShippingCost=("Shipping Cost", "sum"),
-        )
-        .reindex(periods)
-        .fillna(0)
-        .reset_index()
-    )
-    grouped["ProfitMargin"] = (grouped["Profit"] / grouped["Sales"].replace(0, float("nan")) * 100).fillna(0)
-    grouped["AvgOrderValue"] = (grouped["Sales"] / grouped["Orders"].replace(0, float("nan"))).fillna(0)
-    grouped["AvgDiscount"] = (
-        df.groupby("Period")["Discount"].mean().mul(100).reindex(periods).fillna(0).values
-    )
+    if distinct is None:
+        raw_month = month if rollup is None else periods.of(df["Order Date"], "month")
+        keep = np.flatnonzero(np.bincount(raw_month[raw_month >= 0], minlength=n_months))
+    else:
+        keep = periods.positions(distinct.periods, "month")
+
+    def per_month(values: pd.Series) -> np.ndarray:
+        # NaN values count as 0, as in a groupby sum
+        valid = month >= 0
+        weights = np.nan_to_num(values.to_numpy(dtype=float)[valid])
+        return np.bincount(month[valid], weights=weights, minlength=n_months)[keep]
+
+    sales = per_month(sums["Sales"])
+    profit = per_month(sums["Profit"])
+    shipping_cost = per_month(sums["Shipping Cost"])
+    if distinct is None:
+        orders = df.groupby(raw_month)["Order ID"].nunique().reindex(keep).fillna(0).to_numpy()
+    else:
+        orders = distinct.orders_by_period
+    if rollup is not None:
+        discount_sum, discount_rows = per_month(rollup["Discount Sum"]), per_month(rollup["Rows"])
+    else:
+        discount = df["Discount"]
+        discount_sum, discount_rows = per_month(discount), per_month(discount.notna().astype(float))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profit_margin = np.where(sales != 0, profit / sales * 100, 0.0)
+        avg_order_value = np.where(orders != 0, sales / orders, 0.0)
+        avg_discount = np.where(discount_rows > 0, discount_sum / discount_rows * 100, 0.0)
 
     # Repeat customer rate per period: % of that period's customers seen in a prior period
-    # Pre-group by period once (O(n)) instead of filtering per period (O(n*m))
-    customer_by_period = df.groupby("Period")["Customer ID"].apply(set)
-    seen: set = set()
-    repeat_rates = []
-    for period in periods:
-        customers = customer_by_period.get(period, set())
-        rate = round(len(customers & seen) / len(customers) * 100, 2) if customers else 0.0
-        repeat_rates.append(rate)
-        seen.update(customers)
+    if distinct is not None:
+        repeat_rates = [round(float(rate), 2) for rate in distinct.repeat_rate_by_period]
+    else:
+        # Pre-group by period once (O(n)) instead of filtering per period (O(n*m))
+        customer_by_period = df.groupby(raw_month)["Customer ID"].apply(set)
+        seen: set = set()
+        repeat_rates = []
+        for period in keep:
+            customers = customer_by_period.get(period, set())
+            rate = round(len(customers & seen) / len(customers) * 100, 2) if customers else 0.0
+            repeat_rates.append(rate)
+            seen.update(customers)
 
     def to_list(col):
         return [round(float(v), 2) for v in col]
 
     return {
-        "total_sales":          to_list(grouped["Sales"]),
-        "total_profit":         to_list(grouped["Profit"]),
-        "profit_margin":        to_list(grouped["ProfitMargin"]),
-        "total_orders":         to_list(grouped["Orders"]),
+        "total_sales":          to_list(sales),
+        "total_profit":         to_list(profit),
+        "profit_margin":        to_list(profit_margin),
+        "total_orders":         to_list(orders),
         "repeat_customer_rate": repeat_rates,
-        "avg_order_value":      to_list(grouped["AvgOrderValue"]),
-        "total_shipping_cost":  to_list(grouped["ShippingCost"]),
-        "avg_discount":         to_list(grouped["AvgDiscount"]),
+        "avg_order_value":      to_list(avg_order_value),
+        "total_shipping_cost":  to_list(shipping_cost),
+        "avg_discount":         to_list(avg_discount),
     }
 
 
 def get_filter_options(df: pd.DataFrame) -> FilterOptions:
-    categories = sorted(df["Category"].dropna().unique().tolist())
-    sub_categories = {
-        cat: sorted(df[df["Category"] == cat]["Sub-Category"].dropna().unique().tolist())
-        for cat in categories
-    }
-
-    markets = sorted(df["Market"].dropna().unique().tolist())
-    regions = {
-        mkt: sorted(df[df["Market"] == mkt]["Region"].dropna().unique().tolist())
-        for mkt in markets
-    }
+    """
+    Distinct values of every filter dimension, with Sub-Category grouped by
+    Category and Region by Market. Each hierarchy comes from one pass over the
+    distinct (parent, child) code pairs instead of one frame scan per parent.
+    """
+    categories, sub_categories = _hierarchy(df["Category"], df["Sub-Category"])
+    markets, regions = _hierarchy(df["Market"], df["Region"])
 
     return FilterOptions(
         categories=categories,
         sub_categories=sub_categories,
         markets=markets,
         regions=regions,
-        segments=sorted(df["Segment"].dropna().unique().tolist()),
-        ship_modes=sorted(df["Ship Mode"].dropna().unique().tolist()),
-        order_priorities=sorted(df["Order Priority"].dropna().unique().tolist()),
+        segments=_observed(df["Segment"]),
+        ship_modes=_observed(df["Ship Mode"]),
+        order_priorities=_observed(df["Order Priority"]),
         date_range={
             "min_date": df["Order Date"].min().strftime("%Y-%m-%d"),
             "max_date": df["Order Date"].max().strftime("%Y-%m-%d"),
         },
     )
+
+
+def _category_codes(values: pd.Series) -> Tuple[pd.Index, np.ndarray]:
+    values = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    return values.cat.categories, values.cat.codes.to_numpy()
+
+
+def _observed(values: pd.Series) -> List[Any]:
+    # Categories can outlive their rows (e.g. the appended slice of a session), so only counted ones are kept
+    categories, codes = _category_codes(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    return sorted(categories[counts > 0].tolist())
+
+
+def _hierarchy(parent: pd.Series, child: pd.Series) -> Tuple[List[Any], Dict[Any, List[Any]]]:
+    """Observed parent values, and the observed child values of each (missing children are skipped)."""
+    parents, parent_codes = _category_codes(parent)
+    children, child_codes = _category_codes(child)
+    width = len(children) + 1
+    has_parent = parent_codes >= 0
+    # One id per (parent, child) pair; child code -1 (missing) shifts to 0 so parents without children still appear
+    pairs = pd.unique(parent_codes[has_parent].astype(np.int64) * width + child_codes[has_parent] + 1)
+    pair_parents, pair_children = np.divmod(pairs, width)
+
+    groups: Dict[Any, List[Any]] = {parents[code]: [] for code in np.unique(pair_parents)}
+    present = pair_children > 0
+    for code, child_code in zip(pair_parents[present].tolist(), (pair_children[present] - 1).tolist()):
+        groups[parents[code]].append(children[child_code])
+    return sorted(groups), {key: sorted(groups[key]) for key in sorted(groups)}
+
+
+def merge_filter_options(options: FilterOptions, added: FilterOptions) -> FilterOptions:
+    """Filter options over the union of two row sets, e.g. a session and rows appended to it."""
+
+    def union(a, b) -> list:
+        return sorted(set(a) | set(b))
+
+    def union_groups(a: Dict[str, list], b: Dict[str, list]) -> Dict[str, list]:
+        return {key: union(a.get(key, []), b.get(key, [])) for key in union(a, b)}
+
+    return FilterOptions(
+        categories=union(options.categories, added.categories),
+        sub_categories=union_groups(options.sub_categories, added.sub_categories),
+        markets=union(options.markets, added.markets),
+        regions=union_groups(options.regions, added.regions),
+        segments=union(options.segments, added.segments),
+        ship_modes=union(options.ship_modes, added.ship_modes),
+        order_priorities=union(options.order_priorities, added.order_priorities),
+        # ISO dates order as strings
+        date_range={
+            "min_date": min(options.date_range["min_date"], added.date_range["min_date"]),
+            "max_date": max(options.date_range["max_date"], added.date_range["max_date"]),
+        },
+    )
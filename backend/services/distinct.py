@@ -0,0 +1,437 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from models.schemas import DistinctCountInfo
+
+# "exact" (default) or "approximate". Approximate counts need a session rollup;
+# sessions without one always count exactly.
+DISTINCT_COUNT_MODE = os.getenv("DISTINCT_COUNT_MODE", "exact")
+
+# HyperLogLog precision: 2^12 registers, ~1.6% relative standard error
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+
+class DistinctCounts:
+    """Distinct order/customer counts for one filter state, overall and per month."""
+
+    def __init__(
+        self,
+        mode: str,
+        relative_error: float,
+        total_orders: int,
+        total_customers: int,
+        repeat_customers: int,
+        periods: List[pd.Timestamp],
+        orders_by_period: np.ndarray,
+        repeat_rate_by_period: np.ndarray,
+    ):
+        self.mode = mode
+        self.relative_error = relative_error
+        self.total_orders = total_orders
+        self.total_customers = total_customers
+        self.repeat_customers = repeat_customers
+        self.periods = periods
+        self.orders_by_period = orders_by_period
+        self.repeat_rate_by_period = repeat_rate_by_period
+
+    def info(self) -> DistinctCountInfo:
+        # ~95% interval (two standard errors) around the order count
+        margin = 2 * self.relative_error * self.total_orders
+        return DistinctCountInfo(
+            mode=self.mode,
+            relative_error=round(self.relative_error, 4),
+            total_orders_low=int(max(self.total_orders - margin, 0)),
+            total_orders_high=int(round(self.total_orders + margin)),
+        )
+
+
+def month_numbers(dates: pd.Series) -> np.ndarray:
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int32)
+
+
+def _month_starts(base: int, n_months: int) -> List[pd.Timestamp]:
+    return [pd.Timestamp(year=(base + m) // 12, month=(base + m) % 12 + 1, day=1) for m in range(n_months)]
+
+
+def _category_codes(col: pd.Series) -> tuple:
+    # Missing values map to a sentinel one past the last code
+    codes = col.cat.codes.to_numpy().astype(np.int32)
+    n = len(col.cat.categories)
+    codes[codes < 0] = n
+    return codes, n
+
+
+def _pair_codes(left: np.ndarray, n_left: int, right: np.ndarray, n_right: int) -> tuple:
+    """Factorize (left, right) code pairs. Pairs with a missing side get a sentinel code."""
+    valid = (left < n_left) & (right < n_right)
+    keys = left[valid].astype(np.int64) * n_right + right[valid]
+    pair_codes, uniques = pd.factorize(keys)
+    n_pairs = len(uniques)
+
+    codes = np.full(len(left), n_pairs, dtype=np.int32)
+    codes[valid] = pair_codes
+    return codes, n_pairs, (uniques // n_right).astype(np.int32), (uniques % n_right).astype(np.int32)
+
+
+def _extend_pairs(
+    codes: np.ndarray,
+    left_of_pair: np.ndarray,
+    right_of_pair: np.ndarray,
+    left: np.ndarray,
+    n_left: int,
+    right: np.ndarray,
+    n_right: int,
+) -> tuple:
+    """
+    _pair_codes for rows appended after the len(codes) rows already coded,
+    given the existing pairs' sides in the new code space. Known pairs keep
+    their codes and new ones are numbered after them. Only existing pairs with
+    both sides present in the appended rows are hashed, so the cost follows
+    the appended rows rather than the history.
+    """
+    n_old, n_known = len(codes), len(left_of_pair)
+    left, right = left[n_old:], right[n_old:]
+    valid = (left < n_left) & (right < n_right)
+    keys = left[valid].astype(np.int64) * n_right + right[valid]
+
+    in_left = np.zeros(n_left + 1, dtype=bool)
+    in_left[left[valid]] = True
+    in_right = np.zeros(n_right + 1, dtype=bool)
+    in_right[right[valid]] = True
+    candidates = np.flatnonzero(in_left[left_of_pair] & in_right[right_of_pair])
+    known = pd.Index(left_of_pair[candidates].astype(np.int64) * n_right + right_of_pair[candidates])
+    found = known.get_indexer(keys)
+
+    new = found < 0
+    new_codes, uniques = pd.factorize(keys[new])
+    found[new] = n_known + new_codes
+    n_pairs = n_known + len(uniques)
+    found[~new] = candidates[found[~new]]
+
+    appended = np.full(len(left), n_pairs, dtype=np.int32)
+    appended[valid] = found
+
+    # The missing-pair sentinel moves up past the new pairs
+    if n_pairs != n_known:
+        codes = np.where(codes == n_known, n_pairs, codes).astype(np.int32)
+    return (
+        np.concatenate([codes, appended]),
+        n_pairs,
+        np.concatenate([left_of_pair, (uniques // n_right).astype(np.int32)]),
+        np.concatenate([right_of_pair, (uniques % n_right).astype(np.int32)]),
+    )
+
+
+def _recode(old_codes: np.ndarray, n_old: int, new_codes: np.ndarray) -> np.ndarray:
+    """Lookup table from old to new codes, read off the same rows coded both ways."""
+    mapping = np.zeros(n_old + 1, dtype=np.int32)
+    mapping[old_codes] = new_codes
+    return mapping
+
+
+def _present(codes: np.ndarray, n: int, rows: Optional[np.ndarray]) -> np.ndarray:
+    selected = codes if rows is None else codes[rows]
+    return np.bincount(selected, minlength=n + 1)[:n] > 0
+
+
+class DistinctIndex:
+    """
+    Integer-coded order/customer state for exact distinct counts.
+
+    Rows are mapped at ingest to (customer, order), (month, order) and
+    (month, customer) pair codes. Under any row selection, distinct counts and
+    repeat customers then reduce to bincounts over those codes, and a customer's
+    first month is a minimum over the selected (month, customer) pairs.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        months = month_numbers(df["Order Date"])
+        self.month_base = int(months.min()) if len(months) else 0
+        self.month = months - self.month_base
+        self.n_months = int(self.month.max()) + 1 if len(months) else 0
+
+        self.order, self.n_orders = _category_codes(df["Order ID"])
+        self.customer, self.n_customers = _category_codes(df["Customer ID"])
+
+        (
+            self.customer_order,
+            self.n_customer_orders,
+            self.customer_order_customer,
+            self.customer_order_order,
+        ) = _pair_codes(self.customer, self.n_customers, self.order, self.n_orders)
+        (
+            self.month_order,
+            self.n_month_orders,
+            self.month_order_month,
+            self.month_order_order,
+        ) = _pair_codes(self.month, self.n_months, self.order, self.n_orders)
+        (
+            self.month_customer,
+            self.n_month_customers,
+            self.month_customer_month,
+            self.month_customer_customer,
+        ) = _pair_codes(self.month, self.n_months, self.customer, self.n_customers)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray)))
+
+    def extend(self, df: pd.DataFrame) -> "DistinctIndex":
+        """
+        Index over `df`, whose leading rows are the ones indexed here. Row codes
+        follow df's categories; existing pairs are re-coded
+        through lookup tables and only the appended rows' pairs are looked up.
+        """
+        n_old = len(self.order)
+        if n_old == 0:
+            return DistinctIndex(df)
+        if len(df) == n_old:
+            return self
+        index = DistinctIndex.__new__(DistinctIndex)
+
+        # A delta reaching back before the first month shifts every month code
+        months = month_numbers(df["Order Date"].iloc[n_old:])
+        index.month_base = min(self.month_base, int(months.min()))
+        shift = self.month_base - index.month_base
+        index.month = np.concatenate([self.month + shift, months - index.month_base]).astype(np.int32)
+        index.n_months = max(self.n_months + shift, int(months.max()) - index.month_base + 1)
+
+        index.order, index.n_orders = _category_codes(df["Order ID"])
+        index.customer, index.n_customers = _category_codes(df["Customer ID"])
+        order_map = _recode(self.order, self.n_orders, index.order[:n_old])
+        customer_map = _recode(self.customer, self.n_customers, index.customer[:n_old])
+
+        (
+            index.customer_order,
+            index.n_customer_orders,
+            index.customer_order_customer,
+            index.customer_order_order,
+        ) = _extend_pairs(
+            self.customer_order, customer_map[self.customer_order_customer], order_map[self.customer_order_order],
+            index.customer, index.n_customers, index.order, index.n_orders,
+        )
+        (
+            index.month_order,
+            index.n_month_orders,
+            index.month_order_month,
+            index.month_order_order,
+        ) = _extend_pairs(
+            self.month_order, self.month_order_month + shift, order_map[self.month_order_order],
+            index.month, index.n_months, index.order, index.n_orders,
+        )
+        (
+            index.month_customer,
+            index.n_month_customers,
+            index.month_customer_month,
+            index.month_customer_customer,
+        ) = _extend_pairs(
+            self.month_customer, self.month_customer_month + shift, customer_map[self.month_customer_customer],
+            index.month, index.n_months, index.customer, index.n_customers,
+        )
+        return index
+
+    def count(self, rows: Optional[np.ndarray]) -> DistinctCounts:
+        total_orders = int(_present(self.order, self.n_orders, rows).sum())
+        total_customers, repeat_customers = self.repeat_customers(rows)
+
+        months_present = _present(self.month, self.n_months, rows)
+        month_orders = _present(self.month_order, self.n_month_orders, rows)
+        orders_by_month = np.bincount(self.month_order_month[month_orders], minlength=self.n_months)
+
+        pairs = np.flatnonzero(_present(self.month_customer, self.n_month_customers, rows))
+        month = self.month_customer_month[pairs]
+        customer = self.month_customer_customer[pairs]
+        first_month = np.full(self.n_customers, self.n_months, dtype=np.int32)
+        np.minimum.at(first_month, customer, month)
+        customers_by_month = np.bincount(month, minlength=self.n_months)
+        returning_by_month = np.bincount(month[first_month[customer] < month], minlength=self.n_months)
+
+        keep = np.flatnonzero(months_present)
+        starts = _month_starts(self.month_base, self.n_months)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = np.where(customers_by_month > 0, returning_by_month / customers_by_month * 100, 0.0)
+
+        return DistinctCounts(
+            mode="exact",
+            relative_error=0.0,
+            total_orders=total_orders,
+            total_customers=total_customers,
+            repeat_customers=repeat_customers,
+            periods=[starts[m] for m in keep],
+            orders_by_period=orders_by_month[keep],
+            repeat_rate_by_period=rates[keep],
+        )
+
+    def repeat_customers(self, rows: Optional[np.ndarray]) -> tuple:
+        """(customers, customers with more than one distinct order) among the rows."""
+        pairs = _present(self.customer_order, self.n_customer_orders, rows)
+        orders_per_customer = np.bincount(self.customer_order_customer[pairs], minlength=self.n_customers)
+        return int((orders_per_customer > 0).sum()), int((orders_per_customer > 1).sum())
+
+
+# ── HyperLogLog sketches ──────────────────────────────────────────────────────
+def _value_hashes(col: pd.Series) -> tuple:
+    """
+    64-bit hash of each row's value, and which rows have one. Values are hashed
+    rather than category codes, so sketches stay valid when an append re-codes
+    the categories.
+    """
+    codes = col.cat.codes.to_numpy()
+    valid = codes >= 0
+    used, inverse = np.unique(codes[valid], return_inverse=True)
+    hashes = np.zeros(len(codes), dtype=np.uint64)
+    hashes[valid] = pd.util.hash_array(col.cat.categories.to_numpy()[used])[inverse]
+    return hashes, valid
+
+
+def _registers(hashes: np.ndarray) -> tuple:
+    """HLL register index and rank (position of the leading 1-bit) for each hash."""
+    width = 64 - HLL_PRECISION
+    register = (hashes >> np.uint64(width)).astype(np.uint16)
+    rest = hashes & np.uint64((1 << width) - 1)
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    rank = (width - bit_length + 1).astype(np.uint8)
+    return register, rank
+
+
+def _estimate(registers: np.ndarray) -> np.ndarray:
+    """Cardinality estimate for each register row (last axis), with small-range correction."""
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class _SparseSketches:
+    """Per-cell HLL registers stored sparsely as (cell, register, max rank) triples."""
+
+    def __init__(self, cell: np.ndarray, register: np.ndarray, rank: np.ndarray):
+        self.cell = cell
+        self.register = register
+        self.rank = rank
+
+    @classmethod
+    def build(cls, cell: np.ndarray, hashes: np.ndarray, valid: np.ndarray) -> "_SparseSketches":
+        valid = valid & (cell >= 0)
+        register, rank = _registers(hashes[valid])
+        cell = cell[valid].astype(np.int64)
+
+        key = cell * HLL_REGISTERS + register
+        order = np.lexsort((rank, key))
+        key, rank = key[order], rank[order]
+        # After sorting by (key, rank) the last entry of each key holds its max rank
+        last = np.r_[key[1:] != key[:-1], True] if len(key) else np.zeros(0, dtype=bool)
+
+        return cls((key[last] // HLL_REGISTERS).astype(np.int32), (key[last] % HLL_REGISTERS).astype(np.uint16), rank[last])
+
+    def extend(self, other: "_SparseSketches") -> "_SparseSketches":
+        # Merging takes the max rank per register, so triples repeating an existing
+        # (cell, register) need no deduplication
+        return _SparseSketches(
+            np.concatenate([self.cell, other.cell]),
+            np.concatenate([self.register, other.register]),
+            np.concatenate([self.rank, other.rank]),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.cell.nbytes + self.register.nbytes + self.rank.nbytes
+
+    def merge(self, cell_mask: Optional[np.ndarray], cell_month: np.ndarray, n_months: int) -> tuple:
+        """Merged registers over the selected cells: overall, and one row per month."""
+        if cell_mask is None:
+            cell, register, rank = self.cell, self.register, self.rank
+        else:
+            keep = cell_mask[self.cell]
+            cell, register, rank = self.cell[keep], self.register[keep], self.rank[keep]
+
+        by_month = np.zeros((n_months, HLL_REGISTERS), dtype=np.uint8)
+        np.maximum.at(by_month, (cell_month[cell], register), rank)
+        return by_month.max(axis=0), by_month
+
+
+class DistinctSketch:
+    """
+    Mergeable HyperLogLog sketches for orders and customers, one per rollup cell.
+
+    Merging the cells selected by a filter gives approximate distinct orders
+    overall and per month. The monthly repeat-customer rate uses
+    inclusion-exclusion between each month's customer sketch and the running
+    union of all earlier months.
+    """
+
+    def __init__(self, df: pd.DataFrame, cell_of_row: np.ndarray, cell_dates: pd.Series):
+        cell_months = month_numbers(cell_dates)
+        self.month_base = int(cell_months.min()) if len(cell_months) else 0
+        self.cell_month = cell_months - self.month_base
+        self.n_months = int(self.cell_month.max()) + 1 if len(cell_months) else 0
+
+        self.orders = _SparseSketches.build(cell_of_row, *_value_hashes(df["Order ID"]))
+        self.customers = _SparseSketches.build(cell_of_row, *_value_hashes(df["Customer ID"]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.orders.nbytes + self.customers.nbytes + self.cell_month.nbytes
+
+    def extend(self, delta: pd.DataFrame, cell_of_row: np.ndarray, new_cell_dates: pd.Series) -> "DistinctSketch":
+        """
+        Sketches with `delta`'s rows added. `cell_of_row` places each appended
+        row in the extended cube, whose cells past the existing ones fall on
+        `new_cell_dates`.
+        """
+        sketch = DistinctSketch.__new__(DistinctSketch)
+        months = month_numbers(new_cell_dates)
+        sketch.month_base = min(self.month_base, int(months.min())) if len(months) else self.month_base
+        shift = self.month_base - sketch.month_base
+        sketch.cell_month = np.concatenate([self.cell_month + shift, months - sketch.month_base]).astype(np.int32)
+        sketch.n_months = int(sketch.cell_month.max()) + 1 if len(sketch.cell_month) else 0
+
+        sketch.orders = self.orders.extend(_SparseSketches.build(cell_of_row, *_value_hashes(delta["Order ID"])))
+        sketch.customers = self.customers.extend(
+            _SparseSketches.build(cell_of_row, *_value_hashes(delta["Customer ID"]))
+        )
+        return sketch
+
+    def count(self, cells: Optional[np.ndarray], customers: tuple) -> DistinctCounts:
+        """
+        Approximate counts over the selected cells. `customers` carries the exact
+        (customers, repeat customers) pair, since "more than one order per
+        customer" cannot be recovered from distinct-count sketches.
+        """
+        mask = None
+        if cells is not None:
+            mask = np.zeros(len(self.cell_month), dtype=bool)
+            mask[cells] = True
+
+        orders, orders_by_month = self.orders.merge(mask, self.cell_month, self.n_months)
+        _, customers_by_month = self.customers.merge(mask, self.cell_month, self.n_months)
+
+        # Union of every month strictly before each month
+        prior = np.zeros_like(customers_by_month)
+        if self.n_months > 1:
+            prior[1:] = np.maximum.accumulate(customers_by_month, axis=0)[:-1]
+        current = _estimate(customers_by_month)
+        union = _estimate(np.maximum(customers_by_month, prior))
+        returning = np.clip(current + _estimate(prior) - union, 0, current)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = np.where(current > 0, returning / current * 100, 0.0)
+
+        month_cells = self.cell_month if cells is None else self.cell_month[cells]
+        keep = np.flatnonzero(np.bincount(month_cells, minlength=self.n_months))
+        starts = _month_starts(self.month_base, self.n_months)
+
+        return DistinctCounts(
+            mode="approximate",
+            relative_error=1.04 / np.sqrt(HLL_REGISTERS),
+            total_orders=int(round(float(_estimate(orders)))),
+            total_customers=customers[0],
+            repeat_customers=customers[1],
+            periods=[starts[m] for m in keep],
+            orders_by_period=np.round(_estimate(orders_by_month[keep])),
+            repeat_rate_by_period=rates[keep],
+        )
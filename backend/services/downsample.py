@@ -0,0 +1,137 @@
+import os
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Default number of points drawn in the Discount vs Profit scatter
+SCATTER_POINT_BUDGET = int(os.getenv("SCATTER_POINT_BUDGET", "3000"))
+# Points always kept at each extreme, as a share of the budget
+EXTREME_SHARE = 0.05
+# Density grid resolution on each axis
+DENSITY_BINS = 40
+# The profit axis of the grid spans these quantiles; heavier tails fall in the edge bins
+PROFIT_RANGE_QUANTILES = (0.005, 0.995)
+
+
+class DensityGrid:
+    """Order counts over a discount × profit grid, by bin centre."""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, counts: np.ndarray):
+        self.x = x
+        self.y = y
+        self.counts = counts  # shape (len(y), len(x)), as a heatmap's z
+
+
+class ScatterSample:
+    """
+    A fixed-budget subset of per-order scatter points, together with the
+    density of every order the subset was drawn from.
+    """
+
+    def __init__(self, points: pd.DataFrame, density: DensityGrid):
+        self.points = points
+        self.density = density
+
+
+def order_points(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One point per (Order ID, Category): mean Discount, summed Profit and
+    Sales, in groupby order. Aggregated with bincount over the categorical
+    codes, so it costs a sort of the row keys and no per-group Python work.
+    """
+    order = df["Order ID"].cat.codes.to_numpy().astype(np.int64)
+    category = df["Category"].cat.codes.to_numpy().astype(np.int64)
+    valid = (order >= 0) & (category >= 0)
+    n_categories = len(df["Category"].cat.categories)
+
+    keys, group = np.unique((order * n_categories + category)[valid], return_inverse=True)
+    counts = np.bincount(group)
+
+    def total(col: str) -> np.ndarray:
+        return np.bincount(group, weights=df[col].to_numpy()[valid], minlength=len(keys))
+
+    return pd.DataFrame({
+        "Order ID": pd.Categorical.from_codes(keys // n_categories, dtype=df["Order ID"].dtype),
+        "Category": pd.Categorical.from_codes(keys % n_categories, dtype=df["Category"].dtype),
+        "Discount": total("Discount") / counts,
+        "Profit": total("Profit"),
+        "Sales": total("Sales"),
+    })
+
+
+def downsample(points: pd.DataFrame, budget: Optional[int] = None) -> ScatterSample:
+    """
+    At most `budget` points (SCATTER_POINT_BUDGET by default), chosen in
+    vectorised passes:
+
+    - the largest losses, largest profits and largest sales are always kept,
+      EXTREME_SHARE of the budget each;
+    - the rest of the budget is spread over a discount × profit grid in
+      proportion to the square root of each cell's count, so sparse regions
+      stay visible next to the dense core, and points are taken within a cell
+      in a fixed pseudo-random order.
+
+    The result depends only on the points, so it is stable for one filter state.
+    """
+    budget = max(int(budget or SCATTER_POINT_BUDGET), 1)
+    n = len(points)
+    discount = points["Discount"].to_numpy(dtype=float)
+    profit = points["Profit"].to_numpy(dtype=float)
+    sales = points["Sales"].to_numpy(dtype=float)
+
+    cell, density = _density(discount, profit)
+    if n <= budget:
+        return ScatterSample(points, density)
+
+    keep = np.zeros(n, dtype=bool)
+    k = max(int(budget * EXTREME_SHARE), 1)
+    for values in (profit, -profit, -sales):
+        keep[np.argpartition(values, k - 1)[:k]] = True
+
+    remaining = budget - int(keep.sum())
+    if remaining > 0:
+        keep[_stratified(cell, ~keep, remaining)] = True
+
+    return ScatterSample(points.iloc[np.flatnonzero(keep)].reset_index(drop=True), density)
+
+
+def _density(discount: np.ndarray, profit: np.ndarray) -> Tuple[np.ndarray, DensityGrid]:
+    """Grid cell of every point and the grid's counts."""
+    if len(discount):
+        x_edges = _edges(discount.min(), discount.max())
+        y_edges = _edges(*np.quantile(profit, PROFIT_RANGE_QUANTILES))
+    else:
+        x_edges = y_edges = _edges(0.0, 1.0)
+
+    x_bin = np.clip(np.searchsorted(x_edges, discount, side="right") - 1, 0, DENSITY_BINS - 1)
+    y_bin = np.clip(np.searchsorted(y_edges, profit, side="right") - 1, 0, DENSITY_BINS - 1)
+    cell = y_bin * DENSITY_BINS + x_bin
+    counts = np.bincount(cell, minlength=DENSITY_BINS * DENSITY_BINS).reshape(DENSITY_BINS, DENSITY_BINS)
+    return cell, DensityGrid((x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts)
+
+
+def _edges(lo: float, hi: float) -> np.ndarray:
+    if not hi > lo:
+        hi = lo + 1.0
+    return np.linspace(lo, hi, DENSITY_BINS + 1)
+
+
+def _stratified(cell: np.ndarray, eligible: np.ndarray, budget: int) -> np.ndarray:
+    """Positions of up to `budget` eligible points, allocated across cells by sqrt(count)."""
+    candidates = np.flatnonzero(eligible)
+    if len(candidates) <= budget:
+        return candidates
+
+    # A fixed-seed priority makes the choice within a cell reproducible
+    priority = np.random.default_rng(42).random(len(cell))[candidates]
+    order = np.lexsort((priority, cell[candidates]))
+    ordered_cells = cell[candidates][order]
+    counts = np.bincount(ordered_cells, minlength=DENSITY_BINS * DENSITY_BINS)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(order)) - starts[ordered_cells]
+
+    # The j-th point of a cell is due once the cell's share, sqrt(count), reaches j + 1,
+    # so taking the `budget` earliest-due points allocates the budget by sqrt(count)
+    due = (rank + 1) / np.sqrt(counts[ordered_cells])
+    chosen = np.argpartition(due, budget - 1)[:budget]
+    return np.sort(candidates[order[chosen]])
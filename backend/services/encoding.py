@@ -0,0 +1,70 @@
+import gzip
+import os
+from functools import lru_cache
+from typing import List, Tuple
+import plotly.io as pio
+from fastapi import Request, Response
+from plotly.io.json import to_json_plotly
+from pydantic import BaseModel
+from models.schemas import ChartData
+
+# Accept-ed by clients that want figures as objects rather than figure_json strings
+COMPACT_MEDIA_TYPE = "application/vnd.dashboard.compact+json"
+# Bodies at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "3"))
+
+
+def encode(request: Request, payload: BaseModel) -> Response:
+    """
+    payload in the encoding the client negotiated, gzipped above
+    GZIP_MIN_BYTES when it accepts gzip.
+
+    The default is the response model's JSON. With Accept: COMPACT_MEDIA_TYPE
+    each chart carries `figure`, the figure itself, instead of `figure_json`,
+    so its arrays are not escaped into a string and parsed twice, and the
+    plotly layout template every figure embeds is sent once, in `templates`,
+    with each layout.template holding its name.
+    """
+    if COMPACT_MEDIA_TYPE in request.headers.get("accept", ""):
+        body = _compact(payload).encode()
+        media_type = COMPACT_MEDIA_TYPE
+    else:
+        body = payload.model_dump_json().encode()
+        media_type = "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type=media_type, headers=headers)
+
+
+@lru_cache(maxsize=1)
+def _default_template() -> Tuple[str, str]:
+    # Name and the exact bytes fig.to_json() writes for the default template
+    name = pio.templates.default
+    return name, to_json_plotly(pio.templates[name])
+
+
+def _compact(payload: BaseModel) -> str:
+    # figure_json is already valid JSON, so figures are spliced in as-is rather than re-parsed
+    name, template = _default_template()
+    embedded = '"template":' + template
+    used = False
+
+    def chart(data: ChartData) -> str:
+        nonlocal used
+        figure = data.figure_json.replace(embedded, f'"template":"{name}"', 1)
+        used = used or len(figure) != len(data.figure_json)
+        return data.model_dump_json(exclude={"figure_json"})[:-1] + ',"figure":' + figure + "}"
+
+    if isinstance(payload, ChartData):
+        body = chart(payload)
+    else:
+        charts: List[ChartData] = payload.charts
+        head = payload.model_dump_json(exclude={"charts"})
+        body = head[:-1] + ',"charts":[' + ",".join(chart(c) for c in charts) + "]}"
+    if used:
+        body = body[:-1] + ',"templates":{"' + name + '":' + template + "}}"
+    return body
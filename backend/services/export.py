@@ -0,0 +1,140 @@
+import io
+import os
+from typing import AsyncIterator, Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from services.workers import run_in_thread
+
+# Rows encoded per batch; export memory is bounded by one batch, not the selection
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+# format → (media type, file extension)
+EXPORT_FORMATS = {
+    "csv":     ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow":   ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+async def stream_export(df: pd.DataFrame, rows: Optional[np.ndarray], fmt: str) -> AsyncIterator[bytes]:
+    """
+    Encode the selected rows (all rows when `rows` is None) batch by batch.
+    Each batch is gathered and encoded on a worker thread, so the event loop
+    only ever holds one encoded chunk.
+    """
+    chunks = _csv_chunks(df, rows) if fmt == "csv" else _arrow_chunks(df, rows, fmt)
+    while True:
+        chunk = await run_in_thread(next, chunks, None)
+        if chunk is None:
+            break
+        if chunk:
+            yield chunk
+
+
+def _batches(df: pd.DataFrame, rows: Optional[np.ndarray]) -> Iterator[pd.DataFrame]:
+    n = len(df) if rows is None else len(rows)
+    if n == 0:
+        yield df.iloc[:0]
+    for start in range(0, n, EXPORT_BATCH_ROWS):
+        end = start + EXPORT_BATCH_ROWS
+        yield df.iloc[start:end] if rows is None else df.take(rows[start:end])
+
+
+def _csv_chunks(df: pd.DataFrame, rows: Optional[np.ndarray]) -> Iterator[bytes]:
+    for i, batch in enumerate(_batches(df, rows)):
+        yield batch.to_csv(index=False, header=i == 0).encode()
+
+
+def _arrow_chunks(df: pd.DataFrame, rows: Optional[np.ndarray], fmt: str) -> Iterator[bytes]:
+    sink = _DrainSink()
+    # Arrow dictionaries for categorical columns, built once and shared by every batch
+    dictionaries: Dict[str, pa.Array] = {}
+    # Parquet dictionary-encodes on its own, so it gets plain values
+    decode = fmt == "parquet"
+    schema = _schema(df, dictionaries, decode)
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+    for batch in _batches(df, rows):
+        writer.write_batch(_record_batch(batch, schema, dictionaries, decode))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _schema(df: pd.DataFrame, dictionaries: Dict[str, pa.Array], decode: bool) -> pa.Schema:
+    """
+    The export's schema, from the whole frame's dtypes. Types inferred batch
+    by batch can differ (an object column that is all nulls in one batch, or
+    holds ints in one and floats in the next), which the writers reject.
+    """
+    fields = []
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            dictionaries[col] = _to_arrow(pd.Series(values.cat.categories))
+            index_type = pa.from_numpy_dtype(values.cat.codes.dtype)
+            type = dictionaries[col].type if decode else pa.dictionary(index_type, dictionaries[col].type)
+        elif values.dtype == object:
+            type = _OBJECT_TYPES.get(pd.api.types.infer_dtype(values, skipna=True), pa.string())
+        else:
+            type = pa.array(values.iloc[:0], from_pandas=True).type
+        fields.append(pa.field(col, type))
+    return pa.schema(fields)
+
+
+# infer_dtype() of an object column → its Arrow type; anything else is exported as text
+_OBJECT_TYPES = {
+    "integer":             pa.int64(),
+    "floating":            pa.float64(),
+    "mixed-integer-float": pa.float64(),
+    "boolean":             pa.bool_(),
+}
+
+
+def _record_batch(batch: pd.DataFrame, schema: pa.Schema, dictionaries: Dict[str, pa.Array], decode: bool) -> pa.RecordBatch:
+    arrays = []
+    for col in batch.columns:
+        values = batch[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            array = pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), dictionaries[col])
+            arrays.append(array.dictionary_decode() if decode else array)
+        else:
+            arrays.append(_to_arrow(values, schema.field(col).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _to_arrow(values: pd.Series, type: Optional[pa.DataType] = None) -> pa.Array:
+    try:
+        return pa.array(values, type=type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns are exported as their text form
+        return pa.array([None if pd.isna(v) else str(v) for v in values], type=pa.string())
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands out the bytes written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Writers record offsets (e.g. the Parquet footer) from the total written
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
@@ -0,0 +1,63 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+# Placeholder series name used when a template is captured. Strings inside a
+# trace prototype that mention it (name, legendgroup, hovertemplate, ...) are
+# rewritten with the real group name at render time.
+SERIES = "__series__"
+
+_templates: Dict[Hashable, "FigureTemplate"] = {}
+
+
+class FigureTemplate:
+    """
+    A plotly figure with its layout serialized once and its traces kept as
+    plain dicts, so request-time rendering only swaps in data arrays and
+    encodes them, skipping plotly.express and figure validation.
+
+    Trace dicts are copied with their keys in place, which keeps the output
+    byte-identical to `fig.to_json()` for the same data.
+    """
+
+    def __init__(self, fig: go.Figure):
+        spec = fig.to_dict()
+        self.traces: List[Dict[str, Any]] = spec["data"]
+        self.layout = to_json_plotly(spec["layout"])
+
+    def trace(self, i: int = 0, series: Optional[str] = None, **data: Any) -> Dict[str, Any]:
+        """Copy of trace prototype `i`, renamed to `series`, with `data` replacing its values."""
+        proto = self.traces[i]
+        if series is not None:
+            proto = _rename(proto, series)
+        marker = data.pop("marker", None)
+        trace = dict(proto, **data)
+        if marker is not None:
+            trace["marker"] = dict(proto["marker"], **marker)
+        return trace
+
+    def patch_layout(self, placeholder: Any, value: Any) -> str:
+        """Layout JSON with the encoded `placeholder` value replaced by `value`."""
+        return self.layout.replace(to_json_plotly(placeholder), to_json_plotly(value), 1)
+
+    def render(self, traces: List[Dict[str, Any]], layout: Optional[str] = None) -> str:
+        # Same compact encoding and escaping as fig.to_json()
+        return '{"data":' + to_json_plotly(traces) + ',"layout":' + (layout or self.layout) + "}"
+
+
+def get_template(key: Hashable, build: Callable[[], go.Figure]) -> FigureTemplate:
+    """Template cached under `key`, captured from `build()` on first use."""
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = FigureTemplate(build())
+    return template
+
+
+def _rename(obj: Any, series: str) -> Any:
+    if isinstance(obj, str):
+        return obj.replace(SERIES, series)
+    if isinstance(obj, dict):
+        return {k: _rename(v, series) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_rename(v, series) for v in obj]
+    return obj
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional, Tuple
+
+# FilterParams field → session frame column
+FILTER_COLUMNS = {
+    "category":       "Category",
+    "sub_category":   "Sub-Category",
+    "market":         "Market",
+    "region":         "Region",
+    "segment":        "Segment",
+    "ship_mode":      "Ship Mode",
+    "order_priority": "Order Priority",
+}
+
+
+class FilterIndex:
+    """
+    Inverted index over the filterable columns of a session frame.
+
+    Every dimension maps each value to a sorted array of row positions (stored
+    CSR-style: one row-id array plus per-value offsets), and Order Date keeps a
+    sorted copy of the dates for range lookups. A filter request is resolved by
+    expanding the most selective constraint into row ids and probing the rest
+    against those rows only, so the frame itself is gathered exactly once.
+
+    `columns` narrows the indexed dimensions (the rollup cube keeps only some);
+    filters on the others are ignored.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Dict[str, str] = FILTER_COLUMNS):
+        self.n_rows = len(df)
+        self.columns = columns
+        self.categories: Dict[str, pd.Index] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.offsets: Dict[str, np.ndarray] = {}
+        self.row_ids: Dict[str, np.ndarray] = {}
+
+        for key, col in columns.items():
+            values = df[col].astype("category")
+            categories = values.cat.categories
+            codes = values.cat.codes.to_numpy().astype(np.int32)
+            # Missing values get a sentinel code one past the last category so lookup
+            # tables never match them
+            codes[codes < 0] = len(categories)
+
+            counts = np.bincount(codes, minlength=len(categories) + 1)
+            self.categories[key] = categories
+            self.codes[key] = codes.astype(np.min_scalar_type(len(categories)))
+            self.offsets[key] = np.concatenate(([0], np.cumsum(counts)))
+            self.row_ids[key] = np.argsort(codes, kind="stable").astype(np.int32)
+
+        dates = df["Order Date"].to_numpy().astype("datetime64[ns]").view(np.int64)
+        self.dates = dates
+        self.date_order = np.argsort(dates, kind="stable").astype(np.int32)
+        self.sorted_dates = dates[self.date_order]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.dates, self.date_order, self.sorted_dates]
+        for key in self.columns:
+            arrays += [self.codes[key], self.offsets[key], self.row_ids[key]]
+        return int(sum(a.nbytes for a in arrays))
+
+    def extend(self, df: pd.DataFrame) -> "FilterIndex":
+        """
+        Index over `df`, whose leading n_rows rows are the ones indexed here.
+        Values first seen in the appended rows are merged into the sorted
+        categories, as an index built from scratch would have them; existing
+        codes are remapped through a small per-value table, existing posting
+        lists and sorted dates are copied into place, and only the appended
+        rows are sorted.
+        """
+        n_old = self.n_rows
+        delta = df.iloc[n_old:]
+        index = FilterIndex.__new__(FilterIndex)
+        index.n_rows = len(df)
+        index.columns = self.columns
+        index.categories, index.codes, index.offsets, index.row_ids = {}, {}, {}, {}
+
+        for key, col in self.columns.items():
+            known = self.categories[key]
+            values = delta[col].astype("category")
+            delta_categories = values.cat.categories
+            added = delta_categories[known.get_indexer(delta_categories) < 0]
+            categories = known.append(added).sort_values() if len(added) else known
+            n_known, n = len(known), len(categories)
+
+            # New code of each existing one, the missing-value sentinel moving up past the new values
+            moved = np.append(categories.get_indexer(known), n)
+            codes = moved[self.codes[key]] if len(added) else self.codes[key]
+            mapping = np.append(categories.get_indexer(delta_categories), n)
+            delta_codes = mapping[values.cat.codes.to_numpy()]
+            delta_counts = np.bincount(delta_codes, minlength=n + 1)
+            delta_offsets = np.concatenate(([0], np.cumsum(delta_counts)))
+            delta_rows = np.argsort(delta_codes, kind="stable").astype(np.int32) + n_old
+
+            old_offsets, old_rows = self.offsets[key], self.row_ids[key]
+            old_counts = np.zeros(n + 1, dtype=np.int64)
+            old_counts[moved] = np.diff(old_offsets)
+            old_code = np.zeros(n + 1, dtype=np.int64)
+            old_code[moved] = np.arange(n_known + 1)
+            offsets = np.concatenate(([0], np.cumsum(old_counts + delta_counts)))
+
+            # Each value's existing rows precede its appended ones, so posting lists stay ascending
+            row_ids = np.empty(len(df), dtype=np.int32)
+            for code in range(n + 1):
+                start = offsets[code]
+                if old_counts[code]:
+                    was = old_code[code]
+                    row_ids[start:start + old_counts[code]] = old_rows[old_offsets[was]:old_offsets[was + 1]]
+                row_ids[start + old_counts[code]:offsets[code + 1]] = delta_rows[delta_offsets[code]:delta_offsets[code + 1]]
+
+            index.categories[key] = categories
+            index.codes[key] = np.concatenate([codes, delta_codes]).astype(np.min_scalar_type(n))
+            index.offsets[key] = offsets
+            index.row_ids[key] = row_ids
+
+        delta_dates = delta["Order Date"].to_numpy().astype("datetime64[ns]").view(np.int64)
+        delta_order = np.argsort(delta_dates, kind="stable").astype(np.int32)
+        # side="right" places appended rows after existing rows of the same date, as a stable sort would
+        positions = np.searchsorted(self.sorted_dates, delta_dates[delta_order], side="right")
+        index.dates = np.concatenate([self.dates, delta_dates])
+        index.date_order = np.insert(self.date_order, positions, delta_order + n_old)
+        index.sorted_dates = np.insert(self.sorted_dates, positions, delta_dates[delta_order])
+        return index
+
+    def select(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Resolve filters to ascending row positions.
+        Returns None when no filter is active, meaning every row is selected.
+        """
+        # Each constraint is (estimated row count, kind, payload)
+        constraints = []
+
+        start, end = filters.get("date_start"), filters.get("date_end")
+        if start or end:
+            lo_ns = pd.Timestamp(start).value if start else np.iinfo(np.int64).min
+            hi_ns = pd.Timestamp(end).value if end else np.iinfo(np.int64).max
+            lo = np.searchsorted(self.sorted_dates, lo_ns, side="left")
+            hi = np.searchsorted(self.sorted_dates, hi_ns, side="right")
+            constraints.append((max(hi - lo, 0), "date", (lo, hi, lo_ns, hi_ns)))
+
+        for key in self.columns:
+            values = filters.get(key)
+            if not values:
+                continue
+            selected = self._value_codes(key, values)
+            offsets = self.offsets[key]
+            count = int((offsets[selected + 1] - offsets[selected]).sum())
+            constraints.append((count, key, selected))
+
+        if not constraints:
+            return None
+
+        constraints.sort(key=lambda c: c[0])
+        if constraints[0][0] == 0:
+            return np.empty(0, dtype=np.int32)
+
+        _, kind, payload = constraints[0]
+        rows = self._expand(kind, payload)
+
+        for _, kind, payload in constraints[1:]:
+            if len(rows) == 0:
+                break
+            rows = rows[self._probe(kind, payload, rows)]
+        return rows
+
+    def facet_counts(self, filters: Dict[str, Any]) -> Tuple[int, Dict[str, Dict[Any, int]]]:
+        """
+        Rows matching `filters`, and for every dimension the rows each of its
+        values would match if chosen: the dimension's own selection is left
+        out, so alternatives to a chosen value keep their counts, while every
+        other filter applies. Values counted 0 are still listed.
+
+        Counts are bincounts of the index's codes over the selected rows; an
+        unfiltered dimension reads them from its posting-list offsets.
+        """
+        rows = self.select(filters)
+        counts = {}
+        for key in self.columns:
+            others = self.select({**filters, key: None}) if filters.get(key) else rows
+            n = len(self.categories[key])
+            if others is None:
+                per_value = np.diff(self.offsets[key])[:n]
+            else:
+                per_value = np.bincount(self.codes[key][others], minlength=n + 1)[:n]
+            counts[key] = dict(zip(self.categories[key].tolist(), per_value.tolist()))
+        return (self.n_rows if rows is None else len(rows)), counts
+
+    def _value_codes(self, key: str, values: List[Any]) -> np.ndarray:
+        codes = self.categories[key].get_indexer(pd.Index(values).unique())
+        return codes[codes >= 0]
+
+    def _expand(self, kind: str, payload) -> np.ndarray:
+        if kind == "date":
+            lo, hi, _, _ = payload
+            return np.sort(self.date_order[lo:hi])
+
+        offsets, row_ids = self.offsets[kind], self.row_ids[kind]
+        if len(payload) == 1:
+            code = payload[0]
+            return row_ids[offsets[code]:offsets[code + 1]]
+        # Posting lists of different values are disjoint, so the union is a plain merge
+        return np.sort(np.concatenate([row_ids[offsets[c]:offsets[c + 1]] for c in payload]))
+
+    def _probe(self, kind: str, payload, rows: np.ndarray) -> np.ndarray:
+        if kind == "date":
+            _, _, lo_ns, hi_ns = payload
+            dates = self.dates[rows]
+            return (dates >= lo_ns) & (dates <= hi_ns)
+
+        lookup = np.zeros(len(self.categories[kind]) + 1, dtype=bool)
+        lookup[payload] = True
+        return lookup[self.codes[kind][rows]]
@@ -0,0 +1,25 @@
+import hashlib
+import os
+from typing import BinaryIO
+
+# "1" lets an upload identical to an earlier one share its parsed session
+UPLOAD_DEDUP = os.getenv("UPLOAD_DEDUP", "1") == "1"
+# Bytes hashed per read
+_CHUNK_BYTES = 1 << 20
+
+
+def fingerprint(file: BinaryIO, filename: str) -> str:
+    """
+    Dataset key of an upload: a SHA-256 digest of its bytes, read from the
+    spooled upload in chunks, together with its file type, which picks the
+    parser. The file is left at its start for parsing. Anyone holding the
+    file can compute the key, so it is private to the session store and never
+    accepted as a session id.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    file.seek(0)
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    return f"upload-{extension}-{digest.hexdigest()}"
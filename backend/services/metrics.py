@@ -0,0 +1,328 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+# "1" honours an `X-Profile: 1` request header by sampling that request's stacks
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dashboard-profiles"))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Leaf functions of a thread that is waiting rather than working; such samples are skipped
+_IDLE_FRAMES = {"wait", "select", "poll", "_worker", "get", "accept", "_wait_for_tstate_lock"}
+
+# (stage, chart_id, seconds) of the spans recorded so far in the current request or chart build
+Span = Tuple[str, str, float]
+_spans: ContextVar[Optional[List[Span]]] = ContextVar("spans", default=None)
+_chart: ContextVar[str] = ContextVar("chart", default="")
+_route: ContextVar[Optional[List[str]]] = ContextVar("route", default=None)
+
+
+class _Series:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Registry:
+    """
+    Process-local histograms and counters, rendered in the Prometheus text
+    format. With several uvicorn workers, each reports its own.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Tuple[str, Dict[tuple, _Series]]] = {}
+        self._counters: Dict[str, Tuple[str, Dict[tuple, float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, help_text: str, seconds: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, (help_text, {}))[1]
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = _Series()
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry.buckets[i] += 1
+                    break
+            entry.count += 1
+            entry.sum += seconds
+
+    def inc(self, name: str, help_text: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, (help_text, {}))[1]
+            series[key] = series.get(key, 0) + amount
+
+    def render(self, gauges: Dict[str, Tuple[str, float]]) -> str:
+        """The text exposition of every metric, followed by `gauges` (name -> (help, value))."""
+        lines = []
+        with self._lock:
+            for name, (help_text, series) in sorted(self._histograms.items()):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, entry in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS, entry.buckets):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_labels(key, le=f'{bound:g}')} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {entry.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {entry.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(key)} {entry.count}")
+            for name, (help_text, series) in sorted(self._counters.items()):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value!r}")
+        for name, (help_text, value) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value!r}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key: tuple, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+registry = Registry()
+
+
+# ── Spans ─────────────────────────────────────────────────────────────────────
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one stage of the current request (or chart build)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, _chart.get(), time.perf_counter() - start)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator form of span()."""
+    def decorate(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def chart_span(chart_id: str) -> Iterator[None]:
+    """A "chart" span; the spans nested in it (e.g. "render") are labelled with chart_id too."""
+    token = _chart.set(chart_id)
+    try:
+        with span("chart"):
+            yield
+    finally:
+        _chart.reset(token)
+
+
+def record(stage: str, chart_id: str, seconds: float) -> None:
+    spans = _spans.get()
+    if spans is None:
+        # Outside a request, e.g. in the benchmarks
+        _observe(stage, chart_id, "", seconds)
+    else:
+        spans.append((stage, chart_id, seconds))
+
+
+def run_chart(chart_id: str, builder: Callable[..., Any], args: tuple) -> Tuple[Any, List[Span]]:
+    """
+    builder(*args) inside a chart span, returning its result and the
+    spans recorded meanwhile. Runs on the worker pool, so spans are carried
+    back to the request with the result rather than through the context, which
+    also works when the worker is another process.
+    """
+    spans: List[Span] = []
+    token = _spans.set(spans)
+    try:
+        with chart_span(chart_id):
+            return builder(*args), spans
+    finally:
+        _spans.reset(token)
+
+
+def merge(spans: List[Span]) -> None:
+    """Add spans returned by run_chart to the current request."""
+    for stage, chart_id, seconds in spans:
+        record(stage, chart_id, seconds)
+
+
+def set_route(path: str) -> None:
+    """Label the current request's metrics with its route template."""
+    route = _route.get()
+    if route is not None:
+        route[0] = path
+
+
+def chart_failed(chart_id: str, reason: str) -> None:
+    registry.inc("dashboard_chart_failures_total", "Charts left out of a response.", chart_id=chart_id, reason=reason)
+
+
+def _observe(stage: str, chart_id: str, route: str, seconds: float) -> None:
+    registry.observe(
+        "dashboard_stage_seconds", "Time spent in one stage of a request.", seconds,
+        stage=stage, chart_id=chart_id, route=route,
+    )
+
+
+def _server_timing(spans: List[Span], total: float) -> str:
+    # Stages that ran more than once (e.g. render) are summed
+    durations: Dict[str, float] = {}
+    for stage, chart_id, seconds in spans:
+        name = f"{stage}.{chart_id}" if chart_id else stage
+        durations[name] = durations.get(name, 0.0) + seconds
+    durations["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+class TimingMiddleware:
+    """
+    Collects the spans of each HTTP request, reports them in a Server-Timing
+    header and records them, with the request's total time, in the histograms
+    labelled by route. With PROFILE_REQUESTS=1, a request sent with
+    `X-Profile: 1` is also sampled; the response names the profile file in its
+    own X-Profile header.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Span] = []
+        route = [""]
+        tokens = _spans.set(spans), _route.set(route)
+        sampler = None
+        if PROFILE_REQUESTS and Headers(scope=scope).get("x-profile") == "1":
+            sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+            sampler.start()
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", _server_timing(spans, time.perf_counter() - start))
+                if sampler is not None:
+                    headers.append("X-Profile", sampler.filename)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total = time.perf_counter() - start
+            _spans.reset(tokens[0])
+            _route.reset(tokens[1])
+            if sampler is not None:
+                # Joining the sampler and writing its profile block, so they run off the event loop
+                await asyncio.to_thread(sampler.stop)
+            # Unmatched paths share one label so they cannot grow the series without bound
+            label = route[0] or "unmatched"
+            for stage, chart_id, seconds in spans:
+                _observe(stage, chart_id, label, seconds)
+            registry.observe(
+                "dashboard_request_seconds", "Total time to serve a request.", total,
+                route=label, method=scope["method"], status=str(status[0]),
+            )
+
+
+class TimedRoute(APIRoute):
+    """
+    Route class of the API routers: labels the request's metrics with the
+    route template, times the endpoint itself, and records the rest of the
+    handler (request parsing, response validation and serialisation) as
+    "validate".
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Any) -> Any:
+            set_route(self.path)
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                elapsed = time.perf_counter() - start
+                endpoint = next((s for stage, _, s in reversed(_spans.get() or []) if stage == "endpoint"), None)
+                if endpoint is not None:
+                    record("validate", "", max(elapsed - endpoint, 0.0))
+
+        return timed_handler
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    # Same signature (through __wrapped__) and the same sync/async kind, so FastAPI treats it as the original
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+            with span("endpoint"):
+                return await endpoint(*args, **kwargs)
+        return timed_endpoint
+    return timed("endpoint")(endpoint)
+
+
+# ── Sampling profiler ─────────────────────────────────────────────────────────
+class Sampler(threading.Thread):
+    """
+    Samples the stacks of every other thread at a fixed interval until
+    stopped, then writes them in collapsed ("folded") form, one
+    `frame;frame;... count` line per distinct stack, as read by flamegraph.pl
+    and speedscope. Requests are sampled together with whatever else the
+    process runs meanwhile.
+    """
+
+    def __init__(self, interval_s: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval_s = interval_s
+        self.filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.folded"
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident or frame.f_code.co_name in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, self.filename), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
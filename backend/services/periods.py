@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+FREQ_MAP = {"week": "W", "month": "M", "quarter": "Q"}
+
+
+def period_label(ts: pd.Timestamp, granularity: str) -> str:
+    if granularity == "week":
+        return ts.strftime("%d %b '%y")
+    elif granularity == "month":
+        return ts.strftime("%b %Y")
+    else:  # quarter
+        q = (ts.month - 1) // 3 + 1
+        return f"Q{q} {ts.year}"
+
+
+class PeriodBuckets:
+    """
+    Week, month and quarter bucket ids for every day of a session's date
+    range (from the start of its first quarter), with each bucket's start and
+    axis label, built once at ingest.
+
+    Ids are kept per calendar day rather than per row, so the raw rows, any
+    row selection and the rollup cells all map to buckets through one gather
+    on their day number, and per-period totals are bincounts over those ids:
+    no frame copy, no to_period and no per-label formatting per request.
+    Bucket ids are in chronological order.
+    """
+
+    def __init__(self, dates: pd.Series):
+        days = _day_numbers(dates)
+        valid = days[days != _NAT_DAY]
+        # The calendar starts on the first day of the first date's quarter, so the start of
+        # every month and quarter in range has a bucket too (rollup cells are dated so)
+        month = np.datetime64(int(valid.min()) if len(valid) else 0, "D").astype("datetime64[M]")
+        quarter = month - month.astype(np.int64) % 3
+        self.first_day = int(quarter.astype("datetime64[D]").astype(np.int64))
+        n_days = int(valid.max()) - self.first_day + 1 if len(valid) else 0
+
+        calendar = pd.date_range(pd.Timestamp(self.first_day, unit="D"), periods=n_days, freq="D")
+        self.ids: Dict[str, np.ndarray] = {}
+        self.starts: Dict[str, pd.DatetimeIndex] = {}
+        self.labels: Dict[str, np.ndarray] = {}
+        for granularity, freq in FREQ_MAP.items():
+            starts = calendar.to_period(freq).to_timestamp()
+            unique, ids = np.unique(starts.to_numpy(), return_inverse=True)
+            self.ids[granularity] = ids.astype(np.int32)
+            self.starts[granularity] = pd.DatetimeIndex(unique)
+            self.labels[granularity] = np.array(
+                [period_label(ts, granularity) for ts in self.starts[granularity]], dtype=object
+            )
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(ids.nbytes for ids in self.ids.values()))
+
+    def of(self, dates: pd.Series, granularity: str) -> np.ndarray:
+        """
+        Bucket id of every date; -1 for missing dates. Raises ValueError for a
+        date outside the session's range, which has no bucket.
+        """
+        days = _day_numbers(dates)
+        missing = days == _NAT_DAY
+        offsets = days - self.first_day
+        ids = self.ids[granularity]
+        present = offsets[~missing] if missing.any() else offsets
+        if len(present) and (present.min() < 0 or present.max() >= len(ids)):
+            raise ValueError("date outside the session's date range")
+        if not missing.any():
+            return ids[offsets]
+        out = np.full(len(days), -1, dtype=ids.dtype)
+        out[~missing] = ids[present]
+        return out
+
+    def positions(self, periods: List[pd.Timestamp], granularity: str) -> np.ndarray:
+        """Bucket ids of period start timestamps, e.g. DistinctCounts.periods."""
+        return self.starts[granularity].get_indexer(pd.DatetimeIndex(periods))
+
+    def totals(self, ids: np.ndarray, granularity: str, *values: pd.Series) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Bucket ids that occur in `ids`, in chronological order, and the sum of
+        each of `values` per such bucket.
+        """
+        n = len(self.labels[granularity])
+        valid = ids >= 0
+        ids = ids[valid]
+        present = np.flatnonzero(np.bincount(ids, minlength=n))
+        sums = [np.bincount(ids, weights=v.to_numpy(dtype=float)[valid], minlength=n)[present] for v in values]
+        return present, sums
+
+
+# Day number of NaT after the datetime64[D] cast
+_NAT_DAY = np.iinfo(np.int64).min
+
+
+def _day_numbers(dates: pd.Series) -> np.ndarray:
+    return dates.to_numpy(dtype="datetime64[D]").view(np.int64)
@@ -0,0 +1,240 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from services.cache import canonical_key, in_flight, result_cache
+from services.chart_builder import build_single_chart
+from services.session import Session
+from services.session_store import session_store
+from services.workers import build_dashboard, measure_cpu, run_in_thread
+
+# "1" precomputes the likeliest next requests of each new session while the server is idle
+PREFETCH = os.getenv("PREFETCH", "1") == "1"
+PREFETCH_MAX_STATES = int(os.getenv("PREFETCH_MAX_STATES", "12"))
+# Per session: CPU seconds spent prefetching (by the worker threads computing it), and MB of prefetched results
+PREFETCH_CPU_S = float(os.getenv("PREFETCH_CPU_S", "5"))
+PREFETCH_MB = float(os.getenv("PREFETCH_MB", "32"))
+# Prefetching resumes only once no request has been in progress for this long
+PREFETCH_IDLE_MS = float(os.getenv("PREFETCH_IDLE_MS", "250"))
+
+# Filters whose single values are prefetched, as a first click in the FilterPanel
+PREFETCH_DIMENSIONS = ("market", "category", "segment")
+# Sales & Profit Trend granularities besides the default month
+TREND_GRANULARITIES = ("week", "quarter")
+
+# Prefetched keys remembered for the hit-rate statistics
+_MAX_TRACKED = 10_000
+
+logger = logging.getLogger(__name__)
+
+# (kind, filters, chart options): "dashboard" states have no options
+State = Tuple[str, Dict[str, Any], Dict[str, Any]]
+
+
+class Prefetcher:
+    """
+    Background precomputation of the requests a user is likely to make next
+    on a new session: the dashboard for one value of each of
+    PREFETCH_DIMENSIONS (the largest values first) and the trend chart at its
+    other granularities. Results go into the result cache under the keys the
+    dashboard and chart routes look up, so a prefetched click is a cache hit.
+
+    One state is computed at a time, and only while no request is in
+    progress: real traffic pauses prefetching, which resumes after
+    PREFETCH_IDLE_MS of quiet. A state already being computed when a request
+    arrives runs to completion, through the same single-flight as the routes,
+    so a request for that very state joins it. Each session stops at
+    PREFETCH_MAX_STATES, PREFETCH_CPU_S or PREFETCH_MB, and is dropped once
+    it is replaced or leaves memory.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.active_requests = 0
+        self.last_request = 0.0
+        self.prefetched = 0
+        self.used = 0
+        self.lookups = 0
+        self.served = 0
+        self.pauses = 0
+        self.budget_stops = 0
+        self.cpu_seconds = 0.0
+        self._queue: Deque[Tuple[str, "weakref.ref[Session]"]] = deque()
+        # key -> whether a request has been answered with its prefetched result yet
+        self._tracked: "OrderedDict[Tuple[str, str], bool]" = OrderedDict()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the scheduler on the running event loop (from the app's lifespan)."""
+        if self.enabled and result_cache.max_bytes > 0:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, session_id: str, session: Session) -> None:
+        """Queue a new (or replaced) session for prefetching; a no-op while the scheduler is not running."""
+        if self._task is None:
+            return
+        # Weak, so a queued session does not outlive its eviction from the store
+        self._queue.append((session_id, weakref.ref(session)))
+        self._wake.set()
+
+    def observe(self, key: Tuple[str, str], hit: bool) -> None:
+        """Record a dashboard or chart lookup, for the hit-rate statistics."""
+        self.lookups += 1
+        if hit and key in self._tracked:
+            self.served += 1
+            if not self._tracked[key]:
+                self._tracked[key] = True
+                self.used += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "queued_sessions": len(self._queue),
+            "prefetched": self.prefetched,
+            # Share of prefetched results that answered at least one request
+            "used": self.used,
+            "hit_rate": round(self.used / self.prefetched, 4) if self.prefetched else 0.0,
+            # Share of dashboard and chart requests answered by a prefetched result
+            "lookups": self.lookups,
+            "served": self.served,
+            "served_rate": round(self.served / self.lookups, 4) if self.lookups else 0.0,
+            "pauses": self.pauses,
+            "budget_stops": self.budget_stops,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            while not self._queue:
+                self._wake.clear()
+                await self._wake.wait()
+            session_id, ref = self._queue.popleft()
+            try:
+                await self._prefetch(session_id, ref)
+            except Exception:
+                logger.exception("prefetch for session %s failed", session_id)
+
+    async def _prefetch(self, session_id: str, ref: "weakref.ref[Session]") -> None:
+        session = ref()
+        if session is None:
+            return
+        states = likely_states(session)
+        del session
+
+        cpu, stored = 0.0, 0
+        for kind, filters, options in states:
+            if cpu >= PREFETCH_CPU_S or stored >= PREFETCH_MB * 2**20:
+                self.budget_stops += 1
+                return
+            await self._idle()
+            session = ref()
+            if session is None or not session_store.holds(session_id, session):
+                return
+            if kind == "dashboard":
+                key = canonical_key(session_id, "dashboard", filters)
+            else:
+                key = canonical_key(session_id, "chart", filters, chart_id="sales_profit_trend", options=options)
+            if key in result_cache:
+                continue
+
+            compute = _compute(session_id, session, kind, filters, options, key)
+            # Counts only the worker tasks of this state, not requests served meanwhile
+            with measure_cpu() as spent:
+                result = await in_flight.run((key, id(session)), "prefetch", compute)
+            cpu += spent[0]
+            self.cpu_seconds += spent[0]
+            del session
+
+            if result is not None and key in result_cache:
+                stored += len(result.model_dump_json())
+                self.prefetched += 1
+                self._tracked[key] = False
+                while len(self._tracked) > _MAX_TRACKED:
+                    self._tracked.popitem(last=False)
+
+    async def _idle(self) -> None:
+        paused = False
+        while True:
+            quiet = time.monotonic() - self.last_request
+            if self.active_requests == 0 and quiet * 1000 >= PREFETCH_IDLE_MS:
+                return
+            if not paused:
+                self.pauses += 1
+                paused = True
+            await asyncio.sleep(PREFETCH_IDLE_MS / 1000)
+
+
+def likely_states(session: Session) -> List[State]:
+    """
+    The states to prefetch, likeliest first: the other trend granularities,
+    then single values of PREFETCH_DIMENSIONS by row count, taking each
+    dimension's largest value in turn.
+    """
+    states: List[State] = [("chart", {}, {"granularity": g}) for g in TREND_GRANULARITIES]
+    ranked = []
+    for key in PREFETCH_DIMENSIONS:
+        categories = session.index.categories[key]
+        counts = np.diff(session.index.offsets[key])[:len(categories)]
+        order = np.argsort(-counts, kind="stable")
+        ranked.append([(key, categories[i]) for i in order if counts[i] > 0])
+    for values in itertools.zip_longest(*ranked):
+        states += [("dashboard", {key: [value]}, {}) for key, value in filter(None, values)]
+    return states[:PREFETCH_MAX_STATES]
+
+
+def _compute(
+    session_id: str, session: Session, kind: str, filters: Dict[str, Any], options: Dict[str, Any], key: Tuple[str, str],
+) -> Callable[[], Any]:
+    # Cached only while the session is current: an append meanwhile has already invalidated its results
+    async def compute() -> Optional[BaseModel]:
+        view = await run_in_thread(session.view, filters)
+        if kind == "dashboard":
+            result, complete = await build_dashboard(view)
+        else:
+            result = await run_in_thread(
+                build_single_chart, view.df, "sales_profit_trend", options, view.rollup, view.periods, view.products
+            )
+            complete = True
+        if complete:
+            session_store.cache_result(session_id, session, key, result)
+        return result
+
+    return compute
+
+
+prefetcher = Prefetcher(PREFETCH)
+
+
+class ActivityMiddleware:
+    """Counts the HTTP requests in progress, so prefetching runs only while the server is idle."""
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        prefetcher.active_requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            prefetcher.active_requests -= 1
+            prefetcher.last_request = time.monotonic()
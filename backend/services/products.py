@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+# Products ranked by the Top Products chart unless its options ask for another count
+TOP_PRODUCTS_K = 10
+MAX_TOP_PRODUCTS_K = 100
+
+
+class ProductTotals:
+    """
+    Profit, Sales and row count per product, indexed by the Product Name
+    category codes.
+
+    A session builds one over all of its rows at ingest, which answers the
+    unfiltered ranking without touching the rows. A filtered view is totalled
+    from its own rows' codes with bincount, which replaces a groupby over the
+    highest-cardinality column.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        names = _product_names(df)
+        self.names = names.cat.categories
+        codes = names.cat.codes.to_numpy()
+        valid = codes >= 0
+        n = len(self.names)
+        codes = codes[valid]
+        self.profit = np.bincount(codes, weights=_weights(df["Profit"], valid), minlength=n)
+        self.sales = np.bincount(codes, weights=_weights(df["Sales"], valid), minlength=n)
+        self.rows = np.bincount(codes, minlength=n)
+
+    def extend(self, df: pd.DataFrame, tail: pd.DataFrame) -> "ProductTotals":
+        """Totals after an append: `df` is the new session frame and `tail` its appended rows."""
+        added = ProductTotals(tail)
+        totals = ProductTotals.__new__(ProductTotals)
+        totals.names = _product_names(df).cat.categories
+        # Old and appended codes both map into the merged category set
+        old = totals.names.get_indexer(self.names)
+        new = totals.names.get_indexer(added.names)
+        for attr in ("profit", "sales", "rows"):
+            merged = np.zeros(len(totals.names), dtype=getattr(self, attr).dtype)
+            np.add.at(merged, old, getattr(self, attr))
+            np.add.at(merged, new, getattr(added, attr))
+            setattr(totals, attr, merged)
+        return totals
+
+    @property
+    def nbytes(self) -> int:
+        return self.profit.nbytes + self.sales.nbytes + self.rows.nbytes
+
+
+def top_products(df: pd.DataFrame, k: int = TOP_PRODUCTS_K, totals: Optional[ProductTotals] = None) -> pd.DataFrame:
+    """
+    The k products of `df` with the highest total Profit, in ascending order
+    (as the horizontal bar chart draws them), with their Sales. `totals` may
+    be passed when it covers exactly the rows of `df`. Ties rank by name, as
+    nlargest over a groupby would.
+    """
+    totals = totals or ProductTotals(df)
+    observed = np.flatnonzero(totals.rows > 0)
+    profit = totals.profit[observed]
+
+    candidates = np.arange(len(observed))
+    if len(observed) > k:
+        # Partial selection: only products at or above the k-th largest profit are sorted
+        kth = np.partition(profit, len(profit) - k)[len(profit) - k]
+        candidates = np.flatnonzero(profit >= kth)
+    ranked = candidates[np.lexsort((candidates, -profit[candidates]))][:k]
+    chosen = observed[ranked][::-1]
+
+    return pd.DataFrame({
+        "Product Name": totals.names[chosen].to_numpy(dtype=object),
+        "Profit": totals.profit[chosen],
+        "Sales": totals.sales[chosen],
+    })
+
+
+def _product_names(df: pd.DataFrame) -> pd.Series:
+    names = df["Product Name"]
+    return names if isinstance(names.dtype, pd.CategoricalDtype) else names.astype("category")
+
+
+def _weights(values: pd.Series, valid: np.ndarray) -> np.ndarray:
+    # Missing values count as 0, as in a groupby sum
+    return np.nan_to_num(values.to_numpy(dtype=float)[valid])
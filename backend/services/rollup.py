@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional, Tuple
+from services.filter_index import FilterIndex, FILTER_COLUMNS
+from services.distinct import DistinctSketch, DISTINCT_COUNT_MODE
+
+# Filter dimensions the cube is keyed by. No aggregate groups by Sub-Category or
+# Region, and keyed by them too a cube has about as many cells as rows on
+# Superstore-shaped data; filters on them aggregate raw rows.
+ROLLUP_FILTERS = {key: col for key, col in FILTER_COLUMNS.items() if key not in ("sub_category", "region")}
+
+# Cube grain: one cell per Order Date month × every ROLLUP_FILTERS dimension. Cells
+# are dated on the first of their month, so month and quarter buckets read them
+# directly; weeks straddle months and come from raw rows.
+ROLLUP_KEYS = ["Order Date"] + list(ROLLUP_FILTERS.values())
+
+# A cube with more cells than this share of the raw rows saves too little work to
+# be worth its memory; such sessions keep aggregating raw rows.
+MAX_CELL_RATIO = 0.5
+
+# Additive cell columns: output name → (raw column, aggregation)
+MEASURES = {
+    "Sales":         ("Sales", "sum"),
+    "Profit":        ("Profit", "sum"),
+    "Shipping Cost": ("Shipping Cost", "sum"),
+    "Discount Sum":  ("Discount", "sum"),
+    "Rows":          ("Discount", "size"),
+}
+
+
+class Rollup:
+    """
+    Materialized sum/count cube over a session frame.
+
+    Cells carry the same column names as the raw frame for the additive measures
+    (Sales, Profit, Shipping Cost), so sum-based aggregations work unchanged on a
+    filtered cube. Discount is stored as "Discount Sum" next to a "Rows" count,
+    from which means are recovered. In approximate distinct-count mode each cell
+    also carries order and customer sketches.
+    """
+
+    def __init__(self, frame: pd.DataFrame, sketch: Optional[DistinctSketch] = None):
+        self.frame = frame
+        self.index = FilterIndex(frame, ROLLUP_FILTERS)
+        self.sketch = sketch
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> Optional["Rollup"]:
+        grouped = _grouped(df)
+        frame = grouped.agg(**MEASURES).reset_index()
+        if len(frame) > MAX_CELL_RATIO * len(df):
+            return None
+
+        sketch = None
+        if DISTINCT_COUNT_MODE == "approximate":
+            sketch = DistinctSketch(df, _group_of_row(grouped), frame["Order Date"])
+        return cls(frame, sketch)
+
+    def extend(self, delta: pd.DataFrame) -> "Rollup":
+        """
+        Cube with `delta`'s rows added, where delta is the tail of the session
+        frame after an append (so it carries the merged categories). Only the
+        delta is aggregated: its cells are added into existing cells with the
+        same month and dimensions, the rest are appended as new cells. Existing
+        cells are matched among those of the delta's months only.
+        """
+        grouped = _grouped(delta)
+        cells = grouped.agg(**MEASURES).reset_index()
+        frame = self.frame.assign(**{
+            col: self.frame[col].cat.set_categories(delta[col].cat.categories) for col in ROLLUP_FILTERS.values()
+        })
+
+        candidates = np.flatnonzero(np.isin(frame["Order Date"].to_numpy(), cells["Order Date"].unique()))
+        known = pd.MultiIndex.from_frame(frame[ROLLUP_KEYS].take(candidates))
+        found = known.get_indexer(pd.MultiIndex.from_frame(cells[ROLLUP_KEYS]))
+        matched = found >= 0
+
+        updated = {}
+        for col in MEASURES:
+            values = frame[col].to_numpy().copy()
+            values[candidates[found[matched]]] += cells[col].to_numpy()[matched]
+            updated[col] = values
+        new_cells = cells[~matched]
+        frame = pd.concat([frame.assign(**updated), new_cells], ignore_index=True)
+
+        sketch = None
+        if self.sketch is not None:
+            # Cell of each delta group in the extended cube
+            cell_of_group = np.empty(len(cells), dtype=np.int64)
+            cell_of_group[matched] = candidates[found[matched]]
+            cell_of_group[~matched] = len(self.frame) + np.arange(len(new_cells))
+            groups = _group_of_row(grouped)
+            cell_of_row = np.where(groups >= 0, cell_of_group[groups], -1)
+            sketch = self.sketch.extend(delta, cell_of_row, new_cells["Order Date"])
+
+        rollup = Rollup.__new__(Rollup)
+        rollup.frame = frame
+        rollup.index = self.index.extend(frame)
+        rollup.sketch = sketch
+        return rollup
+
+    def select(
+        self, filters: Dict[str, Any], index: FilterIndex, rows: Optional[np.ndarray]
+    ) -> Optional[Tuple[Optional[np.ndarray], Optional[np.ndarray]]]:
+        """
+        Resolve filters to (cells, edge rows), or None when a filter is on a
+        dimension the cube leaves out. `index` and `rows` are the session's
+        filter index and the rows it selected for the same filters.
+
+        Cells are cube positions (None for all cells). A month the date range
+        covers only in part, judged from the session's dates, has no cells
+        selected: its selected rows are returned as edge rows instead, for
+        gather(). Edge rows are None when every month is whole.
+        """
+        if any(filters.get(key) for key in FILTER_COLUMNS if key not in ROLLUP_FILTERS):
+            return None
+        start, end = filters.get("date_start"), filters.get("date_end")
+        if not (start or end):
+            return self.index.select(filters), None
+
+        dates = index.sorted_dates
+        cell_filters = dict(filters)
+        low_cut = high_cut = None
+        if start:
+            lo = pd.Timestamp(start).value
+            month, next_month = _month_bounds(lo)
+            partial = np.searchsorted(dates, month, side="left") < np.searchsorted(dates, lo, side="left")
+            low_cut = next_month if partial else None
+            cell_filters["date_start"] = pd.Timestamp(next_month if partial else month)
+        if end:
+            hi = pd.Timestamp(end).value
+            month, next_month = _month_bounds(hi)
+            if np.searchsorted(dates, hi, side="right") < np.searchsorted(dates, next_month, side="left"):
+                high_cut = month
+                cell_filters["date_end"] = pd.Timestamp(month - 1)
+
+        cells = self.index.select(cell_filters)
+        if low_cut is None and high_cut is None:
+            return cells, None
+        row_dates = index.dates[rows]
+        edge = np.zeros(len(rows), dtype=bool)
+        if low_cut is not None:
+            edge |= row_dates < low_cut
+        if high_cut is not None:
+            edge |= row_dates >= high_cut
+        return cells, rows[edge]
+
+    def gather(self, cells: Optional[np.ndarray], df: pd.DataFrame, rows: Optional[np.ndarray]) -> pd.DataFrame:
+        """
+        The selected cells (all when None), followed by `rows` of the session
+        frame `df` as cells of one row each: everything reading cells sums
+        them, so edge rows need no grouping. Built column by column, as
+        concatenating categorical frames compares their categories.
+        """
+        frame = self.frame if cells is None else self.frame.take(cells)
+        if rows is None:
+            return frame
+
+        dates = df["Order Date"].to_numpy()[rows]
+        columns = {"Order Date": np.concatenate([frame["Order Date"].to_numpy(), _months(dates)])}
+        for col in ROLLUP_FILTERS.values():
+            dtype = frame[col].dtype
+            # Codes of the session frame in the cube's categories, -1 staying -1
+            mapping = np.append(dtype.categories.get_indexer(df[col].cat.categories), -1)
+            codes = np.concatenate([frame[col].array.codes, mapping[df[col].array.codes[rows]]])
+            columns[col] = pd.Categorical.from_codes(codes, dtype=dtype)
+        for name, (col, agg) in MEASURES.items():
+            values = df[col].to_numpy()[rows] if agg == "sum" else np.ones(len(rows), dtype=np.int64)
+            columns[name] = np.concatenate([frame[name].to_numpy(), values])
+        return pd.DataFrame(columns)
+
+    @property
+    def nbytes(self) -> int:
+        sketch_bytes = self.sketch.nbytes if self.sketch is not None else 0
+        return int(self.frame.memory_usage(deep=True).sum()) + self.index.nbytes + sketch_bytes
+
+
+def _grouped(df: pd.DataFrame):
+    months = _months(df["Order Date"].to_numpy())
+    keys = [pd.Series(months, index=df.index, name="Order Date")] + list(ROLLUP_FILTERS.values())
+    return df.groupby(keys, observed=True, sort=False)
+
+
+def _months(dates: np.ndarray) -> np.ndarray:
+    # Cells are dated on the first day of their month
+    return dates.astype("datetime64[M]").astype("datetime64[ns]")
+
+
+def _month_bounds(ns: int) -> Tuple[int, int]:
+    """Start of the month holding a timestamp and of the next month, in ns."""
+    month = np.datetime64(ns, "ns").astype("datetime64[M]")
+    return tuple(int(m.astype("datetime64[ns]").astype(np.int64)) for m in (month, month + 1))
+
+
+def _group_of_row(grouped) -> np.ndarray:
+    # Rows with a missing key belong to no cell and get -1
+    return grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
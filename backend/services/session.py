@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional
+from models.schemas import FilterOptions
+from services.data_processor import append_rows, get_filter_options, merge_filter_options
+from services.filter_index import FilterIndex
+from services.metrics import span, timed
+from services.periods import PeriodBuckets
+from services.products import ProductTotals
+from services.rollup import Rollup
+from services.distinct import DistinctIndex, DistinctCounts, DISTINCT_COUNT_MODE
+
+
+class Session:
+    """A parsed upload together with the lookup structures built for it at ingest."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.index = FilterIndex(df)
+        self.distinct = DistinctIndex(df)
+        # None when the data is too sparse for a cube to pay off
+        self.rollup = Rollup.build(df)
+        self.filter_options = get_filter_options(df)
+        self.periods = PeriodBuckets(df["Order Date"])
+        self.products = ProductTotals(df)
+        self.nbytes = self._measure()
+
+    @classmethod
+    def from_parts(
+        cls,
+        df: pd.DataFrame,
+        index: FilterIndex,
+        distinct: DistinctIndex,
+        rollup: Optional[Rollup],
+        filter_options: FilterOptions,
+        products: Optional[ProductTotals] = None,
+    ) -> "Session":
+        """Reassemble a session from already built structures, e.g. when reloading a spill."""
+        session = cls.__new__(cls)
+        session.df, session.index, session.distinct, session.rollup = df, index, distinct, rollup
+        session.filter_options = filter_options
+        # Only depends on the date range, so it is rebuilt rather than spilled
+        session.periods = PeriodBuckets(df["Order Date"])
+        # Not spilled either: rebuilding costs one bincount pass
+        session.products = products if products is not None else ProductTotals(df)
+        session.nbytes = session._measure()
+        return session
+
+    def append(self, delta: pd.DataFrame) -> "Session":
+        """
+        A new session with `delta`'s rows added. Every structure is extended from
+        its current state, so the cost follows the delta rather than the history
+        (apart from copying arrays). The session itself is left untouched for
+        requests still reading it.
+        """
+        if len(delta) == 0:
+            return self
+        if len(self.df) == 0:
+            return Session(delta)
+        df = append_rows(self.df, delta)
+        tail = df.iloc[len(self.df):]
+        return Session.from_parts(
+            df,
+            self.index.extend(df),
+            self.distinct.extend(df),
+            # A session too sparse for a cube keeps aggregating raw rows
+            self.rollup.extend(tail) if self.rollup is not None else None,
+            merge_filter_options(self.filter_options, get_filter_options(tail)),
+            self.products.extend(df, tail),
+        )
+
+    def _measure(self) -> int:
+        rollup_bytes = self.rollup.nbytes if self.rollup is not None else 0
+        frame_bytes = int(self.df.memory_usage(deep=True).sum())
+        lookup_bytes = self.periods.nbytes + self.products.nbytes
+        return frame_bytes + self.index.nbytes + self.distinct.nbytes + rollup_bytes + lookup_bytes
+
+    def view(self, filters: Dict[str, Any]) -> "SessionView":
+        return SessionView(self, filters)
+
+
+class SessionView:
+    """One filter state resolved against a session: selected rows and rollup cells."""
+
+    def __init__(self, session: Session, filters: Dict[str, Any]):
+        self.session = session
+        self.periods = session.periods
+        with span("filter"):
+            self.rows: Optional[np.ndarray] = session.index.select(filters)
+            self.df = session.df if self.rows is None else session.df.take(self.rows)
+
+            self.cells: Optional[np.ndarray] = None
+            self.rollup: Optional[pd.DataFrame] = None
+            # Whether the selected cells alone answer the filters, with no month aggregated from raw rows
+            self.whole_cells = False
+            selection = session.rollup.select(filters, session.index, self.rows) if session.rollup is not None else None
+            if selection is not None:
+                self.cells, edge = selection
+                self.rollup = session.rollup.gather(self.cells, session.df, edge)
+                self.whole_cells = edge is None
+        # The session's product totals only describe the unfiltered rows
+        self.products = session.products if self.rows is None else None
+
+    @timed("distinct_counts")
+    def distinct_counts(self) -> DistinctCounts:
+        rollup = self.session.rollup
+        # Sketches are per cell, so a month aggregated from raw rows is counted exactly
+        if DISTINCT_COUNT_MODE == "approximate" and self.whole_cells and rollup.sketch is not None:
+            customers = self.session.distinct.repeat_customers(self.rows)
+            return rollup.sketch.count(self.cells, customers)
+        return self.session.distinct.count(self.rows)
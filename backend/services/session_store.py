@@ -0,0 +1,579 @@
+import json
+import logging
+import mmap
+import os
+import pickle
+import re
+import stat
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+import pyarrow as pa
+from pydantic import BaseModel
+from services.cache import result_cache
+from services.session import Session
+
+# Resident sessions are kept under this budget; the least recently used ones
+# beyond it are spilled to SESSION_SPILL_DIR and reloaded on their next request.
+SESSION_RAM_MB = float(os.getenv("SESSION_RAM_MB", "2048"))
+# Sessions idle for this long are spilled even when the budget is not reached
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", "1800"))
+# Spill files untouched for this long are deleted
+SESSION_DISK_TTL_S = float(os.getenv("SESSION_DISK_TTL_S", str(7 * 24 * 3600)))
+# State files are unpickled on reload, so the directory must be private to the
+# server's user: it is created with mode 0700, and one that other users could
+# write to is refused at startup.
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "dashboard-sessions"))
+# "local" (default): spill files are only written on eviction and sessions live in
+# one process. "shared": every upload is written to SESSION_SPILL_DIR straight
+# away, so all uvicorn workers pointing at the same directory serve every session.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "local")
+
+# Names a spill or link file may have: the session ids issued at upload, and the
+# content keys of shared uploads (services/fingerprint.py). Anything else (e.g.
+# "../x") never reaches the disk. Content keys are private to the store: clients
+# can compute them, so only session ids are accepted from callers.
+_SESSION_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_DATASET_KEY = re.compile(r"upload-[a-z]+-[0-9a-f]{64}")
+
+logger = logging.getLogger(__name__)
+
+# Out-of-band buffers are aligned so reloaded numpy arrays stay aligned
+_ALIGN = 64
+# Idle and disk expiry are checked at most this often
+_SWEEP_INTERVAL_S = 60.0
+
+
+class SessionStore:
+    """
+    Upload sessions under a RAM budget, with LRU and idle-time eviction.
+
+    An evicted session is spilled to two files: its frame as an Arrow IPC
+    file, and its index structures (filter index, distinct codes, rollup,
+    filter options) as a protocol-5 pickle whose array buffers sit in the file
+    itself. Both are memory-mapped on reload, so the frame's numeric columns
+    and every index array are read from the page cache instead of being
+    rebuilt. Spill files outlive the process, so sessions survive a restart.
+
+    With a shared backend the spill directory is the source of truth: uploads
+    are written through, resident sessions act as a per-worker read-through
+    cache, and each hit is revalidated against the state file so a session
+    replaced or discarded by another worker is never served stale.
+
+    Identical uploads share one dataset: it is stored once under a content
+    key and each of their session ids is a link to it, recorded in memory and
+    in a small link file so that spills, restarts and other workers resolve
+    it too. Datasets are reference counted by their links and dropped with
+    the last one; a linked session that is appended to gets data of its own.
+
+    Spill files are written with the lock released: a write-through copy
+    before the new session is swapped in, and an evicted session's files
+    while it stays resident, so requests for other sessions never wait on
+    the disk.
+    """
+
+    def __init__(self, max_bytes: int, idle_ttl_s: float, disk_ttl_s: float, spill_dir: str, shared: bool = False):
+        self.max_bytes = max_bytes
+        self.idle_ttl_s = idle_ttl_s
+        self.disk_ttl_s = disk_ttl_s
+        self.spill_dir = spill_dir
+        self.shared = shared
+        self.bytes = 0
+        self.spills = 0
+        self.evictions = 0
+        self.reloads = 0
+        self.reload_seconds = 0.0
+        self.max_reload_seconds = 0.0
+        self.expired = 0
+        # session_id -> (session, last access, spill file version or None)
+        self._resident: "OrderedDict[str, Tuple[Session, float, Optional[int]]]" = OrderedDict()
+        # session_id -> key of the shared dataset it links to, and links per key
+        self._links: Dict[str, str] = {}
+        self._refs: Counter = Counter()
+        self._last_sweep = 0.0
+        # Sessions chosen for eviction whose spill files are still to be written,
+        # and those being written right now
+        self._evicting: Dict[str, Session] = {}
+        self._spilling: set = set()
+        self._lock = threading.RLock()
+        _private_dir(spill_dir)
+
+    def put(self, session_id: str, session: Session) -> None:
+        _check(session_id, is_session_id)
+        version = self._write_through(session_id, session)
+        with self._lock:
+            # A linked session stops sharing: the new data is its own
+            self._unlink(session_id)
+            self._store(session_id, session, version)
+        self._spill_evicted()
+
+    def put_dataset(self, key: str, session: Session) -> None:
+        """Store the dataset of an upload under its content key, for sessions to link to."""
+        _check(key, is_dataset_key)
+        version = self._write_through(key, session)
+        with self._lock:
+            self._store(key, session, version)
+        self._spill_evicted()
+
+    def _write_through(self, session_id: str, session: Session) -> Optional[int]:
+        """With a shared backend, write the session's spill files; returns their version."""
+        if not self.shared:
+            return None
+        spill_session(self.spill_dir, session_id, session)
+        return spill_version(self.spill_dir, session_id)
+
+    def _store(self, session_id: str, session: Session, version: Optional[int]) -> None:
+        with self._lock:
+            # Cached results and spill files of a replaced session must never be served for the new data
+            result_cache.invalidate(session_id)
+            self._drop(session_id)
+            if self.shared:
+                # Already replaced by the write-through copy
+                self.spills += 1
+            else:
+                _remove_files(self.spill_dir, session_id)
+            self._resident[session_id] = (session, time.monotonic(), version)
+            self.bytes += session.nbytes
+            self._enforce(keep=session_id)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        if not is_session_id(session_id):
+            return None
+        with self._lock:
+            session = self._get(self._resolve(session_id))
+        self._spill_evicted()
+        return session
+
+    def link(self, session_id: str, key: str) -> Optional[Session]:
+        """
+        Serve session_id from the dataset stored under key (see put_dataset),
+        without a copy of its own. Returns the dataset, or None when key is not
+        stored, in which case nothing is linked.
+        """
+        _check(session_id, is_session_id)
+        _check(key, is_dataset_key)
+        with self._lock:
+            session = self._get(key)
+            if session is not None:
+                self._unlink(session_id)
+                self._links[session_id] = key
+                self._refs[key] += 1
+                _write_link(self.spill_dir, session_id, key)
+        self._spill_evicted()
+        return session
+
+    def holds(self, session_id: str, session: Session) -> bool:
+        """Whether session is still session_id's resident data; never reloads or refreshes it."""
+        if not is_session_id(session_id):
+            return False
+        with self._lock:
+            key = self._resolve(session_id)
+            entry = self._resident.get(key)
+            if entry is None or entry[0] is not session:
+                return False
+            return not self.shared or spill_version(self.spill_dir, key) == entry[2]
+
+    def cache_result(self, session_id: str, session: Session, key: Tuple[str, str], value: BaseModel) -> bool:
+        """
+        Cache a result computed from `session`, only while it is still
+        session_id's data. A put (e.g. an append) landing during the compute
+        has already invalidated the session's results, and they must not be
+        re-cached from the old rows; holding the lock across the check and the
+        put keeps a replacement from slipping in between.
+        """
+        with self._lock:
+            if not self.holds(session_id, session):
+                return False
+            result_cache.put(key, value)
+            return True
+
+    def _get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            entry = self._resident.get(session_id)
+            if entry is not None and self.shared and spill_version(self.spill_dir, session_id) != entry[2]:
+                # Replaced or discarded by another worker
+                result_cache.invalidate(session_id)
+                self._drop(session_id)
+                entry = None
+            if entry is not None:
+                self._resident[session_id] = (entry[0], time.monotonic(), entry[2])
+                self._resident.move_to_end(session_id)
+                self._enforce(keep=session_id)
+                return entry[0]
+
+            start = time.perf_counter()
+            version = spill_version(self.spill_dir, session_id)
+            session = load_session(self.spill_dir, session_id)
+            if session is None:
+                return None
+            elapsed = time.perf_counter() - start
+            self.reloads += 1
+            self.reload_seconds += elapsed
+            self.max_reload_seconds = max(self.max_reload_seconds, elapsed)
+
+            self._resident[session_id] = (session, time.monotonic(), version)
+            self.bytes += session.nbytes
+            self._enforce(keep=session_id)
+            return session
+
+    def discard(self, session_id: str) -> None:
+        """Forget a session entirely, in memory and on disk."""
+        if not is_session_id(session_id):
+            return
+        with self._lock:
+            self._unlink(session_id)
+            result_cache.invalidate(session_id)
+            self._drop(session_id)
+            _remove_files(self.spill_dir, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "shared" if self.shared else "local",
+                "resident_sessions": len(self._resident),
+                "resident_bytes": self.bytes,
+                "linked_sessions": len(self._links),
+                "shared_datasets": len(self._refs),
+                "max_bytes": self.max_bytes,
+                "spilled_sessions": len(_spilled_ids(self.spill_dir)),
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "reload_ms_avg": round(self.reload_seconds / self.reloads * 1000, 2) if self.reloads else 0.0,
+                "reload_ms_max": round(self.max_reload_seconds * 1000, 2),
+                "expired": self.expired,
+            }
+
+    def _resolve(self, session_id: str) -> str:
+        """Key the session's data is stored under: its shared dataset's, or its own id."""
+        key = self._links.get(session_id)
+        if key is not None and self.shared and _read_link(self.spill_dir, session_id) != key:
+            # Detached or discarded by another worker
+            del self._links[session_id]
+            self._refs[key] -= 1
+            if self._refs[key] <= 0:
+                del self._refs[key]
+            key = None
+        if key is None and session_id not in self._resident:
+            # Linked before a restart or by another worker
+            key = _read_link(self.spill_dir, session_id)
+            if key is not None:
+                self._links[session_id] = key
+                self._refs[key] += 1
+        return key or session_id
+
+    def _unlink(self, session_id: str) -> None:
+        """Detach session_id from its shared dataset, if any, dropping the dataset with its last link."""
+        key = self._links.pop(session_id, None) or _read_link(self.spill_dir, session_id)
+        if key is None:
+            return
+        _remove_link(self.spill_dir, session_id)
+        self._refs[key] -= 1
+        if self._refs[key] > 0:
+            return
+        del self._refs[key]
+        # Links this process has not resolved (made by other workers, or before a restart) are only on disk
+        if not _linked(self.spill_dir, key):
+            result_cache.invalidate(key)
+            self._drop(key)
+            _remove_files(self.spill_dir, key)
+
+    def _drop(self, session_id: str) -> None:
+        entry = self._resident.pop(session_id, None)
+        if entry is not None:
+            self.bytes -= entry[0].nbytes
+        self._evicting.pop(session_id, None)
+
+    def _evict(self, session_id: str) -> None:
+        # Already being spilled, or waiting to be
+        if session_id in self._evicting or session_id in self._spilling:
+            return
+        session = self._resident[session_id][0]
+        # A session reloaded from disk is immutable, so its spill files are still current. Shared
+        # sessions are written through; missing files mean another worker discarded it.
+        if self.shared or has_spill(self.spill_dir, session_id):
+            self._drop(session_id)
+            self.evictions += 1
+            return
+        # Spilled by _spill_evicted once the lock is released; it stays resident until then
+        self._evicting[session_id] = session
+
+    def _spill_evicted(self) -> None:
+        """Write the spill files of the sessions _evict chose, outside the lock, then drop them."""
+        while True:
+            with self._lock:
+                session_id = next((key for key in self._evicting if key not in self._spilling), None)
+                if session_id is None:
+                    return
+                session = self._evicting[session_id]
+                self._spilling.add(session_id)
+            try:
+                spill_session(self.spill_dir, session_id, session)
+            except BaseException:
+                with self._lock:
+                    self._spilling.discard(session_id)
+                    if self._evicting.get(session_id) is session:
+                        # Stays resident; a later request tries again
+                        del self._evicting[session_id]
+                        _remove_files(self.spill_dir, session_id)
+                raise
+            with self._lock:
+                self._spilling.discard(session_id)
+                if self._evicting.get(session_id) is not session:
+                    # Replaced or discarded while being written, so the files hold stale data
+                    _remove_files(self.spill_dir, session_id)
+                    continue
+                self._drop(session_id)
+                self.spills += 1
+                self.evictions += 1
+
+    def _enforce(self, keep: str) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep >= _SWEEP_INTERVAL_S:
+            self._last_sweep = now
+            for session_id, (_, last_access, _) in list(self._resident.items()):
+                if session_id != keep and now - last_access > self.idle_ttl_s:
+                    self._evict(session_id)
+            if self.shared:
+                # Other workers expire files by age, so keep the ones in use here fresh
+                for session_id in self._resident:
+                    _touch(self.spill_dir, session_id)
+            self.expired += _remove_expired(self.spill_dir, self.disk_ttl_s, set(self._resident))
+            _remove_dangling_links(self.spill_dir, self.disk_ttl_s, set(self._resident) | set(self._refs))
+
+        # LRU first; the session being served stays resident even if it alone exceeds the budget
+        for session_id in list(self._resident):
+            if self.bytes - sum(session.nbytes for session in self._evicting.values()) <= self.max_bytes:
+                break
+            if session_id != keep:
+                self._evict(session_id)
+
+
+# ── Spill files ───────────────────────────────────────────────────────────────
+def is_session_id(value: str) -> bool:
+    return _SESSION_ID.fullmatch(value) is not None
+
+
+def is_dataset_key(value: str) -> bool:
+    return _DATASET_KEY.fullmatch(value) is not None
+
+
+def is_storage_key(value: str) -> bool:
+    return is_session_id(value) or is_dataset_key(value)
+
+
+def _check(value: str, valid: Callable[[str], bool]) -> None:
+    if not valid(value):
+        raise ValueError(f"Invalid session id or key: {value!r}")
+
+
+def _paths(directory: str, session_id: str) -> Tuple[str, str]:
+    _check(session_id, is_storage_key)
+    base = os.path.join(directory, session_id)
+    return base + ".arrow", base + ".state"
+
+
+def has_spill(directory: str, session_id: str) -> bool:
+    # The state file is written last, so its presence marks a complete spill
+    return os.path.exists(_paths(directory, session_id)[1])
+
+
+def spill_version(directory: str, session_id: str) -> Optional[int]:
+    """Inode of the session's state file. Every (re)spill replaces the file; touching it does not."""
+    try:
+        return os.stat(_paths(directory, session_id)[1]).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _private_dir(directory: str) -> None:
+    """
+    Create the spill directory for this user only, or check an existing one.
+    A directory owned by another user, or writable by one, could hold a
+    planted state file, so it is refused rather than used.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    info = os.stat(directory)
+    # A symlink to our own directory must be ours too, or its owner could repoint it
+    if os.lstat(directory).st_uid != os.getuid() or info.st_uid != os.getuid():
+        raise RuntimeError(f"Spill directory {directory} is not owned by this user")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise RuntimeError(f"Spill directory {directory} is writable by other users")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+
+def _tmp(path: str) -> str:
+    # Per writer, so concurrent spills of one session (e.g. by two workers) never share a file
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def spill_session(directory: str, session_id: str, session: Session) -> None:
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    frame_path, state_path = _paths(directory, session_id)
+
+    # Frames with columns Arrow cannot type (e.g. mixed int/str objects) travel in the state file
+    try:
+        table = pa.Table.from_pandas(session.df, preserve_index=True)
+        frame = None
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        table, frame = None, session.df
+
+    if table is not None:
+        tmp = _tmp(frame_path)
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, frame_path)
+
+    _write_state(state_path, (frame, session.index, session.distinct, session.rollup, session.filter_options))
+
+
+def load_session(directory: str, session_id: str) -> Optional[Session]:
+    frame_path, state_path = _paths(directory, session_id)
+    if not os.path.exists(state_path):
+        return None
+    try:
+        frame, index, distinct, rollup, filter_options = _read_state(state_path)
+        if frame is None:
+            table = pa.ipc.open_file(pa.memory_map(frame_path)).read_all()
+            frame = table.to_pandas(split_blocks=True)
+    except Exception:
+        # A truncated or foreign file is a missing session, not a server error
+        logger.warning("unreadable spill files for session %s", session_id, exc_info=True)
+        return None
+    _touch(directory, session_id)
+    return Session.from_parts(frame, index, distinct, rollup, filter_options)
+
+
+def _write_state(path: str, obj: Any) -> None:
+    """Pickle obj with every contiguous array buffer stored out of band, aligned, in the same file."""
+    buffers = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    layout, offset = [], 0
+    tmp = _tmp(path)
+    with open(tmp, "wb") as f:
+        for buffer in buffers:
+            raw = buffer.raw()
+            pad = -offset % _ALIGN
+            f.write(b"\0" * pad)
+            offset += pad
+            f.write(raw)
+            layout.append((offset, raw.nbytes))
+            offset += raw.nbytes
+        f.write(payload)
+        trailer = json.dumps({"payload": [offset, len(payload)], "buffers": layout}).encode()
+        f.write(trailer)
+        f.write(len(trailer).to_bytes(8, "little"))
+    os.replace(tmp, path)
+
+
+def _read_state(path: str) -> Any:
+    # Arrays come back as read-only views into the mapping, which they keep alive
+    with open(path, "rb") as f:
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    size = int.from_bytes(view[-8:], "little")
+    trailer = json.loads(bytes(view[-8 - size:-8]))
+    start, length = trailer["payload"]
+    buffers = [view[offset:offset + n] for offset, n in trailer["buffers"]]
+    return pickle.loads(view[start:start + length], buffers=buffers)
+
+
+def _touch(directory: str, session_id: str) -> None:
+    # Disk expiry counts from the last use
+    for path in _paths(directory, session_id):
+        if os.path.exists(path):
+            os.utime(path)
+
+
+def _remove_files(directory: str, session_id: str) -> None:
+    for path in _paths(directory, session_id):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _link_path(directory: str, session_id: str) -> str:
+    _check(session_id, is_session_id)
+    return os.path.join(directory, session_id + ".link")
+
+
+def _write_link(directory: str, session_id: str, key: str) -> None:
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    path = _link_path(directory, session_id)
+    tmp = _tmp(path)
+    with open(tmp, "w") as f:
+        f.write(key)
+    os.replace(tmp, path)
+
+
+def _read_link(directory: str, session_id: str) -> Optional[str]:
+    try:
+        with open(_link_path(directory, session_id)) as f:
+            key = f.read()
+    except FileNotFoundError:
+        return None
+    return key if is_dataset_key(key) else None
+
+
+def _remove_link(directory: str, session_id: str) -> None:
+    path = _link_path(directory, session_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _link_files(directory: str) -> Dict[str, str]:
+    """session_id -> key of every link file."""
+    if not os.path.isdir(directory):
+        return {}
+    links = {}
+    for name in os.listdir(directory):
+        session_id = name[:-len(".link")]
+        if name.endswith(".link") and is_session_id(session_id):
+            key = _read_link(directory, session_id)
+            if key is not None:
+                links[session_id] = key
+    return links
+
+
+def _linked(directory: str, key: str) -> bool:
+    return key in _link_files(directory).values()
+
+
+def _remove_dangling_links(directory: str, ttl_s: float, in_use: set) -> None:
+    # A link lives as long as its dataset: it goes once the dataset has expired from disk and memory
+    cutoff = time.time() - ttl_s
+    for session_id, key in _link_files(directory).items():
+        path = _link_path(directory, session_id)
+        if key not in in_use and not has_spill(directory, key) and os.path.getmtime(path) < cutoff:
+            _remove_link(directory, session_id)
+
+
+def _spilled_ids(directory: str) -> set:
+    if not os.path.isdir(directory):
+        return set()
+    ids = {name[:-len(".state")] for name in os.listdir(directory) if name.endswith(".state")}
+    return {session_id for session_id in ids if is_storage_key(session_id)}
+
+
+def _remove_expired(directory: str, ttl_s: float, resident: set) -> int:
+    removed = 0
+    cutoff = time.time() - ttl_s
+    for session_id in _spilled_ids(directory) - resident:
+        state_path = _paths(directory, session_id)[1]
+        if os.path.getmtime(state_path) < cutoff:
+            _remove_files(directory, session_id)
+            removed += 1
+    return removed
+
+
+session_store = SessionStore(
+    int(SESSION_RAM_MB * 1024 * 1024),
+    SESSION_IDLE_TTL_S,
+    SESSION_DISK_TTL_S,
+    SESSION_SPILL_DIR,
+    shared=SESSION_BACKEND == "shared",
+)
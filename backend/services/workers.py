@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple, Union
+import pandas as pd
+from models.schemas import ChartData, ChartError, ChartSpec, DashboardResponse
+from services.chart_builder import build_single_chart, chart_specs, warm_templates
+from services.data_processor import compute_kpis, compute_sparklines
+from services.metrics import chart_failed, merge, run_chart
+from services.periods import PeriodBuckets
+from services.products import ProductTotals
+from services.session import SessionView
+
+# "thread" (default) or "process". Process workers receive pickled copies of the
+# filtered frames, which only pays off when chart building dominates.
+WORKER_POOL = os.getenv("WORKER_POOL", "thread")
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "4"))
+
+# A chart that takes longer than this is left out of the response
+CHART_TIMEOUT_S = float(os.getenv("CHART_TIMEOUT_S", "20"))
+
+_executor: Optional[Executor] = None
+# CPU seconds of the pool tasks run under measure_cpu()
+_cpu: ContextVar[Optional[List[float]]] = ContextVar("cpu", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if WORKER_POOL == "process":
+            # spawn, not fork: the server process already runs threads
+            _executor = ProcessPoolExecutor(
+                max_workers=WORKER_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_templates,
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix="dashboard")
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+@contextmanager
+def measure_cpu() -> Iterator[List[float]]:
+    """
+    CPU seconds spent by the pool tasks this context awaits, as [seconds].
+    Each task is measured on the thread (or process) that runs it, so work for
+    other requests running meanwhile is not counted.
+    """
+    spent = [0.0]
+    token = _cpu.set(spent)
+    try:
+        yield spent
+    finally:
+        _cpu.reset(token)
+
+
+def _run_timed(fn: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    start = time.thread_time()
+    return fn(*args), time.thread_time() - start
+
+
+def _add_cpu(timed: Tuple[Any, float]) -> Any:
+    result, seconds = timed
+    spent = _cpu.get()
+    if spent is not None:
+        spent[0] += seconds
+    return result
+
+
+async def run_in_pool(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run fn(*args) on the configured worker pool. Thread workers run it in a
+    copy of the caller's context, so its timing spans reach the request.
+    """
+    executor = get_executor()
+    if isinstance(executor, ThreadPoolExecutor):
+        timed = await asyncio.get_running_loop().run_in_executor(
+            executor, contextvars.copy_context().run, _run_timed, fn, *args
+        )
+    else:
+        timed = await asyncio.get_running_loop().run_in_executor(executor, _run_timed, fn, *args)
+    return _add_cpu(timed)
+
+
+async def run_in_thread(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run fn(*args) off the event loop, in this process. Used for work on
+    session-wide structures that should not be pickled into worker processes.
+    """
+    if WORKER_POOL == "process":
+        return _add_cpu(await asyncio.to_thread(_run_timed, fn, *args))
+    return await run_in_pool(fn, *args)
+
+
+async def build_charts(
+    df: pd.DataFrame,
+    rollup: Optional[pd.DataFrame] = None,
+    periods: Optional[PeriodBuckets] = None,
+    products: Optional[ProductTotals] = None,
+) -> List[ChartData]:
+    """
+    Build every dashboard chart concurrently. A chart that fails or exceeds
+    CHART_TIMEOUT_S is dropped from the result; its worker finishes in the
+    background and the output is discarded.
+    """
+    specs = chart_specs(df, rollup, periods, products)
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(run_in_pool(run_chart, chart_id, builder, args), CHART_TIMEOUT_S)
+            for chart_id, _, builder, args in specs
+        ),
+        return_exceptions=True,
+    )
+
+    charts = []
+    for (chart_id, title, _, _), result in zip(specs, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning("%s timed out after %gs", chart_id, CHART_TIMEOUT_S)
+            chart_failed(chart_id, "timeout")
+        elif isinstance(result, BaseException):
+            logger.error("%s failed", chart_id, exc_info=result)
+            chart_failed(chart_id, type(result).__name__)
+        else:
+            figure_json, spans = result
+            merge(spans)
+            charts.append(ChartData(chart_id=chart_id, title=title, figure_json=figure_json))
+    return charts
+
+
+async def build_chart_batch(
+    view: SessionView, specs: List[ChartSpec]
+) -> AsyncIterator[Tuple[int, Union[ChartData, ChartError]]]:
+    """
+    Build every requested chart over one filtered view, concurrently, and
+    yield (position in specs, chart or error) as each one completes. Invalid
+    options, failures and timeouts become ChartErrors rather than failing the
+    whole batch.
+    """
+    async def build(position: int, spec: ChartSpec) -> Tuple[int, Any]:
+        args = (view.df, spec.chart_id, spec.options or {}, view.rollup, view.periods, view.products)
+        try:
+            return position, await asyncio.wait_for(run_in_pool(run_chart, spec.chart_id, build_single_chart, args), CHART_TIMEOUT_S)
+        except Exception as exc:
+            return position, exc
+
+    for next_done in asyncio.as_completed([build(i, spec) for i, spec in enumerate(specs)]):
+        position, result = await next_done
+        chart_id = specs[position].chart_id
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning("%s timed out after %gs", chart_id, CHART_TIMEOUT_S)
+            chart_failed(chart_id, "timeout")
+            yield position, ChartError(chart_id=chart_id, detail=f"Timed out after {CHART_TIMEOUT_S:g}s.")
+        elif isinstance(result, ValueError):
+            yield position, ChartError(chart_id=chart_id, detail=str(result))
+        elif isinstance(result, Exception):
+            logger.error("%s failed", chart_id, exc_info=result)
+            chart_failed(chart_id, type(result).__name__)
+            yield position, ChartError(chart_id=chart_id, detail="Chart could not be built.")
+        else:
+            chart, spans = result
+            merge(spans)
+            yield position, chart
+
+
+async def build_dashboard(view: SessionView) -> Tuple[DashboardResponse, bool]:
+    """
+    KPIs, charts and sparklines for one filter state, computed concurrently,
+    and whether every chart made it in (partial responses are not cached).
+    """
+    charts = asyncio.ensure_future(build_charts(view.df, view.rollup, view.periods, view.products))
+    distinct = await run_in_thread(view.distinct_counts)
+    kpis, sparklines = await asyncio.gather(
+        run_in_thread(compute_kpis, view.df, view.rollup, distinct),
+        run_in_thread(compute_sparklines, view.df, view.rollup, distinct, view.periods),
+    )
+    response = DashboardResponse(kpis=kpis, charts=await charts, sparklines=sparklines)
+    return response, len(response.charts) == len(chart_specs(view.df, view.rollup))
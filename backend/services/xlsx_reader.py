@@ -0,0 +1,467 @@
+"""
+Streaming reader for the first worksheet of an .xlsx workbook.
+
+The sheet XML is inflated block by block and scanned with numpy rather than
+an XML parser: tags are found by comparing bytes, each cell's reference,
+type and value are located with searchsorted, and numbers and shared-string
+indices are parsed from fixed-width byte arrays. No Python object is created
+per cell, and strings are decoded once per distinct value. Only the
+requested columns are kept, and each comes out already typed. Text is
+unescaped (XML entities, then _xHHHH_ escapes) and error cells such as
+#DIV/0! are missing values. Workbooks using markup the scanner does not
+recognise, or values it cannot read, raise XlsxUnsupported, so callers
+can fall back to pandas.read_excel.
+"""
+import html
+import itertools
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Inflated sheet XML handled per block; each block becomes one typed chunk
+BLOCK_BYTES = 16 * 1024 * 1024
+# The first block only needs to hold the header row
+_HEADER_BYTES = 64 * 1024
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_RELS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_DOC_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+_SHARED = re.compile(rb"<si(?:\s[^>]*)?(?:/>|>(.*?)</si>)", re.S)
+_TEXT = re.compile(rb"<t(?:\s[^>]*)?>([^<]*)</t>")
+_PHONETIC = re.compile(rb"<rPh\b.*?</rPh>", re.S)
+# Characters XML cannot carry (e.g. a carriage return) are written as _x000D_,
+# and a literal "_x" run as _x005F_x
+_ESCAPE = re.compile(r"_x([0-9A-Fa-f]{4})_")
+
+# Cell kinds, from the t="..." attribute
+_NUMBER, _SHARED_STRING, _INLINE, _TEXT_VALUE, _BOOL, _ERROR = range(6)
+
+# Byte strings longer than this are sliced one by one rather than gathered
+_MAX_GATHER = 256
+# Cells gathered per numpy batch, bounding the temporary index matrices
+_GATHER_ROWS = 32768
+
+_LT, _GT, _SLASH, _QUOTE, _SPACE = b'<>/" '
+
+
+class XlsxUnsupported(Exception):
+    """The workbook uses a structure the streaming reader does not handle."""
+
+
+class _Cells:
+    """
+    The cells of one block of sheet XML, as parallel arrays in document
+    order: column number, row number, kind, and the value as a number, a
+    shared-string index or decoded text depending on the kind. Only cells
+    in `columns` are kept (all when None); `rows` lists every row number
+    the block has cells in.
+    """
+
+    def __init__(self, block: bytes, columns: Optional[np.ndarray] = None):
+        raw = np.frombuffer(block, dtype=np.uint8)
+        # Zero padding lets lookaheads and fixed-width gathers run past the end
+        b = np.concatenate([raw, np.zeros(_MAX_GATHER + 16, dtype=np.uint8)])
+        lt = np.flatnonzero(raw == _LT)
+        first, second = b[lt + 1], b[lt + 2]
+
+        is_cell = first == ord("c")
+        if (is_cell & np.isin(second, list(b"\t\r\n>/"))).any():
+            raise XlsxUnsupported("unrecognised cell markup")
+        starts = lt[is_cell & (second == _SPACE)]
+        n = len(starts)
+        if not ((b[starts + 3] == ord("r")) & (b[starts + 4] == ord("=")) & (b[starts + 5] == _QUOTE)).all():
+            raise XlsxUnsupported("cell without a leading reference")
+
+        # r="AB12": column letters, then row digits up to the closing quote
+        self.column, at = _read_number(b, starts + 6, b"AZ", 26, 3)
+        self.row, at = _read_number(b, at, b"09", 10, 7)
+        if not ((b[at] == _QUOTE) & (self.column > 0) & (self.row > 0)).all():
+            raise XlsxUnsupported("malformed cell reference")
+        self.rows = np.unique(self.row)
+
+        # A cell's <v> or <is> is the first one after its tag, and must open before the next cell does
+        next_start = np.append(starts[1:], len(raw))
+        if columns is not None:
+            keep = np.isin(self.column, columns)
+            self.column, self.row, starts, at, next_start = (
+                a[keep] for a in (self.column, self.row, starts, at, next_start)
+            )
+            n = len(starts)
+
+        gt = np.flatnonzero(raw == _GT)
+        tag_end = gt[np.searchsorted(gt, starts)]
+        empty = b[tag_end - 1] == _SLASH
+        self.kind = _kinds(b, at + 1, tag_end - empty - at - 1)
+
+        v_at, has_v = _child(lt[(first == ord("v")) & (second == _GT)], tag_end, next_start, empty)
+        v_start = v_at + 3
+        v_close = lt[(first == _SLASH) & (second == ord("v"))]
+        v_len = np.zeros(n, dtype=np.int64)
+        v_len[has_v] = v_close[np.searchsorted(v_close, v_start[has_v])] - v_start[has_v]
+
+        self.number = np.full(n, np.nan)
+        numeric = has_v & ((self.kind == _NUMBER) | (self.kind == _BOOL)) & (v_len > 0)
+        self.number[numeric] = _gather(b, v_start[numeric], v_len[numeric]).astype(np.float64)
+
+        self.shared = np.full(n, -1, dtype=np.int64)
+        shared = has_v & (self.kind == _SHARED_STRING) & (v_len > 0)
+        self.shared[shared] = _gather(b, v_start[shared], v_len[shared]).astype(np.int64)
+
+        self.text = np.full(n, None, dtype=object)
+        text = has_v & (self.kind == _TEXT_VALUE)
+        self.text[text] = _decode_all(block, b, v_start[text], v_len[text])
+
+        inline = self.kind == _INLINE
+        if inline.any():
+            opens = lt[(first == ord("i")) & (second == ord("s")) & (b[lt + 3] == _GT)]
+            is_at, has_is = _child(opens, tag_end, next_start, empty)
+            cells = np.flatnonzero(inline & has_is)
+            self._read_inline(block, b, lt, cells, is_at[cells] + 4)
+
+    def _read_inline(self, block: bytes, b: np.ndarray, lt: np.ndarray, cells: np.ndarray, content: np.ndarray) -> None:
+        # <is><t>text</t></is> is gathered; rich or spaced text is taken apart cell by cell
+        plain = (b[content] == _LT) & (b[content + 1] == ord("t")) & (b[content + 2] == _GT)
+        start = content + 3
+        end = lt[np.minimum(np.searchsorted(lt, start), len(lt) - 1)]
+        plain &= (b[end + 1] == _SLASH) & (b[end + 2] == ord("t")) & (b[end + 3] == _GT)
+        self.text[cells[plain]] = _decode_all(block, b, start[plain], end[plain] - start[plain])
+        for cell, at in zip(cells[~plain], content[~plain]):
+            self.text[cell] = _decode(_rich_text(block[at:block.find(b"</is>", at)]))
+
+    def take(self, keep: np.ndarray) -> "_Cells":
+        cells = _Cells.__new__(_Cells)
+        cells.rows = self.rows
+        for name in ("column", "row", "kind", "number", "shared", "text"):
+            setattr(cells, name, getattr(self, name)[keep])
+        return cells
+
+
+class XlsxSheet:
+    """
+    The first worksheet of a workbook. The header row is read on opening;
+    chunks() then streams the data rows.
+    """
+
+    def __init__(self, source: BinaryIO):
+        try:
+            self._archive = zipfile.ZipFile(source)
+            workbook = ET.fromstring(self._archive.read("xl/workbook.xml"))
+            rels = ET.fromstring(self._archive.read("xl/_rels/workbook.xml.rels"))
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as exc:
+            raise XlsxUnsupported(str(exc))
+
+        sheet = workbook.find(f"{_MAIN}sheets/{_MAIN}sheet")
+        if sheet is None:
+            raise XlsxUnsupported("no worksheet")
+        targets = {rel.get("Id"): rel for rel in rels.iter(f"{_RELS}Relationship")}
+        if sheet.get(f"{_DOC_REL}id") not in targets:
+            raise XlsxUnsupported("worksheet part not found")
+        self._sheet_path = _part_path(targets[sheet.get(f"{_DOC_REL}id")].get("Target"))
+        shared = [rel.get("Target") for rel in targets.values() if rel.get("Type", "").endswith("/sharedStrings")]
+        self._shared = _shared_strings(self._archive.read(_part_path(shared[0]))) if shared else np.empty(0, dtype=object)
+
+        properties = workbook.find(f"{_MAIN}workbookPr")
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        self._epoch = np.datetime64("1904-01-01" if date1904 else "1899-12-30", "ms")
+
+        # Column numbers kept by the scan; set once the wanted columns are known
+        self._columns: Optional[np.ndarray] = None
+        self._blocks = self._scan()
+        self._pending: Optional[_Cells] = None
+        self.header: List[str] = []
+        self._header_columns: Dict[int, str] = {}
+        with _as_unsupported():
+            for cells in self._blocks:
+                if len(cells.row):
+                    self._read_header(cells)
+                    break
+        if not self._header_columns:
+            raise XlsxUnsupported("no header row")
+
+    def chunks(self, kinds: Dict[str, str]) -> Iterator[pd.DataFrame]:
+        """
+        Typed frames of consecutive data rows, holding the `kinds` columns
+        (name → "category", "float", "datetime" or "auto"). Rows without any
+        cell are skipped.
+        """
+        # First occurrence of each wanted name
+        wanted: Dict[int, str] = {}
+        for column, name in self._header_columns.items():
+            if name in kinds and name not in wanted.values():
+                wanted[column] = name
+
+        self._columns = np.array(list(wanted), dtype=np.int64)
+
+        blocks = [self._pending] if self._pending is not None else []
+        try:
+            with _as_unsupported():
+                for cells in itertools.chain(blocks, self._blocks):
+                    if not len(cells.rows):
+                        continue
+                    row_pos = np.searchsorted(cells.rows, cells.row)
+                    n_rows = len(cells.rows)
+                    columns = {}
+                    for column, name in wanted.items():
+                        at = np.flatnonzero(cells.column == column)
+                        columns[name] = self._column(cells, at, row_pos[at], n_rows, kinds[name])
+                    yield pd.DataFrame({
+                        name: columns[name] if name in columns else _empty(kinds[name], n_rows) for name in kinds
+                    })
+        finally:
+            self._archive.close()
+
+    def _read_header(self, cells: _Cells) -> None:
+        in_header = cells.row == cells.row[0]
+        header = np.flatnonzero(in_header)
+        for column, text in zip(cells.column[header], self._texts(cells, header)):
+            name = "" if text is None else str(text).strip()
+            self.header.append(name)
+            self._header_columns.setdefault(int(column), name)
+        rest = np.flatnonzero(~in_header)
+        if len(rest):
+            self._pending = cells.take(rest)
+            self._pending.rows = self._pending.rows[self._pending.rows != cells.row[0]]
+
+    def _scan(self) -> Iterator[_Cells]:
+        pending = b""
+        size = _HEADER_BYTES
+        with self._archive.open(self._sheet_path) as stream:
+            while True:
+                data = stream.read(size)
+                size = BLOCK_BYTES
+                block = pending + data
+                if data:
+                    # Cut after the last complete row; the remainder starts the next block
+                    end = block.rfind(b"</row>")
+                    if end < 0:
+                        pending = block
+                        continue
+                    end += len(b"</row>")
+                    block, pending = block[:end], block[end:]
+                yield _Cells(block, self._columns)
+                if not data:
+                    return
+
+    def _column(self, cells: _Cells, at: np.ndarray, row_pos: np.ndarray, n_rows: int, kind: str) -> pd.Series:
+        # Cells without a value (<c r="L11" t="inlineStr"/> is how NaN is written) are missing, as an
+        # empty CSV field is, and must not send the whole chunk down the text path
+        texts = cells.text[at]
+        present = ~np.isnan(cells.number[at]) | (cells.shared[at] >= 0) | (pd.notna(texts) & (texts != ""))
+        if not present.all():
+            at, row_pos = at[present], row_pos[present]
+
+        kinds, numbers = cells.kind[at], cells.number[at]
+        numeric = (kinds == _NUMBER) | (kinds == _BOOL)
+
+        if kind == "float" and numeric.all():
+            out = np.full(n_rows, np.nan)
+            out[row_pos] = numbers
+            return pd.Series(out)
+
+        if kind == "datetime":
+            out = np.full(n_rows, np.datetime64("NaT"), dtype="datetime64[ns]")
+            serial = numeric & ~np.isnan(numbers)
+            out[row_pos[serial]] = self._epoch + np.round(numbers[serial] * 86_400_000).astype("timedelta64[ms]")
+            text = ~numeric
+            if text.any():
+                parsed = pd.to_datetime(pd.Index(self._texts(cells, at[text])), dayfirst=False, errors="coerce")
+                out[row_pos[text]] = parsed.to_numpy(dtype="datetime64[ns]")
+            return pd.Series(out)
+
+        if kind == "float":
+            numbers = numbers.copy()
+            texts = self._texts(cells, at[~numeric])
+            numbers[~numeric] = pd.to_numeric(pd.Series(texts), errors="coerce").to_numpy(dtype=float)
+            out = np.full(n_rows, np.nan)
+            out[row_pos] = numbers
+            return pd.Series(out)
+
+        if kind == "auto" and numeric.all():
+            out = np.full(n_rows, np.nan)
+            out[row_pos] = numbers
+            whole = ~np.isnan(out).any() and (out % 1 == 0).all()
+            return pd.Series(out.astype(np.int64) if whole else out)
+
+        if kind == "category" and (kinds == _SHARED_STRING).all():
+            return self._shared_column(cells.shared[at], row_pos, n_rows)
+
+        out = np.full(n_rows, None, dtype=object)
+        out[row_pos] = self._texts(cells, at)
+        return pd.Series(pd.Categorical(out) if kind == "category" else out)
+
+    def _shared_column(self, index: np.ndarray, row_pos: np.ndarray, n_rows: int) -> pd.Series:
+        # Coded from the shared-string indices, so only the distinct strings are compared
+        used, codes = np.unique(index, return_inverse=True)
+        if used[-1] >= len(self._shared):
+            raise XlsxUnsupported("shared string out of range")
+        missing = used < 0
+        categories, remap = np.unique(self._shared[used[~missing]], return_inverse=True)
+        out = np.full(n_rows, -1, dtype=np.int64)
+        out[row_pos] = np.append(np.full(missing.sum(), -1), remap)[codes]
+        return pd.Series(pd.Categorical.from_codes(out, categories=categories))
+
+    def _texts(self, cells: _Cells, at: np.ndarray) -> np.ndarray:
+        """Text of the given cells, numbers read as a CSV would show them; missing values are None."""
+        kinds = cells.kind[at]
+        out = cells.text[at]
+
+        shared = kinds == _SHARED_STRING
+        if shared.any():
+            index = cells.shared[at[shared]]
+            if index.max() >= len(self._shared):
+                raise XlsxUnsupported("shared string out of range")
+            out[shared] = np.where(index >= 0, self._shared[np.maximum(index, 0)], None)
+
+        numbers = cells.number[at]
+        for kind, convert in ((_NUMBER, _number_text), (_BOOL, lambda x: str(bool(x)).upper())):
+            mask = (kinds == kind) & ~np.isnan(numbers)
+            if mask.any():
+                out[mask] = [convert(x) for x in numbers[mask]]
+        return out
+
+
+@contextmanager
+def _as_unsupported() -> Iterator[None]:
+    # A value the scanner misreads (e.g. a number it cannot cast) is its limit, not a broken upload
+    try:
+        yield
+    except (ValueError, IndexError, KeyError, OverflowError) as exc:
+        raise XlsxUnsupported(f"unreadable cell data: {exc}") from exc
+
+
+def _read_number(b: np.ndarray, at: np.ndarray, digits: bytes, base: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The run of up to `width` digits starting at each position, read in `base`
+    with digits[0] worth 1 for letters and 0 for decimals; and where each run
+    ends.
+    """
+    lo, hi = digits
+    offset = lo - 1 if base == 26 else lo
+    value = np.zeros(len(at), dtype=np.int64)
+    active = np.ones(len(at), dtype=bool)
+    at = at.copy()
+    for _ in range(width):
+        ch = b[at]
+        active &= (ch >= lo) & (ch <= hi)
+        value[active] = value[active] * base + ch[active].astype(np.int64) - offset
+        at += active
+    return value, at
+
+
+def _kinds(b: np.ndarray, start: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """Cell kinds from the attributes following each cell's reference."""
+    kinds = np.full(len(start), _NUMBER, dtype=np.int8)
+    if not len(start) or length.max() <= 0:
+        return kinds
+    width = int(length.max())
+    if width > _MAX_GATHER:
+        raise XlsxUnsupported("unexpected cell attributes")
+    for lo in range(0, len(start), _GATHER_ROWS):
+        part = slice(lo, lo + _GATHER_ROWS)
+        # Padded so the two bytes after a match at the last position can be read
+        m = _matrix(b, start[part], length[part], width + 6)
+        hit = (m[:, :-5] == _SPACE) & (m[:, 1:-4] == ord("t")) & (m[:, 2:-3] == ord("=")) & (m[:, 3:-2] == _QUOTE)
+        found = hit.any(axis=1)
+        k = hit.argmax(axis=1) + 4
+        rows = np.arange(len(k))
+        c1, c2 = m[rows, k], m[rows, k + 1]
+        if (found & ~np.isin(c1, list(b"nsibed"))).any():
+            raise XlsxUnsupported("unknown cell type")
+
+        # "s" is a shared string and "str" a formula result; "d" is kept as text. Errors are
+        # never read, so their cells count as missing.
+        out = kinds[part]
+        out[found & (c1 == ord("s")) & (c2 == _QUOTE)] = _SHARED_STRING
+        out[found & (((c1 == ord("s")) & (c2 == ord("t"))) | (c1 == ord("d")))] = _TEXT_VALUE
+        out[found & (c1 == ord("e"))] = _ERROR
+        out[found & (c1 == ord("i"))] = _INLINE
+        out[found & (c1 == ord("b"))] = _BOOL
+    return kinds
+
+
+def _child(opens: np.ndarray, tag_end: np.ndarray, next_start: np.ndarray, empty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Position of each cell's first tag among `opens`, and whether the cell has one."""
+    opens = np.append(opens, np.iinfo(np.int64).max)
+    at = opens[np.searchsorted(opens, tag_end)]
+    has = ~empty & (at < next_start)
+    return np.where(has, at, 0), has
+
+
+def _matrix(b: np.ndarray, start: np.ndarray, length: np.ndarray, width: int) -> np.ndarray:
+    """Rows of `width` bytes from each start, zeroed past each length."""
+    rows = np.lib.stride_tricks.sliding_window_view(b, width)[start]
+    rows[np.arange(width) >= length[:, None]] = 0
+    return rows
+
+
+def _gather(b: np.ndarray, start: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """The byte strings at (start, length) as one fixed-width bytes array."""
+    width = max(int(length.max()), 1) if len(length) else 1
+    if width > _MAX_GATHER:
+        raise XlsxUnsupported("oversized cell value")
+    parts = [
+        np.ascontiguousarray(_matrix(b, start[lo:lo + _GATHER_ROWS], length[lo:lo + _GATHER_ROWS], width))
+        .view(f"S{width}").ravel()
+        for lo in range(0, len(start), _GATHER_ROWS)
+    ]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=f"S{width}")
+
+
+def _decode_all(block: bytes, b: np.ndarray, start: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """Decoded text at (start, length), decoding each distinct byte string once."""
+    out = np.empty(len(start), dtype=object)
+    short = length <= _MAX_GATHER
+    if short.any():
+        uniques, inverse = np.unique(_gather(b, start[short], length[short]), return_inverse=True)
+        out[short] = np.array([_decode(u) for u in uniques], dtype=object)[inverse]
+    for i in np.flatnonzero(~short):
+        out[i] = _decode(block[start[i]:start[i] + length[i]])
+    return out
+
+
+def _part_path(target: str) -> str:
+    # Relationship targets are relative to xl/ unless absolute
+    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+
+
+def _shared_strings(xml: bytes) -> np.ndarray:
+    items = _SHARED.findall(xml)
+    if len(items) != xml.count(b"<si>") + xml.count(b"<si ") + xml.count(b"<si/>"):
+        raise XlsxUnsupported("unrecognised shared string markup")
+    out = np.empty(len(items), dtype=object)
+    for i, item in enumerate(items):
+        if item.startswith(b"<t>") and item.endswith(b"</t>") and item.count(b"<") == 2:
+            out[i] = _decode(item[3:-4])
+        else:
+            out[i] = _decode(_rich_text(item))
+    return out
+
+
+def _rich_text(content: bytes) -> bytes:
+    # Runs are concatenated; phonetic guides are not part of the value
+    return b"".join(_TEXT.findall(_PHONETIC.sub(b"", content)))
+
+
+def _decode(raw: bytes) -> str:
+    text = raw.decode("utf-8")
+    if "&" in text:
+        text = html.unescape(text)
+    return _ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), text) if "_x" in text else text
+
+
+def _number_text(x: float) -> str:
+    return str(int(x)) if x.is_integer() else repr(x)
+
+
+def _empty(kind: str, n_rows: int) -> pd.Series:
+    if kind == "category":
+        return pd.Series(pd.Categorical([None] * n_rows))
+    if kind == "datetime":
+        return pd.Series(np.full(n_rows, np.datetime64("NaT"), dtype="datetime64[ns]"))
+    return pd.Series(np.full(n_rows, np.nan))
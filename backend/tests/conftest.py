@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Sessions of the test run spill to a directory of their own
+os.environ.setdefault("SESSION_SPILL_DIR", tempfile.mkdtemp(prefix="dashboard-tests-"))
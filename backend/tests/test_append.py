@@ -0,0 +1,125 @@
+import asyncio
+import io
+import uuid
+import httpx
+import pandas as pd
+import pytest
+from benchmarks.generate import generate
+from main import app
+from models.schemas import FilterParams
+from routers import dashboard, upload
+from services.cache import canonical_key, result_cache
+
+BASE = generate(3_000, seed=5).to_csv(index=False).encode()
+DELTA = generate(500, seed=6).to_csv(index=False).encode()
+
+
+@pytest.fixture
+def client() -> httpx.AsyncClient:
+    # Requests go through the app in process, on the test's own event loop
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def _upload(client: httpx.AsyncClient, raw: bytes = BASE) -> dict:
+    response = await client.post("/api/upload", files={"file": ("data.csv", io.BytesIO(raw), "text/csv")})
+    response.raise_for_status()
+    return response.json()
+
+
+async def _append(client: httpx.AsyncClient, session_id: str, raw: bytes = DELTA) -> httpx.Response:
+    return await client.post(f"/api/upload/{session_id}/append", files={"file": ("delta.csv", io.BytesIO(raw), "text/csv")})
+
+
+def test_result_built_before_an_append_is_not_cached(client, monkeypatch):
+    async def scenario():
+        session_id = (await _upload(client))["session_id"]
+        filters = {"market": ["US"]}
+        key = canonical_key(session_id, "dashboard", FilterParams(session_id=session_id, **filters).model_dump(exclude={"session_id"}))
+        started, release = asyncio.Event(), asyncio.Event()
+        build = dashboard.build_dashboard
+
+        async def slow_build(view):
+            result = await build(view)
+            started.set()
+            await release.wait()
+            return result
+
+        monkeypatch.setattr(dashboard, "build_dashboard", slow_build)
+        stale = asyncio.ensure_future(client.post("/api/dashboard", json={"session_id": session_id, **filters}))
+        await started.wait()
+        appended = await _append(client, session_id)
+        release.set()
+        old = (await stale).json()
+        monkeypatch.setattr(dashboard, "build_dashboard", build)
+
+        assert appended.status_code == 200
+        assert key not in result_cache
+        fresh = (await client.post("/api/dashboard", json={"session_id": session_id, **filters})).json()
+        assert fresh["kpis"]["total_orders"] > old["kpis"]["total_orders"]
+        assert key in result_cache
+
+    asyncio.run(scenario())
+
+
+def test_append_to_unknown_session_is_404(client):
+    async def scenario():
+        return await _append(client, str(uuid.uuid4()))
+
+    assert asyncio.run(scenario()).status_code == 404
+
+
+def test_append_adds_rows_and_drops_cached_results(client):
+    async def scenario():
+        session_id = (await _upload(client))["session_id"]
+        filters = {"market": ["US"]}
+        before = (await client.post("/api/dashboard", json={"session_id": session_id, **filters})).json()
+        key = canonical_key(session_id, "dashboard", FilterParams(session_id=session_id, **filters).model_dump(exclude={"session_id"}))
+        assert key in result_cache
+
+        appended = await _append(client, session_id)
+        assert appended.status_code == 200
+        assert appended.json()["row_count"] == len(generate(3_000, seed=5)) + len(generate(500, seed=6))
+        assert key not in result_cache
+        after = (await client.post("/api/dashboard", json={"session_id": session_id, **filters})).json()
+        assert after["kpis"]["total_orders"] > before["kpis"]["total_orders"]
+
+    asyncio.run(scenario())
+
+
+def test_appended_session_matches_upload_of_all_rows(client):
+    async def scenario():
+        session_id = (await _upload(client))["session_id"]
+        appended = (await _append(client, session_id)).json()
+        combined = BASE + DELTA.split(b"\n", 1)[1]
+        fresh = await _upload(client, combined)
+        return appended, fresh
+
+    appended, fresh = asyncio.run(scenario())
+    assert appended["row_count"] == fresh["row_count"]
+    assert appended["filter_options"] == fresh["filter_options"]
+    for name in ("total_sales", "total_profit", "total_orders", "total_shipping_cost"):
+        assert appended["kpis"][name] == pytest.approx(fresh["kpis"][name])
+
+
+def test_concurrent_appends_are_applied_in_turn(client):
+    async def scenario():
+        session_id = (await _upload(client))["session_id"]
+        responses = await asyncio.gather(*(_append(client, session_id) for _ in range(3)))
+        return [response.json()["row_count"] for response in responses]
+
+    base, delta = len(generate(3_000, seed=5)), len(generate(500, seed=6))
+    assert sorted(asyncio.run(scenario())) == [base + delta, base + 2 * delta, base + 3 * delta]
+    # Each session's lock goes with its last waiter
+    assert not upload._append_locks and not upload._append_waiters
+
+
+def test_append_to_a_deduplicated_upload_leaves_the_other_alone(client):
+    async def scenario():
+        first = (await _upload(client))["session_id"]
+        second = await _upload(client)
+        assert second["ingest"]["engine"] == "dedup"
+        await _append(client, first)
+        return (await client.post("/api/dashboard", json={"session_id": second["session_id"]})).json()
+
+    untouched = asyncio.run(scenario())
+    assert untouched["kpis"]["total_orders"] == len(pd.read_csv(io.BytesIO(BASE))["Order ID"].unique())
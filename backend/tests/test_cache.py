@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from models.schemas import ChartError
+from services.cache import ResultCache, SingleFlight, canonical_key
+
+
+def _value(size: int) -> ChartError:
+    return ChartError(chart_id="c", detail="x" * size)
+
+
+def test_equivalent_filters_share_a_key():
+    assert canonical_key("s", "dashboard", {"market": ["US", "EU"], "region": None, "segment": []}) == \
+        canonical_key("s", "dashboard", {"market": ["EU", "US"]})
+    assert canonical_key("s", "dashboard", {}) != canonical_key("s", "chart", {})
+    assert canonical_key("s", "chart", {}, options={"granularity": "week"}) != canonical_key("s", "chart", {})
+
+
+def test_least_recently_used_entries_go_first():
+    size = len(_value(100).model_dump_json())
+    cache = ResultCache(3 * size)
+    for name in "abc":
+        cache.put(("s", name), _value(100))
+    cache.get(("s", "a"))
+    cache.put(("s", "d"), _value(100))
+
+    assert ("s", "b") not in cache
+    assert all(("s", name) in cache for name in "acd")
+    assert cache.bytes == 3 * size and cache.evictions == 1
+
+
+def test_oversized_results_are_not_cached():
+    cache = ResultCache(50)
+    cache.put(("s", "a"), _value(100))
+    assert ("s", "a") not in cache and cache.bytes == 0
+
+
+def test_invalidate_drops_one_session():
+    cache = ResultCache(10_000)
+    for key in (("s", "a"), ("s", "b"), ("t", "a")):
+        cache.put(key, _value(10))
+    cache.invalidate("s")
+
+    assert ("t", "a") in cache
+    assert ("s", "a") not in cache and ("s", "b") not in cache
+    assert cache.bytes == len(_value(10).model_dump_json())
+
+
+def test_concurrent_identical_computations_run_once():
+    flights = SingleFlight(True)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        first = await asyncio.gather(*(flights.run("k", "test", compute) for _ in range(5)))
+        # A landed flight is not reused
+        return first, await flights.run("k", "test", compute)
+
+    first, again = asyncio.run(scenario())
+    assert first == [1] * 5 and again == 2
+    assert flights.computations == 2 and flights.coalesced == 4
+
+
+def test_waiters_share_the_exception():
+    flights = SingleFlight(True)
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("k", "test", compute) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_flight_outlives_a_cancelled_caller():
+    flights = SingleFlight(True)
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.run("k", "test", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.run("k", "test", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"
@@ -0,0 +1,61 @@
+import gzip
+import json
+import pytest
+from starlette.requests import Request
+from benchmarks.generate import generate
+from models.schemas import DashboardResponse, KPIData
+from services.chart_builder import build_single_chart
+from services.data_processor import load_and_validate
+from services.encoding import COMPACT_MEDIA_TYPE, encode
+from services.session import Session
+
+CHARTS = [("sales_profit_trend", {}), ("dimension_explorer", {"dimension": "market", "chart_type": "bar", "metric": "Profit"})]
+
+
+@pytest.fixture(scope="module")
+def payload() -> DashboardResponse:
+    view = Session(load_and_validate(generate(2_000, seed=1).to_csv(index=False).encode(), "data.csv")).view({})
+    charts = [
+        build_single_chart(view.df, chart_id, options, view.rollup, view.periods, view.products) for chart_id, options in CHARTS
+    ]
+    kpis = KPIData(
+        total_sales=1.5, total_profit=0.5, profit_margin=33.3, total_orders=2, repeat_customer_rate=0.0,
+        avg_order_value=0.75, total_shipping_cost=0.1, avg_discount=0.0,
+    )
+    return DashboardResponse(kpis=kpis, charts=charts, sparklines={"sales": [1.0, 0.5]})
+
+
+def _request(accept: str = "application/json", encoding: str = "") -> Request:
+    headers = [(b"accept", accept.encode()), (b"accept-encoding", encoding.encode())]
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers})
+
+
+def test_compact_encoding_round_trips(payload):
+    response = encode(_request(COMPACT_MEDIA_TYPE), payload)
+    body = json.loads(response.body)
+    assert response.media_type == COMPACT_MEDIA_TYPE
+
+    # Each figure's template is sent once, by name
+    templates = body.pop("templates")
+    for chart in body["charts"]:
+        figure = chart.pop("figure")
+        name = figure["layout"]["template"]
+        assert isinstance(name, str)
+        figure["layout"]["template"] = templates[name]
+        chart["figure_json"] = figure
+    expected = json.loads(payload.model_dump_json())
+    for chart in expected["charts"]:
+        chart["figure_json"] = json.loads(chart["figure_json"])
+    assert body == expected
+
+
+def test_default_encoding_is_the_model_json(payload):
+    response = encode(_request(), payload)
+    assert response.media_type == "application/json"
+    assert response.body == payload.model_dump_json().encode()
+
+
+def test_large_bodies_are_gzipped_when_accepted(payload):
+    response = encode(_request(COMPACT_MEDIA_TYPE, "gzip, br"), payload)
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == encode(_request(COMPACT_MEDIA_TYPE), payload).body
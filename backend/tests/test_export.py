@@ -0,0 +1,47 @@
+import asyncio
+import io
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from benchmarks.generate import generate
+from services import export
+from services.data_processor import load_and_validate
+from services.export import stream_export
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    df = load_and_validate(generate(350, seed=2).to_csv(index=False).encode(), "data.csv")
+    # Object columns whose values change type, or vanish, from one batch to the next
+    df["Postal Code"] = pd.Series([None] * 150 + list(range(200)), dtype=object)
+    df["Note"] = pd.Series([None] * 100 + ["a"] * 100 + [7] * 100 + [None] * 50, dtype=object)
+    df["Ratio"] = pd.Series([1] * 120 + [None] * 100 + [0.5] * 130, dtype=object)
+    return df
+
+
+def _export(df: pd.DataFrame, rows, fmt: str) -> bytes:
+    async def collect() -> bytes:
+        return b"".join([chunk async for chunk in stream_export(df, rows, fmt)])
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_batches_share_the_frame_schema(frame, fmt, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_ROWS", 100)
+    rows = np.arange(10, len(frame), dtype=np.int32)
+    data = _export(frame, rows, fmt)
+    table = pq.read_table(io.BytesIO(data)) if fmt == "parquet" else pa.ipc.open_stream(data).read_all()
+
+    assert table.num_rows == len(rows)
+    assert table.schema.field("Postal Code").type == pa.int64()
+    assert table.schema.field("Note").type == pa.string()
+    assert table.schema.field("Ratio").type == pa.float64()
+
+    out = table.to_pandas()
+    expected = frame.take(rows).reset_index(drop=True)
+    assert out["Postal Code"].isna().sum() == 140
+    assert out["Note"].tolist() == [None if v is None else str(v) for v in expected["Note"]]
+    np.testing.assert_array_equal(out["Sales"], expected["Sales"])
+    assert (out["City"].astype(str) == expected["City"].astype(str)).all()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.generate import generate
+from services.data_processor import append_rows, load_and_validate
+from services.filter_index import FILTER_COLUMNS, FilterIndex
+
+
+def _frame(rows: int, seed: int) -> pd.DataFrame:
+    return load_and_validate(generate(rows, seed=seed).to_csv(index=False).encode(), "data.csv")
+
+
+@pytest.fixture(scope="module")
+def frames():
+    base = _frame(2_000, seed=1)
+    raw = generate(300, seed=2)
+    # Values the base has never seen, sorting before, between and after its own, and missing ones
+    raw.loc[:49, "Market"] = "AAA"
+    raw.loc[50:99, "Category"] = "Zeta"
+    raw.loc[100:149, "Region"] = "Middle"
+    raw.loc[150:199, "Segment"] = np.nan
+    delta = load_and_validate(raw.to_csv(index=False).encode(), "delta.csv")
+    return base, append_rows(base, delta)
+
+
+def test_extended_index_matches_rebuilt(frames):
+    base, appended = frames
+    extended = FilterIndex(base).extend(appended)
+    rebuilt = FilterIndex(appended)
+
+    for key in FILTER_COLUMNS:
+        pd.testing.assert_index_equal(extended.categories[key], rebuilt.categories[key])
+        for name in ("codes", "offsets", "row_ids"):
+            np.testing.assert_array_equal(getattr(extended, name)[key], getattr(rebuilt, name)[key], err_msg=f"{name} of {key}")
+    for name in ("dates", "date_order", "sorted_dates"):
+        np.testing.assert_array_equal(getattr(extended, name), getattr(rebuilt, name))
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"market": ["AAA", "US"]},
+    {"category": ["Zeta"], "date_start": "2013-01-01"},
+    {"region": ["Middle", "West"], "segment": ["Consumer"]},
+])
+def test_extended_index_answers_as_rebuilt(frames, filters):
+    base, appended = frames
+    extended = FilterIndex(base).extend(appended)
+    rebuilt = FilterIndex(appended)
+
+    selected, expected = extended.select(filters), rebuilt.select(filters)
+    assert (selected is None) == (expected is None)
+    if expected is not None:
+        np.testing.assert_array_equal(selected, expected)
+    assert _facets(extended, filters) == _facets(rebuilt, filters)
+
+
+def _facets(index: FilterIndex, filters: dict) -> tuple:
+    # As lists, so values must come in the same (sorted) order
+    total, counts = index.facet_counts(filters)
+    return total, {key: list(values.items()) for key, values in counts.items()}
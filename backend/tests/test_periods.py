@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.periods import PeriodBuckets
+
+
+@pytest.fixture
+def periods() -> PeriodBuckets:
+    # Starts mid-quarter: buckets begin on 2011-01-01
+    return PeriodBuckets(pd.Series(pd.to_datetime(["2011-02-15", "2011-07-01", "2011-09-30"])))
+
+
+def _dates(*values) -> pd.Series:
+    return pd.Series(pd.to_datetime(list(values)))
+
+
+def test_dates_at_the_edges(periods):
+    dates = _dates("2011-01-01", "2011-02-15", "2011-09-30", None)
+    months = periods.of(dates, "month")
+    assert months.tolist() == [0, 1, 8, -1]
+    assert periods.labels["month"][months[:3]].tolist() == ["Jan 2011", "Feb 2011", "Sep 2011"]
+    assert periods.of(dates, "quarter").tolist() == [0, 0, 2, -1]
+    weeks = periods.of(dates, "week")
+    assert weeks[0] == 0 and weeks[3] == -1
+    assert periods.starts["week"][weeks[2]] == pd.Timestamp("2011-09-26")
+
+
+@pytest.mark.parametrize("date", ["2010-12-31", "2011-10-01", "2030-01-01"])
+def test_dates_beyond_the_edges_raise(periods, date):
+    with pytest.raises(ValueError):
+        periods.of(_dates("2011-03-01", date), "month")
+    with pytest.raises(ValueError):
+        periods.of(_dates(None, date), "week")
+
+
+def test_totals_of_present_buckets(periods):
+    ids = periods.of(_dates("2011-02-15", "2011-02-20", "2011-09-30", None), "month")
+    present, (sums,) = periods.totals(ids, "month", pd.Series([1.0, 2.0, 4.0, 8.0]))
+    assert present.tolist() == [1, 8]
+    np.testing.assert_array_equal(sums, [3.0, 4.0])
+
+
+def test_no_dates():
+    periods = PeriodBuckets(pd.Series(pd.to_datetime([None, None])))
+    assert periods.of(_dates(None), "month").tolist() == [-1]
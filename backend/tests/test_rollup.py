@@ -0,0 +1,99 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.generate import generate
+from services.chart_builder import build_single_chart
+from services.data_processor import compute_kpis, compute_sparklines, load_and_validate
+from services import rollup
+from services import session as session_module
+from services.rollup import MAX_CELL_RATIO
+from services.session import Session
+
+FILTERS = {
+    "all": {},
+    "dimensions": {"market": ["US", "EU"], "segment": ["Consumer"]},
+    "whole months": {"date_start": "2012-03-01", "date_end": "2013-06-30", "category": ["Technology"]},
+    "partial months": {"date_start": "2012-03-17", "date_end": "2013-06-09", "ship_mode": ["Same Day"]},
+    "within a month": {"date_start": "2014-02-03", "date_end": "2014-02-20"},
+    "open start": {"date_end": "2012-07-04"},
+    "sub-category": {"sub_category": ["Phones"], "date_start": "2013-01-15"},
+}
+CHARTS = [
+    ("sales_profit_trend", {"granularity": "week"}),
+    ("sales_profit_trend", {"granularity": "month"}),
+    ("sales_profit_trend", {"granularity": "quarter"}),
+    ("dimension_explorer", {"dimension": "market", "chart_type": "bar", "metric": "Profit"}),
+]
+
+
+# Generated data starts on 2011-01-01; trimmed, it starts mid-month and mid-quarter,
+# before the first cell's date
+@pytest.fixture(scope="module", params=[None, "2011-02-15"], ids=["generated", "mid-month start"])
+def session(request) -> Session:
+    df = load_and_validate(generate(60_000, seed=3).to_csv(index=False).encode(), "data.csv")
+    if request.param is not None:
+        df = df[df["Order Date"] >= request.param].reset_index(drop=True)
+    return Session(df)
+
+
+def test_cube_is_built_on_generator_data(session):
+    assert session.rollup is not None
+    assert len(session.rollup.frame) <= MAX_CELL_RATIO * len(session.df)
+
+
+@pytest.mark.parametrize("name", FILTERS)
+def test_cells_match_raw_rows(session, name):
+    view = session.view(FILTERS[name])
+    if name == "sub-category":
+        assert view.rollup is None
+        return
+    assert view.rollup is not None
+    assert view.whole_cells == (name in ("all", "dimensions", "whole months"))
+
+    assert compute_kpis(view.df, view.rollup) == compute_kpis(view.df)
+    assert compute_sparklines(view.df, view.rollup, None, view.periods) == compute_sparklines(view.df, None, None, view.periods)
+    for chart_id, options in CHARTS:
+        cube = build_single_chart(view.df, chart_id, options, view.rollup, view.periods)
+        raw = build_single_chart(view.df, chart_id, options, None, view.periods)
+        _assert_same_figure(cube.figure_json, raw.figure_json)
+
+
+def test_approximate_distinct_counts(session, monkeypatch):
+    monkeypatch.setattr(rollup, "DISTINCT_COUNT_MODE", "approximate")
+    monkeypatch.setattr(session_module, "DISTINCT_COUNT_MODE", "approximate")
+    approximate = Session(session.df)
+    for name in ("all", "whole months", "partial months"):
+        exact = session.view(FILTERS[name]).distinct_counts()
+        counts = approximate.view(FILTERS[name]).distinct_counts()
+        if name == "partial months":
+            assert counts.mode == "exact"
+            continue
+        assert counts.mode == "approximate"
+        assert counts.periods == exact.periods
+        assert abs(counts.total_orders - exact.total_orders) <= 4 * counts.relative_error * exact.total_orders
+
+
+def test_append_extends_cells(session):
+    delta = load_and_validate(generate(2_000, seed=4).to_csv(index=False).encode(), "delta.csv")
+    appended = session.append(delta)
+    rebuilt = Session(appended.df)
+    columns = list(rebuilt.rollup.frame.columns)
+    key = ["Order Date", "Market", "Category", "Segment", "Ship Mode", "Order Priority"]
+    extended = appended.rollup.frame[columns].astype({col: str for col in key[1:]}).sort_values(key, ignore_index=True)
+    expected = rebuilt.rollup.frame.astype({col: str for col in key[1:]}).sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(extended, expected, check_exact=False)
+
+
+def _assert_same_figure(actual: str, expected: str) -> None:
+    # Cells sum in a different order than rows, so values agree up to rounding
+    actual, expected = json.loads(actual)["data"], json.loads(expected)["data"]
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        for axis in ("x", "y", "labels", "values"):
+            if axis not in e:
+                continue
+            if all(isinstance(v, (int, float)) for v in e[axis]):
+                np.testing.assert_allclose(a[axis], e[axis], rtol=1e-9)
+            else:
+                assert a[axis] == e[axis]
@@ -0,0 +1,136 @@
+import os
+import stat
+import threading
+import uuid
+import pandas as pd
+import pytest
+from benchmarks.generate import generate
+from services import session_store as store_module
+from services.data_processor import load_and_validate
+from services.session import Session
+from services.session_store import SessionStore, has_spill
+
+
+@pytest.fixture(scope="module")
+def sessions() -> list:
+    return [
+        Session(load_and_validate(generate(1_000, seed=seed).to_csv(index=False).encode(), "data.csv"))
+        for seed in (1, 2)
+    ]
+
+
+def _store(directory: str, **kwargs) -> SessionStore:
+    # No budget: every session but the one being served is spilled
+    return SessionStore(0, 3600, 3600, str(directory), **kwargs)
+
+
+def test_spill_dir_is_created_private(tmp_path):
+    directory = tmp_path / "spill"
+    _store(directory)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+def test_readable_spill_dir_is_made_private(tmp_path):
+    os.chmod(tmp_path, 0o755)
+    _store(tmp_path)
+    assert stat.S_IMODE(os.stat(tmp_path).st_mode) == 0o700
+
+
+def test_spill_dir_writable_by_others_is_refused(tmp_path):
+    os.chmod(tmp_path, 0o777)
+    with pytest.raises(RuntimeError, match="writable"):
+        _store(tmp_path)
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="changing a directory's owner needs root")
+def test_spill_dir_of_another_user_is_refused(tmp_path):
+    os.chown(tmp_path, 12345, -1)
+    with pytest.raises(RuntimeError, match="owned"):
+        _store(tmp_path)
+
+
+def test_evicted_session_reloads_from_disk(tmp_path, sessions):
+    store = _store(tmp_path)
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    store.put(first, sessions[0])
+    store.put(second, sessions[1])
+    assert has_spill(tmp_path, first) and not has_spill(tmp_path, second)
+
+    reloaded = store.get(first)
+    assert reloaded is not sessions[0]
+    pd.testing.assert_frame_equal(reloaded.df, sessions[0].df)
+    assert reloaded.filter_options == sessions[0].filter_options
+    assert store.stats()["reloads"] == 1
+
+
+def test_spill_is_written_outside_the_lock(tmp_path, sessions, monkeypatch):
+    store = _store(tmp_path)
+    spill = store_module.spill_session
+    free = []
+
+    def probe():
+        acquired = store._lock.acquire(timeout=1)
+        if acquired:
+            store._lock.release()
+        free.append(acquired)
+
+    def checked_spill(*args):
+        # Another thread must be able to take the lock while the files are written
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        spill(*args)
+
+    monkeypatch.setattr(store_module, "spill_session", checked_spill)
+    store.put(str(uuid.uuid4()), sessions[0])
+    store.put(str(uuid.uuid4()), sessions[1])
+    assert free == [True]
+
+
+def test_session_replaced_while_spilling_keeps_no_stale_files(tmp_path, sessions, monkeypatch):
+    store = _store(tmp_path)
+    session_id = str(uuid.uuid4())
+    spill = store_module.spill_session
+
+    def replacing_spill(directory, key, session):
+        spill(directory, key, session)
+        if key == session_id:
+            store.put(session_id, sessions[1])
+
+    store.put(session_id, sessions[0])
+    monkeypatch.setattr(store_module, "spill_session", replacing_spill)
+    store.put(str(uuid.uuid4()), sessions[1])
+    assert not has_spill(tmp_path, session_id)
+    assert store.get(session_id) is sessions[1]
+
+
+KEY = "upload-csv-" + "ab" * 32
+
+
+def test_linked_sessions_share_a_dataset_until_the_last_goes(tmp_path, sessions):
+    store = SessionStore(2**30, 3600, 3600, str(tmp_path))
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    store.put_dataset(KEY, sessions[0])
+    assert store.link(first, KEY) is sessions[0]
+    assert store.link(second, KEY) is sessions[0]
+    assert store.stats()["linked_sessions"] == 2 and store.stats()["shared_datasets"] == 1
+
+    # New data for one session (e.g. an append) detaches it only
+    store.put(first, sessions[1])
+    assert store.get(first) is sessions[1]
+    assert store.get(second) is sessions[0]
+
+    store.discard(second)
+    assert store.get(second) is None
+    assert store.link(str(uuid.uuid4()), KEY) is None
+
+
+def test_links_resolve_after_a_restart(tmp_path, sessions):
+    store = _store(tmp_path, shared=True)
+    session_id = str(uuid.uuid4())
+    store.put_dataset(KEY, sessions[0])
+    store.link(session_id, KEY)
+
+    restarted = _store(tmp_path, shared=True)
+    pd.testing.assert_frame_equal(restarted.get(session_id).df, sessions[0].df)
+    assert restarted.stats()["linked_sessions"] == 1
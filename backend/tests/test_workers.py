@@ -0,0 +1,27 @@
+import asyncio
+import threading
+import time
+from services.workers import measure_cpu, run_in_pool, run_in_thread
+
+
+def _spin(seconds: float) -> None:
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def test_cpu_is_measured_per_task():
+    async def scenario():
+        # CPU burnt by another thread meanwhile, e.g. a request being served, is not counted
+        busy = threading.Thread(target=_spin, args=(0.3,))
+        busy.start()
+        with measure_cpu() as idle:
+            await run_in_pool(time.sleep, 0.2)
+        busy.join()
+        with measure_cpu() as working:
+            await asyncio.gather(run_in_pool(_spin, 0.1), run_in_thread(_spin, 0.1))
+        return idle[0], working[0]
+
+    idle, working = asyncio.run(scenario())
+    assert idle < 0.05
+    assert working >= 0.2
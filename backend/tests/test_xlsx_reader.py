@@ -0,0 +1,184 @@
+import io
+import re
+import zipfile
+from typing import Tuple
+from xml.sax.saxutils import escape as xml_escape
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.generate import generate
+from services import data_processor, xlsx_reader
+from services.data_processor import load_and_validate
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    df = generate(500, seed=1)
+    rows = np.random.default_rng(1).choice(len(df), 40, replace=False)
+    for col in ("Postal Code", "City", "Profit", "Ship Date"):
+        df[col] = df[col].astype(object)
+        df.loc[rows[:20] if col == "Postal Code" else rows, col] = np.nan
+    return df
+
+
+def _ingest(df: pd.DataFrame, filename: str) -> Tuple[pd.DataFrame, str]:
+    buffer = io.BytesIO()
+    if filename.endswith(".csv"):
+        df.to_csv(buffer, index=False)
+    else:
+        df.to_excel(buffer, index=False, engine="openpyxl")
+    report = {}
+    out = load_and_validate(buffer.getvalue(), filename, report)
+    return out, report["engine"]
+
+
+def test_xlsx_matches_csv_with_missing_values(frame, monkeypatch):
+    monkeypatch.setattr(data_processor, "EXCEL_ENGINE", "auto")
+    from_csv, _ = _ingest(frame, "data.csv")
+    from_xlsx, engine = _ingest(frame, "data.xlsx")
+
+    assert engine == "xlsx-stream"
+    assert from_xlsx["Postal Code"].dtype == np.float64
+    assert from_xlsx["Postal Code"].isna().sum() == 20
+    pd.testing.assert_frame_equal(from_xlsx, from_csv, check_categorical=False)
+
+
+# Sheet markup as each producer writes it: Excel omits empty cells and styles dates;
+# LibreOffice types numbers (t="n"), writes empty styled cells and keeps formulas next
+# to their values; streaming writers use inline strings, some without cell references
+PRODUCERS = ["excel", "libreoffice", "inline", "no references"]
+DATES = ("Order Date", "Ship Date")
+ERRORS = {(3, "Profit"): "#DIV/0!", (5, "City"): "#N/A"}
+ESCAPED = {(7, "City"): "Saint\rDenis", (8, "Customer Name"): "Customer _x0041_", (9, "State"): "Tab\there"}
+
+
+def _escape(text: str) -> str:
+    text = re.sub(r"_x[0-9A-Fa-f]{4}_", lambda m: "_x005F" + m.group(0), text)
+    text = re.sub(r"[\x00-\x08\x0b-\x1f]", lambda m: f"_x{ord(m.group(0)):04X}_", text)
+    return xml_escape(text)
+
+
+def _workbook(df: pd.DataFrame, producer: str, errors: dict) -> bytes:
+    shared: dict = {}
+    rows = []
+    for r, values in enumerate([list(df.columns)] + df.to_numpy().tolist(), start=1):
+        cells = []
+        for c, value in enumerate(values):
+            ref = f' r="{chr(ord("A") + c)}{r}"' if producer != "no references" else ""
+            style = ' s="0"' if producer == "libreoffice" else ""
+            error = errors.get((r - 2, df.columns[c]))
+            if error is not None:
+                formula = "<f>1/0</f>" if producer == "libreoffice" else ""
+                cells.append(f'<c{ref}{style} t="e">{formula}<v>{error}</v></c>')
+            elif pd.isna(value):
+                if producer == "libreoffice":
+                    cells.append(f"<c{ref}{style}/>")
+                elif producer == "no references":
+                    cells.append("<c/>")
+            elif r > 1 and df.columns[c] in DATES:
+                serial = (pd.Timestamp(value) - pd.Timestamp("1899-12-30")).days
+                number = ' t="n"' if producer == "libreoffice" else ""
+                cells.append(f'<c{ref} s="1"{number}><v>{serial}</v></c>')
+            elif isinstance(value, str):
+                if producer in ("inline", "no references"):
+                    cells.append(f'<c{ref} t="inlineStr"><is><t xml:space="preserve">{_escape(value)}</t></is></c>')
+                else:
+                    cells.append(f'<c{ref}{style} t="s"><v>{shared.setdefault(value, len(shared))}</v></c>')
+            else:
+                number = ' t="n"' if producer == "libreoffice" else ""
+                cells.append(f"<c{ref}{style}{number}><v>{value!r}</v></c>")
+        spans = ' spans="1:24"' if producer == "excel" else ""
+        rows.append(f'<row r="{r}"{spans}>{"".join(cells)}</row>')
+
+    main = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            "</Types>"
+        ))
+        archive.writestr("_rels/.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+        ))
+        archive.writestr("xl/workbook.xml", (
+            f'<workbook {main} xmlns:r="{rel}"><sheets><sheet name="Orders" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{rel}/styles" Target="styles.xml"/>'
+            f'<Relationship Id="rId3" Type="{rel}/sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+        ))
+        archive.writestr("xl/styles.xml", (
+            f'<styleSheet {main}><fonts count="1"><font/></fonts><fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+            '<borders count="1"><border/></borders><cellStyleXfs count="1"><xf/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0"/><xf numFmtId="14" applyNumberFormat="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles></styleSheet>'
+        ))
+        items = "".join(f'<si><t xml:space="preserve">{_escape(text)}</t></si>' for text in shared)
+        archive.writestr("xl/sharedStrings.xml", f'<sst {main} uniqueCount="{len(shared)}">{items}</sst>')
+        archive.writestr("xl/worksheets/sheet1.xml", f'<worksheet {main}><sheetData>{"".join(rows)}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("producer", PRODUCERS)
+def test_producer_markup_matches_csv(frame, producer, monkeypatch):
+    monkeypatch.setattr(data_processor, "EXCEL_ENGINE", "auto")
+    df = frame.head(60).copy()
+    # Only the stream reader's handling is checked; openpyxl keeps errors and escapes as raw text
+    errors = ERRORS if producer != "no references" else {}
+    if errors:
+        for (row, col), text in ESCAPED.items():
+            df.loc[row, col] = text
+    expected = df.copy()
+    for row, col in errors:
+        expected.loc[row, col] = np.nan
+
+    report = {}
+    from_xlsx = load_and_validate(_workbook(df, producer, errors), "data.xlsx", report)
+    from_csv, _ = _ingest(expected, "data.csv")
+
+    # Cells without a reference are left to pandas
+    assert report["engine"] == ("openpyxl" if producer == "no references" else "xlsx-stream")
+    pd.testing.assert_frame_equal(from_xlsx, from_csv, check_categorical=False)
+
+
+def test_xlsxwriter_workbook_matches_csv(frame, monkeypatch):
+    pytest.importorskip("xlsxwriter")
+    monkeypatch.setattr(data_processor, "EXCEL_ENGINE", "auto")
+    df = frame.head(60).copy()
+    for (row, col), text in ESCAPED.items():
+        df.loc[row, col] = text
+    for col in DATES:
+        df[col] = pd.to_datetime(df[col])
+
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="xlsxwriter")
+    report = {}
+    from_xlsx = load_and_validate(buffer.getvalue(), "data.xlsx", report)
+    from_csv, _ = _ingest(df, "data.csv")
+
+    assert report["engine"] == "xlsx-stream"
+    pd.testing.assert_frame_equal(from_xlsx, from_csv, check_categorical=False)
+
+
+def test_unreadable_cell_falls_back_to_pandas(frame, monkeypatch):
+    monkeypatch.setattr(data_processor, "EXCEL_ENGINE", "auto")
+
+    def broken(*args):
+        raise ValueError("could not convert string to float")
+
+    monkeypatch.setattr(xlsx_reader, "_gather", broken)
+    from_csv, _ = _ingest(frame, "data.csv")
+    from_xlsx, engine = _ingest(frame, "data.xlsx")
+
+    assert engine == "openpyxl"
+    pd.testing.assert_frame_equal(from_xlsx, from_csv, check_categorical=False)
@@ -57,12 +57,14 @@ export default function ChartCard({
   const activeChart = overrideChart || chart
 
   const figure = useMemo(() => {
+    // Compact responses carry the figure itself, JSON ones a figure_json string
+    if (activeChart.figure) return activeChart.figure
     try {
       return JSON.parse(activeChart.figure_json)
     } catch {
       return null
     }
-  }, [activeChart.figure_json])
+  }, [activeChart.figure, activeChart.figure_json])
 
   const mergedLayout = useMemo(() => {
     if (!figure) return {}
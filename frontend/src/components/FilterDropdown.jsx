@@ -1,7 +1,8 @@
 import { useEffect, useRef, useState } from 'react'
 import { Check, ChevronDown } from 'lucide-react'
 
-export default function FilterDropdown({ label, options = [], selected = [], onChange }) {
+// counts (optional): value → rows it would match; values at 0 are greyed out
+export default function FilterDropdown({ label, options = [], selected = [], counts, onChange }) {
   const [open, setOpen] = useState(false)
   const containerRef = useRef(null)
 
@@ -91,13 +92,18 @@ export default function FilterDropdown({ label, options = [], selected = [], onC
           <div className="max-h-48 overflow-y-auto">
             {options.map((opt) => {
               const isChecked = selected.includes(opt)
+              const count = counts?.[opt]
+              // A chosen value stays clickable so it can still be cleared
+              const isEmpty = count === 0 && !isChecked
               return (
                 <button
                   key={opt}
                   onClick={() => toggle(opt)}
-                  className="w-full flex items-center gap-2.5 px-3 py-1.5
+                  disabled={isEmpty}
+                  className={`w-full flex items-center gap-2.5 px-3 py-1.5
                     text-sm text-slate-700 dark:text-slate-200
-                    hover:bg-slate-50 dark:hover:bg-dark-border text-left"
+                    hover:bg-slate-50 dark:hover:bg-dark-border text-left
+                    ${isEmpty ? 'opacity-40 cursor-not-allowed' : ''}`}
                 >
                   <span
                     className={`w-3.5 h-3.5 rounded border flex items-center justify-center shrink-0
@@ -109,6 +115,11 @@ export default function FilterDropdown({ label, options = [], selected = [], onC
                     {isChecked && <Check size={9} strokeWidth={3} className="text-white" />}
                   </span>
                   <span className="truncate">{opt}</span>
+                  {count !== undefined && (
+                    <span className="ml-auto pl-2 text-xs tabular-nums text-slate-400 dark:text-dark-muted">
+                      {count.toLocaleString()}
+                    </span>
+                  )}
                 </button>
               )
             })}
@@ -29,7 +29,7 @@ function getPresetRange(key, maxDateStr) {
 }
 
 export default function FilterPanel({ onClose }) {
-  const { filterOptions, activeFilters, applyFilters, resetFilters } = useDashboard()
+  const { filterOptions, facets, activeFilters, applyFilters, resetFilters } = useDashboard()
   const [activePreset, setActivePreset] = useState('all')
 
   if (!filterOptions) return null
@@ -178,42 +178,49 @@ export default function FilterPanel({ onClose }) {
             label="Category"
             options={filterOptions.categories}
             selected={activeFilters.category || []}
+            counts={facets?.counts.category}
             onChange={(values) => set('category', values)}
           />
           <FilterDropdown
             label="Sub-Category"
             options={availableSubCats}
             selected={activeFilters.sub_category || []}
+            counts={facets?.counts.sub_category}
             onChange={(values) => set('sub_category', values)}
           />
           <FilterDropdown
             label="Market"
             options={filterOptions.markets}
             selected={activeFilters.market || []}
+            counts={facets?.counts.market}
             onChange={(values) => set('market', values)}
           />
           <FilterDropdown
             label="Region"
             options={availableRegions}
             selected={activeFilters.region || []}
+            counts={facets?.counts.region}
             onChange={(values) => set('region', values)}
           />
           <FilterDropdown
             label="Segment"
             options={filterOptions.segments}
             selected={activeFilters.segment || []}
+            counts={facets?.counts.segment}
             onChange={(values) => set('segment', values)}
           />
           <FilterDropdown
             label="Ship Mode"
             options={filterOptions.ship_modes}
             selected={activeFilters.ship_mode || []}
+            counts={facets?.counts.ship_mode}
             onChange={(values) => set('ship_mode', values)}
           />
           <FilterDropdown
             label="Priority"
             options={filterOptions.order_priorities}
             selected={activeFilters.order_priority || []}
+            counts={facets?.counts.order_priority}
             onChange={(values) => set('order_priority', values)}
           />
         </div>
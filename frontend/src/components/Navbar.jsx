@@ -4,7 +4,7 @@ import { getExportUrl } from '../services/api'
 import ThemeToggle from './ThemeToggle'
 
 export default function Navbar() {
-  const { sessionId, rowCount, reset, isLoading } = useDashboard()
+  const { sessionId, rowCount, reset, isLoading, activeFilters } = useDashboard()
 
   return (
     <header className="sticky top-0 z-50 h-16 flex items-center justify-between px-4 md:px-6
@@ -32,7 +32,7 @@ export default function Navbar() {
 
         {sessionId && (
           <a
-            href={getExportUrl(sessionId)}
+            href={getExportUrl(sessionId, activeFilters)}
             download="dashboard_data.csv"
             className="btn-secondary flex items-center gap-1.5"
           >
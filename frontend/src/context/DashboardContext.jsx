@@ -1,6 +1,6 @@
 import { createContext, useContext, useRef, useState } from 'react'
 import toast from 'react-hot-toast'
-import { uploadFile, fetchDashboard } from '../services/api'
+import { uploadFile, fetchDashboard, fetchFacets } from '../services/api'
 
 const DashboardContext = createContext(null)
 
@@ -22,6 +22,8 @@ export function DashboardProvider({ children }) {
   const [charts, setCharts] = useState([])
   const [sparklines, setSparklines] = useState({})
   const [filterOptions, setFilterOptions] = useState(null)
+  // Per-value row counts under the other active filters; null until filters change
+  const [facets, setFacets] = useState(null)
   const [activeFilters, setActiveFilters] = useState(EMPTY_FILTERS)
   const [rowCount, setRowCount] = useState(0)
   const [isUploading, setIsUploading] = useState(false)
@@ -37,6 +39,7 @@ export function DashboardProvider({ children }) {
       setCharts(data.charts)
       setSparklines(data.sparklines || {})
       setFilterOptions(data.filter_options)
+      setFacets(null)
       setRowCount(data.row_count)
       setActiveFilters(EMPTY_FILTERS)
       toast.success(`Loaded ${data.row_count.toLocaleString()} rows successfully`)
@@ -54,6 +57,8 @@ export function DashboardProvider({ children }) {
     debounceRef.current = setTimeout(async () => {
       setIsLoading(true)
       try {
+        // Facets still update when no rows match and the dashboard request fails
+        fetchFacets(sessionId, updatedFilters).then(setFacets).catch(() => setFacets(null))
         const data = await fetchDashboard(sessionId, updatedFilters)
         setKpis(data.kpis)
         setCharts(data.charts)
@@ -85,6 +90,7 @@ export function DashboardProvider({ children }) {
     setKpis(null)
     setCharts([])
     setFilterOptions(null)
+    setFacets(null)
     setActiveFilters(EMPTY_FILTERS)
     setRowCount(0)
   }
@@ -97,6 +103,7 @@ export function DashboardProvider({ children }) {
         charts,
         sparklines,
         filterOptions,
+        facets,
         activeFilters,
         rowCount,
         isUploading,
@@ -6,7 +6,7 @@ import KPICard from '../components/KPICard'
 import ChartCard from '../components/ChartCard'
 import FilterPanel from '../components/FilterPanel'
 import { useDashboard } from '../context/DashboardContext'
-import { fetchChart } from '../services/api'
+import { fetchChart, fetchCharts } from '../services/api'
 
 // Maps chart_id → which filter key a click on that chart updates
 const CHART_FILTER_MAP = {
@@ -53,6 +53,17 @@ const CHART_TOGGLE_CONFIGS = {
       ],
     },
   ],
+  top_products: [
+    {
+      key: 'top_k',
+      defaultValue: 10,
+      options: [
+        { value: 5,  label: 'Top 5'  },
+        { value: 10, label: 'Top 10' },
+        { value: 25, label: 'Top 25' },
+      ],
+    },
+  ],
   dimension_explorer: [
     {
       key: 'dimension',
@@ -109,11 +120,22 @@ export default function DashboardPage() {
       return cfgs && cfgs.some((cfg) => opts[cfg.key] !== cfg.defaultValue)
     })
 
-    nonDefault.forEach(([chartId, opts]) => {
-      fetchChart(sessionId, activeFilters, chartId, opts)
-        .then((result) => setChartOverrides((prev) => ({ ...prev, [chartId]: result })))
-        .catch(console.error)
-    })
+    if (!nonDefault.length) return
+
+    // One round trip for every re-parameterized chart
+    fetchCharts(
+      sessionId,
+      activeFilters,
+      nonDefault.map(([chartId, opts]) => ({ chart_id: chartId, options: opts }))
+    )
+      .then(({ charts: results, errors }) => {
+        setChartOverrides((prev) => ({
+          ...prev,
+          ...Object.fromEntries(results.map((result) => [result.chart_id, result])),
+        }))
+        errors.forEach((error) => console.error(`${error.chart_id}: ${error.detail}`))
+      })
+      .catch(console.error)
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [charts])
 
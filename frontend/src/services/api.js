@@ -2,7 +2,19 @@ import axios from 'axios'
 
 const BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
-const client = axios.create({ baseURL: BASE_URL })
+// Figures arrive as objects instead of figure_json strings, with the shared
+// layout template sent once (see backend/services/encoding.py)
+const COMPACT_MEDIA_TYPE = 'application/vnd.dashboard.compact+json'
+
+const client = axios.create({
+  baseURL: BASE_URL,
+  headers: { Accept: `${COMPACT_MEDIA_TYPE}, application/json` },
+})
+
+client.interceptors.response.use((res) => {
+  if (res.headers['content-type']?.startsWith(COMPACT_MEDIA_TYPE)) expandFigures(res.data)
+  return res
+})
 
 client.interceptors.response.use(
   (res) => res,
@@ -12,6 +24,17 @@ client.interceptors.response.use(
   }
 )
 
+// Puts each compact figure's layout template back in place
+function expandFigures(data) {
+  const { templates = {} } = data
+  const charts = data.charts ?? (data.figure ? [data] : [])
+  charts.forEach(({ figure }) => {
+    const name = figure?.layout?.template
+    if (typeof name === 'string') figure.layout.template = templates[name]
+  })
+  delete data.templates
+}
+
 export async function uploadFile(file) {
   const form = new FormData()
   form.append('file', file)
@@ -39,6 +62,30 @@ export async function fetchChart(sessionId, filters, chartId, options = {}) {
   return data
 }
 
-export function getExportUrl(sessionId) {
-  return `${BASE_URL}/api/export/${sessionId}`
+// charts: [{ chart_id, options }] under one filter state → { charts, errors }
+export async function fetchCharts(sessionId, filters, charts) {
+  const { data } = await client.post('/api/charts/batch', {
+    session_id: sessionId,
+    ...filters,
+    charts,
+  })
+  return data
+}
+
+// → { row_count, counts: { [filterKey]: { [value]: rows it would match if chosen } } }
+export async function fetchFacets(sessionId, filters) {
+  const { data } = await client.post('/api/filters/facets', {
+    session_id: sessionId,
+    ...filters,
+  })
+  return data
+}
+
+export function getExportUrl(sessionId, filters = {}, format = 'csv') {
+  const params = new URLSearchParams({ format })
+  Object.entries(filters).forEach(([key, value]) => {
+    if (Array.isArray(value)) value.forEach((v) => params.append(key, v))
+    else if (value) params.append(key, value)
+  })
+  return `${BASE_URL}/api/export/${sessionId}?${params}`
 }